@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import CostProjection
+from .models import CostProjection, ForwardCurve, ForwardCurvePoint
 
 
 @admin.register(CostProjection)
@@ -18,3 +18,17 @@ class CostProjectionAdmin(admin.ModelAdmin):
         ('Calculated Values', {'fields': ('traded_price', 'cost')}),
         ('Timestamps', {'fields': ('created_at', 'updated_at')}),
     )
+
+
+class ForwardCurvePointInline(admin.TabularInline):
+    model = ForwardCurvePoint
+    extra = 0
+
+
+@admin.register(ForwardCurve)
+class ForwardCurveAdmin(admin.ModelAdmin):
+    list_display = ['id', 'business', 'name', 'as_of_date', 'created_at']
+    list_filter = ['business', 'name']
+    readonly_fields = ['created_at', 'updated_at']
+    ordering = ['-as_of_date']
+    inlines = [ForwardCurvePointInline]
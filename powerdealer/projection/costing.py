@@ -0,0 +1,297 @@
+"""
+Vectorized cost calculations over many projection months at once.
+
+Applies the same formula as CostProjection.cost to NumPy arrays so whole
+portfolios and scenario sets are costed in one array expression:
+
+    Cost (£) = (St Charge p/day × No of Days / 100) +
+               (Consumption (kWh) × (Flex Unit Rate + Traded Price / 29.3071) / 100)
+
+Results are floats rounded to pennies per month, matching the Decimal
+property to the penny.
+"""
+import calendar
+import math
+
+import numpy as np
+
+from trading.models import Customer, TradeMonthSummary
+from .models import CostProjection, KWH_PER_THERM
+
+KWH_PER_THERM_FLOAT = float(KWH_PER_THERM)
+
+
+def days_in_months(year):
+    """Number of days in each month of a year, shape (12,)."""
+    return np.array([calendar.monthrange(year, month)[1] for month in range(1, 13)], dtype=float)
+
+
+def monthly_costs(year, st_charge, consumption, flex_rate, traded_price):
+    """Cost in pounds for each month, rounded to 2 decimal places.
+
+    All arguments broadcast against each other; the last axis is the month.
+    """
+    days = days_in_months(year)
+    st_charge_component = st_charge * days / 100
+    unit_component = consumption * (flex_rate + traded_price / KWH_PER_THERM_FLOAT) / 100
+    return np.round(st_charge_component + unit_component, 2)
+
+
+def load_portfolio_inputs(business, year):
+    """Load projection and booked price inputs for every customer of a business.
+
+    Uses three queries regardless of the number of customers.
+
+    Returns:
+        tuple: (customers, inputs) where customers is a list of
+               (id, mprn, name) for customers with projections that year and
+               inputs is a dict of (n_customers, 12) float arrays keyed by
+               st_charge, consumption, flex_rate, traded_price and
+               total_percent (booked share of the month)
+    """
+    projection_rows = list(
+        CostProjection.objects
+        .filter(customer__business=business, year=year)
+        .order_by()
+        .values_list('customer_id', 'month', 'st_charge', 'consumption', 'flex_rate')
+    )
+    customer_ids = sorted({row[0] for row in projection_rows})
+
+    customers = {
+        customer_id: (customer_id, mprn, f"{first_name} {last_name}".strip() or username)
+        for customer_id, mprn, first_name, last_name, username in (
+            Customer.objects
+            .filter(id__in=customer_ids)
+            .order_by()
+            .values_list('id', 'mprn', 'user__first_name', 'user__last_name', 'user__username')
+        )
+    }
+
+    shape = (len(customer_ids), 12)
+    inputs = {
+        'st_charge': np.zeros(shape),
+        'consumption': np.zeros(shape),
+        'flex_rate': np.zeros(shape),
+        'traded_price': np.zeros(shape),
+        'total_percent': np.zeros(shape),
+    }
+    if not projection_rows:
+        return [], inputs
+
+    ids = np.array(customer_ids)
+    columns = np.array(projection_rows, dtype=float).T
+    rows = np.searchsorted(ids, columns[0].astype(np.int64))
+    months = columns[1].astype(np.int64) - 1
+    inputs['st_charge'][rows, months] = columns[2]
+    inputs['consumption'][rows, months] = columns[3]
+    inputs['flex_rate'][rows, months] = columns[4]
+
+    summary_rows = list(
+        TradeMonthSummary.objects
+        .filter(customer_id__in=customer_ids, year=year, total_percent__gt=0)
+        .order_by()
+        .values_list('customer_id', 'month', 'weighted_price', 'total_percent')
+    )
+    if summary_rows:
+        columns = np.array(summary_rows, dtype=float).T
+        rows = np.searchsorted(ids, columns[0].astype(np.int64))
+        months = columns[1].astype(np.int64) - 1
+        inputs['traded_price'][rows, months] = np.round(columns[2] / columns[3], 8)
+        inputs['total_percent'][rows, months] = columns[3]
+
+    return [customers[customer_id] for customer_id in customer_ids], inputs
+
+
+def load_customer_inputs(customer, year):
+    """Load one customer year's projection and booked price inputs as (12,) arrays.
+
+    Returns:
+        dict: arrays keyed by st_charge, consumption, flex_rate, traded_price
+              and total_percent (booked share of the month), or None when
+              the customer has no projection for the year
+    """
+    projection_rows = list(
+        CostProjection.objects
+        .filter(customer=customer, year=year)
+        .order_by()
+        .values_list('month', 'st_charge', 'consumption', 'flex_rate')
+    )
+    if not projection_rows:
+        return None
+
+    inputs = {
+        'st_charge': np.zeros(12),
+        'consumption': np.zeros(12),
+        'flex_rate': np.zeros(12),
+        'traded_price': np.zeros(12),
+        'total_percent': np.zeros(12),
+    }
+    columns = np.array(projection_rows, dtype=float).T
+    months = columns[0].astype(np.int64) - 1
+    inputs['st_charge'][months] = columns[1]
+    inputs['consumption'][months] = columns[2]
+    inputs['flex_rate'][months] = columns[3]
+
+    summary_rows = list(
+        TradeMonthSummary.objects
+        .filter(customer=customer, year=year, total_percent__gt=0)
+        .order_by()
+        .values_list('month', 'weighted_price', 'total_percent')
+    )
+    if summary_rows:
+        columns = np.array(summary_rows, dtype=float).T
+        months = columns[0].astype(np.int64) - 1
+        inputs['traded_price'][months] = np.round(columns[1] / columns[2], 8)
+        inputs['total_percent'][months] = columns[2]
+
+    return inputs
+
+
+def parse_scenarios(scenarios):
+    """Turn posted scenarios into names and an (n_scenarios, 12) price array.
+
+    Months a scenario leaves out are NaN, meaning "use the booked price".
+
+    Raises:
+        ValueError: with a user-readable message when a scenario is malformed
+    """
+    names = []
+    prices = np.full((len(scenarios), 12), np.nan)
+    for index, scenario in enumerate(scenarios):
+        if not isinstance(scenario, dict) or not isinstance(scenario.get('trade_prices', {}), dict):
+            raise ValueError(f"Scenario {index + 1} must have a trade_prices object.")
+        names.append(str(scenario.get('name') or f"Scenario {index + 1}"))
+        for month, price in scenario.get('trade_prices', {}).items():
+            try:
+                month = int(month)
+                price = None if price is None else float(price)
+            except (TypeError, ValueError):
+                raise ValueError(f"Scenario {index + 1} has an invalid month or price.")
+            if month < 1 or month > 12:
+                raise ValueError(f"Scenario {index + 1} has an invalid month: {month}.")
+            if price is not None and not math.isfinite(price):
+                raise ValueError(f"Scenario {index + 1} has an invalid price for month {month}.")
+            if price is not None:
+                prices[index, month - 1] = price
+    return names, prices
+
+
+def evaluate_scenarios(year, inputs, names, scenario_prices):
+    """Cost every scenario for a customer year in one array operation.
+
+    Returns:
+        dict: booked rows and total, plus each scenario's rows, total and
+              deltas against the booked cost
+    """
+    booked_prices = inputs['traded_price']
+    prices = np.where(np.isnan(scenario_prices), booked_prices, scenario_prices)
+
+    booked_costs = monthly_costs(
+        year, inputs['st_charge'], inputs['consumption'], inputs['flex_rate'], booked_prices
+    )
+    costs = monthly_costs(
+        year, inputs['st_charge'], inputs['consumption'], inputs['flex_rate'], prices
+    )
+    deltas = np.round(costs - booked_costs, 2)
+
+    booked_total = round(float(booked_costs.sum()), 2)
+    totals = np.round(costs.sum(axis=1), 2)
+
+    return {
+        'year': year,
+        'booked': {
+            'rows': [
+                {'month': month, 'trade_price': float(price), 'cost': float(cost)}
+                for month, price, cost in zip(range(1, 13), booked_prices, booked_costs)
+            ],
+            'total_cost': booked_total,
+        },
+        'scenarios': [
+            {
+                'name': name,
+                'rows': [
+                    {
+                        'month': month,
+                        'trade_price': float(price),
+                        'cost': float(cost),
+                        'delta': float(delta),
+                    }
+                    for month, price, cost, delta in zip(
+                        range(1, 13), prices[index], costs[index], deltas[index]
+                    )
+                ],
+                'total_cost': float(totals[index]),
+                'total_delta': round(float(totals[index]) - booked_total, 2),
+            }
+            for index, name in enumerate(names)
+        ],
+    }
+
+
+def price_points(price_min, price_max, price_step):
+    """Evenly spaced hypothetical market prices from price_min to price_max inclusive."""
+    count = int(np.floor((price_max - price_min) / price_step + 1e-9)) + 1
+    return np.round(price_min + price_step * np.arange(count), 4)
+
+
+def price_sensitivity(year, inputs, prices):
+    """Cost of a customer year over a range of market prices for the unhedged volume.
+
+    Each month's booked share (total percent from trades) keeps its booked
+    price; the remaining 100 - total percent is priced at each market price.
+    The whole (price points × months) grid is one broadcast expression.
+
+    Returns:
+        dict: hedged percent per month, monthly cost grid and annual cost per price
+    """
+    hedged_share = np.clip(inputs['total_percent'], 0, 100) / 100
+    blended_prices = (
+        inputs['traded_price'] * hedged_share
+        + prices[:, np.newaxis] * (1 - hedged_share)
+    )
+    costs = monthly_costs(
+        year, inputs['st_charge'], inputs['consumption'], inputs['flex_rate'], blended_prices
+    )
+    annual_costs = np.round(costs.sum(axis=1), 2)
+
+    return {
+        'year': year,
+        'months': list(range(1, 13)),
+        'hedged_percent': [float(percent) for percent in np.clip(inputs['total_percent'], 0, 100)],
+        'prices': [float(price) for price in prices],
+        'monthly_costs': costs.tolist(),
+        'annual_costs': annual_costs.tolist(),
+    }
+
+
+def portfolio_rollup(business, year):
+    """Projected cost of every customer × month of a business for a year.
+
+    Returns:
+        dict: per-customer totals, per-month totals and the grand total
+    """
+    customers, inputs = load_portfolio_inputs(business, year)
+    costs = monthly_costs(
+        year, inputs['st_charge'], inputs['consumption'], inputs['flex_rate'], inputs['traded_price']
+    )
+
+    customer_totals = np.round(costs.sum(axis=1), 2)
+    month_totals = np.round(costs.sum(axis=0), 2)
+
+    return {
+        'year': year,
+        'customers': [
+            {
+                'customer_id': customer_id,
+                'mprn': mprn,
+                'name': name,
+                'total_cost': float(total),
+            }
+            for (customer_id, mprn, name), total in zip(customers, customer_totals)
+        ],
+        'month_totals': [
+            {'month': month, 'cost': float(total)}
+            for month, total in zip(range(1, 13), month_totals)
+        ],
+        'grand_total': float(round(costs.sum(), 2)),
+    }
@@ -0,0 +1,169 @@
+"""
+Set-based builders for the 12-month projection grid.
+
+The grid used to be assembled one month at a time, with a
+CostProjection.objects.get, a prior-year fallback query and a full scan of
+the month's trades per row. These helpers load a whole customer year in a
+fixed number of queries and produce exactly the same rows.
+"""
+import calendar
+from decimal import Decimal
+from functools import reduce
+from operator import or_
+
+from django.db import transaction
+from django.db.models import Q
+
+from trading.models import TradeMonthSummary
+from trading.response_cache import response_cache
+from .models import CostProjection, calculate_monthly_cost
+
+# Customer years per locking query in save_projection_grids
+GRID_CHUNK_SIZE = 300
+
+
+def get_traded_prices(customer, year):
+    """Weighted average traded price per month, read from the trade summaries.
+
+    Formula: Weighted Average = SUM(p_therm × percent) / SUM(percent)
+
+    Returns:
+        dict: {month: Decimal} for months that have trades (8 decimal places)
+    """
+    summaries = TradeMonthSummary.objects.filter(customer=customer, year=year).order_by()
+    return {summary.month: summary.traded_price for summary in summaries}
+
+
+def build_projection_rows(customer, year, prefill_consumption=True):
+    """Build the 12 projection rows for a customer year.
+
+    Months without a saved projection get zero charges; when
+    prefill_consumption is set their consumption is copied from the same
+    month of the previous year.
+
+    Returns:
+        list: 12 row dicts (month, no_of_days, st_charge, consumption,
+              flex_rate, traded_price, cost)
+    """
+    return build_projection_years(customer, [year], prefill_consumption)[year]
+
+
+def build_projection_years(customer, years, prefill_consumption=True):
+    """Build the projection rows for several years of a customer in two queries.
+
+    Returns:
+        dict: {year: rows} with rows as returned by build_projection_rows
+    """
+    years = list(years)
+    load_years = set(years)
+    if prefill_consumption:
+        load_years |= {year - 1 for year in years}
+    projections = {
+        (projection.year, projection.month): projection
+        for projection in CostProjection.objects.filter(customer=customer, year__in=load_years).order_by()
+    }
+    traded_prices = {
+        (summary.year, summary.month): summary.traded_price
+        for summary in TradeMonthSummary.objects.filter(customer=customer, year__in=years).order_by()
+    }
+
+    grids = {}
+    for year in years:
+        rows = []
+        for month in range(1, 13):
+            no_of_days = calendar.monthrange(year, month)[1]
+            traded_price = traded_prices.get((year, month), Decimal('0'))
+
+            projection = projections.get((year, month))
+            if projection:
+                st_charge = projection.st_charge
+                consumption = projection.consumption
+                flex_rate = projection.flex_rate
+            else:
+                previous = projections.get((year - 1, month)) if prefill_consumption else None
+                st_charge = 0
+                consumption = previous.consumption if previous else 0
+                flex_rate = 0
+
+            rows.append({
+                'month': month,
+                'no_of_days': no_of_days,
+                'st_charge': st_charge,
+                'consumption': consumption,
+                'flex_rate': flex_rate,
+                'traded_price': traded_price,
+                'cost': calculate_monthly_cost(year, month, st_charge, consumption, flex_rate, traded_price),
+            })
+        grids[year] = rows
+
+    return grids
+
+
+def save_projection_grids(grids):
+    """Upsert projection months for one or more customer years in one batch.
+
+    Args:
+        grids: iterable of (customer, year, projections) where projections is
+               the list of month dicts posted by the projection grid
+
+    Rows are written with a single INSERT ... ON CONFLICT DO UPDATE keyed on
+    unique_projection_per_customer_month_year, inside one transaction.
+
+    Returns:
+        dict: {(customer_id, year): (created_count, updated_count)}
+    """
+    projections = {}
+    for customer, year, projections_data in grids:
+        for proj_data in projections_data:
+            month = proj_data.get('month')
+            if not month or month < 1 or month > 12:
+                continue
+            month = int(month)
+
+            # Only the editable fields are stored; traded_price and cost are derived
+            projections[(customer.id, year, month)] = CostProjection(
+                customer=customer,
+                year=year,
+                month=month,
+                st_charge=proj_data.get('st_charge', 0) or 0,
+                consumption=proj_data.get('consumption', 0) or 0,
+                flex_rate=proj_data.get('flex_rate', 0) or 0,
+            )
+
+    counts = {(customer.id, year): (0, 0) for customer, year, _ in grids}
+    if not projections:
+        return counts
+
+    with transaction.atomic():
+        # Lock only the posted customer years, not every year of every posted
+        # customer; in chunks, as SQLite caps how deep an OR can nest
+        grid_keys = sorted({(customer_id, year) for customer_id, year, _ in projections})
+        existing = set()
+        for start in range(0, len(grid_keys), GRID_CHUNK_SIZE):
+            existing.update(
+                CostProjection.objects
+                .select_for_update()
+                .filter(reduce(or_, (
+                    Q(customer_id=customer_id, year=year)
+                    for customer_id, year in grid_keys[start:start + GRID_CHUNK_SIZE]
+                )))
+                .order_by()
+                .values_list('customer_id', 'year', 'month')
+            )
+        CostProjection.objects.bulk_create(
+            projections.values(),
+            batch_size=1000,
+            update_conflicts=True,
+            unique_fields=['customer', 'year', 'month'],
+            update_fields=['st_charge', 'consumption', 'flex_rate', 'updated_at'],
+        )
+        # bulk_create sends no signals
+        response_cache.invalidate_many((customer_id, year) for customer_id, year, _ in projections)
+
+    for customer_id, year, month in projections:
+        created_count, updated_count = counts[(customer_id, year)]
+        if (customer_id, year, month) in existing:
+            counts[(customer_id, year)] = (created_count, updated_count + 1)
+        else:
+            counts[(customer_id, year)] = (created_count + 1, updated_count)
+    return counts
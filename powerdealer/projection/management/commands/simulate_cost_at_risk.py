@@ -0,0 +1,76 @@
+import json
+import logging
+import math
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.utils.encoders import JSONEncoder
+
+from trading.models import Business
+from projection.costing import load_portfolio_inputs
+from projection.models import ForwardCurve
+from projection.simulation import cost_at_risk, load_forward_prices
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Simulate annual cost percentiles (P50/P95/P99) for every customer of a business.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--business', type=int, required=True, help='Business id.')
+        parser.add_argument('--year', type=int, required=True, help='Projection year.')
+        parser.add_argument('--curve', type=int, help='Forward curve id (defaults to the latest).')
+        parser.add_argument('--base-price', type=float, help='Flat p/therm price for months missing from the curve.')
+        parser.add_argument('--vol', type=float, default=0.5, help='Annualised price volatility.')
+        parser.add_argument('--correlation', type=float, default=0.9, help='Correlation between delivery months.')
+        parser.add_argument('--paths', type=int, default=10000, help='Number of simulated price paths.')
+        parser.add_argument('--seed', type=int, help='Random seed for reproducible results.')
+        parser.add_argument('--workers', type=int, default=0, help='Worker processes (0 = one per CPU core).')
+        parser.add_argument('--output', help='Write the JSON report to this file instead of stdout.')
+
+    def handle(self, *args, **options):
+        try:
+            business = Business.objects.get(id=options['business'])
+        except Business.DoesNotExist:
+            raise CommandError(f"Business {options['business']} not found.")
+
+        if not all(math.isfinite(options[name] or 0) for name in ('vol', 'correlation', 'base_price')):
+            raise CommandError('vol, correlation and base-price must be finite numbers.')
+        if options['vol'] <= 0 or not 0 <= options['correlation'] < 1 or options['paths'] < 1:
+            raise CommandError('vol must be positive, correlation between 0 and 1, and paths at least 1.')
+
+        curves = ForwardCurve.objects.filter(business=business)
+        curve = curves.filter(id=options['curve']).first() if options['curve'] else curves.first()
+        if options['curve'] and not curve:
+            raise CommandError(f"Forward curve {options['curve']} not found.")
+
+        year = options['year']
+        try:
+            forward_prices = load_forward_prices(curve, year, options['base_price'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        customers, inputs = load_portfolio_inputs(business, year)
+        report = cost_at_risk(
+            customers,
+            inputs,
+            year,
+            forward_prices,
+            curve.as_of_date if curve else date.today(),
+            options['vol'],
+            options['correlation'],
+            options['paths'],
+            options['seed'],
+            options['workers'],
+        )
+        report['business_id'] = business.id
+
+        output = json.dumps(report, cls=JSONEncoder, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output)
+        else:
+            self.stdout.write(output)
+
+        logger.info(f"Cost at risk simulated for business {business.id}, year {year}: {len(customers)} customers")
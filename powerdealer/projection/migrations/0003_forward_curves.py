@@ -0,0 +1,51 @@
+# Generated by Django 5.2.11 on 2026-10-18 15:02
+
+import django.core.validators
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projection', '0002_remove_traded_price_and_cost_fields'),
+        ('trading', '0006_trademonthsummary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ForwardCurve',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(default='Gas', max_length=100)),
+                ('as_of_date', models.DateField(verbose_name='As-of Date')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('business', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='forward_curves', to='trading.business')),
+            ],
+            options={
+                'ordering': ['-as_of_date', '-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ForwardCurvePoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.PositiveSmallIntegerField(validators=[django.core.validators.MinValueValidator(2000), django.core.validators.MaxValueValidator(2100)])),
+                ('month', models.PositiveSmallIntegerField(validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(12)])),
+                ('price', models.DecimalField(decimal_places=4, max_digits=10, validators=[django.core.validators.MinValueValidator(0)], verbose_name='Price per Thermal Unit')),
+                ('curve', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='points', to='projection.forwardcurve')),
+            ],
+            options={
+                'ordering': ['year', 'month'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='forwardcurve',
+            constraint=models.UniqueConstraint(fields=('business', 'name', 'as_of_date'), name='unique_forward_curve_per_business_as_of'),
+        ),
+        migrations.AddConstraint(
+            model_name='forwardcurvepoint',
+            constraint=models.UniqueConstraint(fields=('curve', 'year', 'month'), name='unique_forward_curve_point_per_month'),
+        ),
+    ]
@@ -2,10 +2,37 @@ from django.db import models
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.db.models import Sum
 from decimal import Decimal
-from trading.models import Customer, Trade
+from trading.models import Business, Customer, TradeMonthSummary
 import calendar
 
 
+# kWh per therm, used to convert traded prices (p/therm) into p/kWh
+KWH_PER_THERM = Decimal('29.3071')
+
+
+def calculate_monthly_cost(year, month, st_charge, consumption, flex_rate, traded_price):
+    """Calculate the cost of one projection month from its raw inputs.
+
+    Shared by CostProjection.cost and the set-based grid builders so both
+    produce exactly the same figures.
+
+    Returns:
+        Decimal: Monthly cost in pounds (2 decimal places)
+    """
+    no_of_days = calendar.monthrange(year, month)[1]
+
+    # Convert pence to pounds
+    # Standing charge component: (p/day × days) / 100
+    st_charge_component = Decimal(st_charge) * Decimal(no_of_days) / Decimal('100')
+
+    # Unit consumption component: (kWh × (flex_rate + traded_price/29.3071)) / 100
+    traded_price_per_kwh = traded_price / KWH_PER_THERM
+    unit_component = (Decimal(consumption) * (Decimal(flex_rate) + Decimal(traded_price_per_kwh))) / Decimal('100')
+
+    total_cost = Decimal(st_charge_component) + Decimal(unit_component)
+    return round(total_cost, 2)
+
+
 class CostProjection(models.Model):
     """Cost projection model for monthly gas cost calculations per customer"""
     customer = models.ForeignKey(
@@ -57,24 +84,21 @@ class CostProjection(models.Model):
 
     @property
     def traded_price(self):
-        """Calculate weighted average traded price from Trade model dynamically.
+        """Weighted average traded price for this month, read from the trade summary.
         
         Formula: Weighted Average = SUM(p_therm × percent) / SUM(percent)
         
         Returns:
             Decimal: Weighted average traded price in p/therm (8 decimal places)
         """
-        trades = Trade.objects.filter(
-            customer=self.customer,
+        summary = TradeMonthSummary.objects.filter(
+            customer_id=self.customer_id,
             year=self.year,
             month=self.month
-        )
+        ).first()
         
-        total_weighted_price = sum(t.p_therm * t.percent for t in trades)
-        total_percent = sum(t.percent for t in trades)
-        
-        if total_percent > 0:
-            return round(total_weighted_price / total_percent, 8)
+        if summary:
+            return summary.traded_price
         return Decimal('0')
 
     @property
@@ -87,22 +111,9 @@ class CostProjection(models.Model):
         Returns:
             Decimal: Monthly cost in pounds (2 decimal places)
         """
-        # Get number of days in the month for the given year
-        no_of_days = calendar.monthrange(self.year, self.month)[1]
-        
-        # Get traded price dynamically
-        tp = self.traded_price
-        
-        # Convert pence to pounds
-        # Standing charge component: (p/day × days) / 100
-        st_charge_component = Decimal(self.st_charge) * Decimal(self.no_of_days) / Decimal('100')
-        
-        # Unit consumption component: (kWh × (flex_rate + traded_price/29.3071)) / 100
-        traded_price_per_kwh = tp / Decimal('29.3071')
-        unit_component = (Decimal(self.consumption) * (Decimal(self.flex_rate) + Decimal(traded_price_per_kwh))) / Decimal('100')
-        
-        total_cost = Decimal(st_charge_component) + Decimal(unit_component)
-        return round(total_cost, 2)
+        return calculate_monthly_cost(
+            self.year, self.month, self.st_charge, self.consumption, self.flex_rate, self.traded_price
+        )
 
     @property
     def no_of_days(self):
@@ -112,3 +123,61 @@ class CostProjection(models.Model):
             int: Number of days (handles leap years)
         """
         return calendar.monthrange(self.year, self.month)[1]
+
+
+class ForwardCurve(models.Model):
+    """Market forward price curve for a business, versioned by as-of date"""
+    business = models.ForeignKey(
+        Business,
+        on_delete=models.CASCADE,
+        related_name='forward_curves'
+    )
+    name = models.CharField(max_length=100, default='Gas')
+    as_of_date = models.DateField(verbose_name='As-of Date')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-as_of_date', '-created_at']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['business', 'name', 'as_of_date'],
+                name='unique_forward_curve_per_business_as_of',
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.name} curve as of {self.as_of_date}"
+
+
+class ForwardCurvePoint(models.Model):
+    """Forward price for one delivery month of a curve"""
+    curve = models.ForeignKey(
+        ForwardCurve,
+        on_delete=models.CASCADE,
+        related_name='points'
+    )
+    year = models.PositiveSmallIntegerField(
+        validators=[MinValueValidator(2000), MaxValueValidator(2100)]
+    )
+    month = models.PositiveSmallIntegerField(
+        validators=[MinValueValidator(1), MaxValueValidator(12)]
+    )
+    price = models.DecimalField(
+        max_digits=10,
+        decimal_places=4,
+        verbose_name='Price per Thermal Unit',
+        validators=[MinValueValidator(0)]
+    )
+
+    class Meta:
+        ordering = ['year', 'month']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['curve', 'year', 'month'],
+                name='unique_forward_curve_point_per_month',
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.curve} - {self.month}/{self.year}: {self.price}"
@@ -1,11 +1,12 @@
 from rest_framework import serializers
 from django.db.models import Sum
-from .models import CostProjection
+from .models import CostProjection, ForwardCurve, ForwardCurvePoint
 from trading.models import Customer, Trade
+from trading.serializers import TimedSerializerMixin
 import calendar
 
 
-class CostProjectionSerializer(serializers.ModelSerializer):
+class CostProjectionSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Serializer for CostProjection model"""
     customer_id = serializers.PrimaryKeyRelatedField(
         queryset=Customer.objects.all(),
@@ -68,6 +69,18 @@ class CostProjectionBulkSerializer(serializers.Serializer):
         return value
 
 
+class CostProjectionBatchSerializer(serializers.Serializer):
+    """Serializer for saving many customers' 12-month projections in one request"""
+    MAX_GRIDS = 2000
+
+    grids = CostProjectionBulkSerializer(many=True, allow_empty=False)
+
+    def validate_grids(self, value):
+        if len(value) > self.MAX_GRIDS:
+            raise serializers.ValidationError(f"At most {self.MAX_GRIDS} grids can be saved per request.")
+        return value
+
+
 class ProjectionRowSerializer(serializers.Serializer):
     """Serializer for individual projection row in the grid"""
     month = serializers.IntegerField(min_value=1, max_value=12)
@@ -94,3 +107,50 @@ class ProjectionResponseSerializer(serializers.Serializer):
     mprn = serializers.CharField()
     year = serializers.IntegerField()
     rows = ProjectionRowSerializer(many=True)
+
+
+class ForwardCurvePointSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    """Serializer for one delivery month of a forward curve"""
+
+    class Meta:
+        model = ForwardCurvePoint
+        fields = ['year', 'month', 'price']
+
+
+class ForwardCurveSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    """Serializer for a forward curve with its monthly prices"""
+    points = ForwardCurvePointSerializer(many=True)
+
+    class Meta:
+        model = ForwardCurve
+        fields = ['id', 'name', 'as_of_date', 'points', 'created_at', 'updated_at']
+        read_only_fields = ['created_at', 'updated_at']
+
+    def validate_points(self, value):
+        if not value:
+            raise serializers.ValidationError("At least one monthly price is required.")
+        months = [(point['year'], point['month']) for point in value]
+        if len(set(months)) != len(months):
+            raise serializers.ValidationError("Each delivery month can only appear once.")
+        return value
+
+    def validate(self, attrs):
+        business = self.context.get('business')
+        if business and ForwardCurve.objects.filter(
+            business=business,
+            name=attrs.get('name', 'Gas'),
+            as_of_date=attrs['as_of_date'],
+        ).exists():
+            raise serializers.ValidationError({'as_of_date': 'A curve with this name and as-of date already exists.'})
+        return attrs
+
+    def create(self, validated_data):
+        from django.db import transaction
+
+        points = validated_data.pop('points')
+        with transaction.atomic():
+            curve = ForwardCurve.objects.create(business=self.context['business'], **validated_data)
+            ForwardCurvePoint.objects.bulk_create(
+                [ForwardCurvePoint(curve=curve, **point) for point in points]
+            )
+        return curve
@@ -2,19 +2,33 @@ from django.urls import path
 from .views import (
     ProjectionListCreateView, 
     ProjectionDetailView,
+    PortfolioCostView,
+    PriceSensitivityView,
+    CostAtRiskView,
     CustomerDashboardDataView,
+    CustomerDashboardBundleView,
     CustomerTradingDataView,
     CustomerProjectionDataView,
-    CalculateCostView
+    CalculateCostView,
+    CalculateCostScenariosView,
+    ForwardCurveListCreateView,
+    ValuationView,
 )
 
 urlpatterns = [
     path('projection/', ProjectionListCreateView.as_view(), name='projection-list-create'),
+    path('projection/portfolio/', PortfolioCostView.as_view(), name='projection-portfolio'),
+    path('projection/sensitivity/', PriceSensitivityView.as_view(), name='projection-sensitivity'),
+    path('projection/cost-at-risk/', CostAtRiskView.as_view(), name='projection-cost-at-risk'),
     path('projection/<int:projection_id>/', ProjectionDetailView.as_view(), name='projection-detail'),
+    path('forward-curves/', ForwardCurveListCreateView.as_view(), name='forward-curve-list-create'),
+    path('valuation/', ValuationView.as_view(), name='valuation'),
     
     # Customer Dashboard endpoints
+    path('customer-dashboard/', CustomerDashboardBundleView.as_view(), name='customer-dashboard'),
     path('customer-dashboard-data/', CustomerDashboardDataView.as_view(), name='customer-dashboard-data'),
     path('customer-trading-data/', CustomerTradingDataView.as_view(), name='customer-trading-data'),
     path('customer-projection-data/', CustomerProjectionDataView.as_view(), name='customer-projection-data'),
     path('calculate-cost/', CalculateCostView.as_view(), name='calculate-cost'),
+    path('calculate-cost/scenarios/', CalculateCostScenariosView.as_view(), name='calculate-cost-scenarios'),
 ]
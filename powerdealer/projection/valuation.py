@@ -0,0 +1,143 @@
+"""
+Mark-to-market valuation of booked trades against a forward curve.
+
+Every trade of a business is valued in one pass over columnar NumPy
+arrays (no per-row model instances):
+
+    Hedged volume (therms) = Consumption (kWh) / 29.3071 × Percent / 100
+    P&L (£)                = (Market Price - P/Therm) × Hedged volume / 100
+
+Consumption comes from the customer's CostProjection for the delivery
+month; trades without a projection carry no volume and value at zero.
+Trades whose delivery month is not on the curve are reported as unpriced.
+"""
+import numpy as np
+
+from trading.models import Customer, Trade
+from .costing import KWH_PER_THERM_FLOAT
+from .models import CostProjection, ForwardCurvePoint
+
+
+def _periods(years, months):
+    """Months since year 0, so (year, month) pairs sort and compare as one integer."""
+    return years * 12 + months - 1
+
+
+def _lookup(sorted_keys, sorted_values, keys):
+    """Vectorized dict lookup: values for keys, plus a mask of keys that were found."""
+    if not len(sorted_keys):
+        return np.zeros(len(keys)), np.zeros(len(keys), dtype=bool)
+    positions = np.clip(np.searchsorted(sorted_keys, keys), 0, len(sorted_keys) - 1)
+    found = sorted_keys[positions] == keys
+    return np.where(found, sorted_values[positions], 0.0), found
+
+
+def value_trades(business, curve):
+    """Mark every trade of a business against a forward curve.
+
+    Uses four queries regardless of the number of trades.
+
+    Returns:
+        dict: totals plus per-customer and per-delivery-month P&L
+    """
+    trade_rows = list(
+        Trade.objects
+        .filter(customer__business=business)
+        .order_by()
+        .values_list('customer_id', 'year', 'month', 'p_therm', 'percent')
+    )
+    trades = np.array(trade_rows, dtype=float).reshape(-1, 5).T
+    customer_ids = trades[0].astype(np.int64)
+    periods = _periods(trades[1].astype(np.int64), trades[2].astype(np.int64))
+    p_therm = trades[3]
+    percent = trades[4]
+
+    # Market price per trade from the curve
+    curve_rows = np.array(
+        list(
+            ForwardCurvePoint.objects
+            .filter(curve=curve)
+            .order_by('year', 'month')
+            .values_list('year', 'month', 'price')
+        ),
+        dtype=float,
+    ).reshape(-1, 3).T
+    curve_periods = _periods(curve_rows[0].astype(np.int64), curve_rows[1].astype(np.int64))
+    market_price, priced = _lookup(curve_periods, curve_rows[2], periods)
+
+    # Projected consumption per trade, keyed on (customer, delivery month)
+    years = np.unique(trades[1]).astype(np.int64).tolist()
+    projection_rows = np.array(
+        list(
+            CostProjection.objects
+            .filter(customer__business=business, year__in=years)
+            .order_by()
+            .values_list('customer_id', 'year', 'month', 'consumption')
+        ),
+        dtype=float,
+    ).reshape(-1, 4).T
+    key_base = 12 * 10000  # larger than any period, so keys never collide
+    projection_keys = (
+        projection_rows[0].astype(np.int64) * key_base
+        + _periods(projection_rows[1].astype(np.int64), projection_rows[2].astype(np.int64))
+    )
+    order = np.argsort(projection_keys)
+    consumption, _ = _lookup(
+        projection_keys[order], projection_rows[3][order], customer_ids * key_base + periods
+    )
+
+    hedged_therms = consumption / KWH_PER_THERM_FLOAT * percent / 100
+    pnl = np.where(priced, (market_price - p_therm) * hedged_therms / 100, 0.0)
+
+    # Roll up by customer and by delivery month
+    customer_keys, customer_index = np.unique(customer_ids, return_inverse=True)
+    customer_pnl = np.bincount(customer_index, weights=pnl, minlength=len(customer_keys))
+    customer_therms = np.bincount(customer_index, weights=hedged_therms, minlength=len(customer_keys))
+    customer_trades = np.bincount(customer_index, minlength=len(customer_keys))
+
+    period_keys, period_index = np.unique(periods, return_inverse=True)
+    period_pnl = np.bincount(period_index, weights=pnl, minlength=len(period_keys))
+    period_therms = np.bincount(period_index, weights=hedged_therms, minlength=len(period_keys))
+    period_price, period_priced = _lookup(curve_periods, curve_rows[2], period_keys)
+
+    mprns = dict(
+        Customer.objects
+        .filter(id__in=customer_keys.tolist())
+        .order_by()
+        .values_list('id', 'mprn')
+    )
+
+    return {
+        'curve': {
+            'id': curve.id,
+            'name': curve.name,
+            'as_of_date': curve.as_of_date,
+        },
+        'trade_count': len(trade_rows),
+        'unpriced_trade_count': int((~priced).sum()),
+        'total_pnl': round(float(pnl.sum()), 2),
+        'customers': [
+            {
+                'customer_id': int(customer_id),
+                'mprn': mprns.get(int(customer_id)),
+                'trade_count': int(count),
+                'hedged_therms': round(float(therms), 2),
+                'pnl': round(float(value), 2),
+            }
+            for customer_id, count, therms, value in zip(
+                customer_keys, customer_trades, customer_therms, customer_pnl
+            )
+        ],
+        'months': [
+            {
+                'year': int(period // 12),
+                'month': int(period % 12) + 1,
+                'market_price': float(price) if is_priced else None,
+                'hedged_therms': round(float(therms), 2),
+                'pnl': round(float(value), 2),
+            }
+            for period, price, is_priced, therms, value in zip(
+                period_keys, period_price, period_priced, period_therms, period_pnl
+            )
+        ],
+    }
@@ -4,18 +4,39 @@ from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
 from django.contrib.auth.models import User
-from django.db.models import Max
+from django.db.models import Max, Value
 import calendar
+import math
+from datetime import date
 from decimal import Decimal
 
-from .models import CostProjection
+import numpy as np
+
+from .models import CostProjection, ForwardCurve
+from .costing import (
+    evaluate_scenarios,
+    load_customer_inputs,
+    parse_scenarios,
+    portfolio_rollup,
+    price_points,
+    price_sensitivity,
+)
+from .grid import build_projection_rows, build_projection_years, get_traded_prices, save_projection_grids
+from .simulation import cost_at_risk, load_forward_prices
+from .valuation import value_trades
 from .serializers import (
     CostProjectionSerializer, 
     CostProjectionBulkSerializer,
+    CostProjectionBatchSerializer,
+    ForwardCurveSerializer,
     ProjectionRowSerializer,
     ProjectionResponseSerializer
 )
-from trading.models import Customer, Business, Trade
+from trading.authentication import ROLE_CUSTOMER
+from trading.conditional import collection_validators
+from trading.models import Customer, Trade, TradeMonthSummary
+from trading.response_cache import response_cache
+from trading.tenant import get_business, get_tenant
 
 logger = logging.getLogger(__name__)
 
@@ -25,21 +46,7 @@ class ProjectionMixin:
     
     def _get_business(self, request):
         """Get business for authenticated user."""
-        if not request.user.is_authenticated:
-            return None, Response({
-                'success': False,
-                'message': 'Login required.',
-                'errors': {}
-            }, status=status.HTTP_401_UNAUTHORIZED)
-        try:
-            business = request.user.business
-        except Business.DoesNotExist:
-            return None, Response({
-                'success': False,
-                'message': 'Business not found.',
-                'errors': {}
-            }, status=status.HTTP_404_NOT_FOUND)
-        return business, None
+        return get_business(request)
 
     def _get_customer(self, request, mprn):
         """Get customer by MPRN scoped to user's business."""
@@ -57,19 +64,6 @@ class ProjectionMixin:
             }, status=status.HTTP_404_NOT_FOUND)
         return customer, None
 
-    def _get_prefilled_consumption(self, customer, year, month):
-        """Get prefilled consumption from previous year (year - 1) for same month."""
-        previous_year = year - 1
-        try:
-            projection = CostProjection.objects.get(
-                customer=customer,
-                year=previous_year,
-                month=month
-            )
-            return projection.consumption
-        except CostProjection.DoesNotExist:
-            return 0
-
 
 class ProjectionListCreateView(APIView, ProjectionMixin):
     """List and create cost projections."""
@@ -106,53 +100,26 @@ class ProjectionListCreateView(APIView, ProjectionMixin):
         if error_response:
             return error_response
         
-        # Get or create projections for all 12 months
-        # Note: traded_price and cost are now calculated dynamically via model properties
-        rows = []
-        for month in range(1, 13):
-            no_of_days = calendar.monthrange(year, month)[1]
-            
-            try:
-                projection = CostProjection.objects.get(
-                    customer=customer,
-                    year=year,
-                    month=month
-                )
-                # Access properties to get dynamically calculated values
-                row = {
-                    'month': month,
-                    'no_of_days': no_of_days,
-                    'st_charge': projection.st_charge,
-                    'consumption': projection.consumption,
-                    'flex_rate': projection.flex_rate,
-                    'traded_price': projection.traded_price,  # Calculated dynamically from Trade model
-                    'cost': projection.cost  # Calculated dynamically
-                }
-            except CostProjection.DoesNotExist:
-                # Get prefilled consumption from previous year
-                consumption = self._get_prefilled_consumption(customer, year, month)
-                
-                # Create a temporary instance to calculate dynamic values
-                temp_projection = CostProjection(
-                    customer=customer,
-                    year=year,
-                    month=month,
-                    st_charge=0,
-                    consumption=consumption,
-                    flex_rate=0
-                )
-                
-                row = {
-                    'month': month,
-                    'no_of_days': no_of_days,
-                    'st_charge': 0,
-                    'consumption': consumption,
-                    'flex_rate': 0,
-                    'traded_price': temp_projection.traded_price,  # Calculated dynamically
-                    'cost': temp_projection.cost  # Calculated dynamically
-                }
-            
-            rows.append(row)
+        validators = collection_validators(
+            [
+                CostProjection.objects.filter(customer=customer, year__in=[year - 1, year]),
+                TradeMonthSummary.objects.filter(customer=customer, year=year),
+                # Touched when a projection is deleted
+                Customer.objects.filter(pk=customer.id),
+            ],
+            customer.id, year,
+        )
+        not_modified = validators.not_modified(request)
+        if not_modified:
+            return not_modified
+        
+        # All 12 months are built from a fixed number of queries;
+        # traded_price and cost are calculated from the Trade model.
+        # Consumption is prefilled from the previous year, so both years count.
+        rows = response_cache.get_or_set(
+            'projection-rows', customer, [year - 1, year],
+            lambda: build_projection_rows(customer, year),
+        )
         
         response_data = {
             'mprn': mprn,
@@ -160,18 +127,25 @@ class ProjectionListCreateView(APIView, ProjectionMixin):
             'rows': rows
         }
         
-        return Response({
+        return validators.apply(Response({
             'success': True,
             'message': 'Projection data retrieved successfully.',
             'data': response_data
-        })
+        }))
 
     def post(self, request):
         """Save or update projection data for 12 months.
         
+        Accepts either a single grid ({mprn, year, projections}) or many
+        customers' grids at once ({grids: [{mprn, year, projections}, ...]}).
+        All months are written in one atomic batch.
+        
         Note: Only st_charge, consumption, and flex_rate are stored.
         traded_price and cost are calculated dynamically from Trade model.
         """
+        if 'grids' in request.data:
+            return self._save_batch(request)
+        
         serializer = CostProjectionBulkSerializer(data=request.data)
         if not serializer.is_valid():
             return Response({
@@ -188,37 +162,8 @@ class ProjectionListCreateView(APIView, ProjectionMixin):
         if error_response:
             return error_response
         
-        # Process each month's projection
-        # Note: traded_price and cost are NOT stored - they're calculated dynamically
-        created_count = 0
-        updated_count = 0
-        
-        for proj_data in projections_data:
-            month = proj_data.get('month')
-            if not month or month < 1 or month > 12:
-                continue
-            
-            st_charge = proj_data.get('st_charge', 0) or 0
-            consumption = proj_data.get('consumption', 0) or 0
-            flex_rate = proj_data.get('flex_rate', 0) or 0
-            
-            # Create or update projection (only storing editable fields)
-            projection, created = CostProjection.objects.update_or_create(
-                customer=customer,
-                year=year,
-                month=month,
-                defaults={
-                    'st_charge': st_charge,
-                    'consumption': consumption,
-                    'flex_rate': flex_rate,
-                    # traded_price and cost are calculated dynamically via properties
-                }
-            )
-            
-            if created:
-                created_count += 1
-            else:
-                updated_count += 1
+        counts = save_projection_grids([(customer, year, projections_data)])
+        created_count, updated_count = counts[(customer.id, year)]
         
         logger.info(f"Projection saved for customer {mprn}, year {year}: {created_count} created, {updated_count} updated")
         
@@ -233,6 +178,280 @@ class ProjectionListCreateView(APIView, ProjectionMixin):
             }
         })
 
+    def _save_batch(self, request):
+        """Save many customers' projection grids in one transaction."""
+        serializer = CostProjectionBatchSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response({
+                'success': False,
+                'message': 'Please check your input.',
+                'errors': serializer.errors
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        business, error_response = self._get_business(request)
+        if error_response:
+            return error_response
+        
+        grids_data = serializer.validated_data['grids']
+        mprns = {grid['mprn'] for grid in grids_data}
+        customers = {
+            customer.mprn: customer
+            for customer in Customer.objects.filter(business=business, mprn__in=mprns)
+        }
+        missing = sorted(mprns - customers.keys())
+        if missing:
+            return Response({
+                'success': False,
+                'message': 'Customer not found.',
+                'errors': {'mprn': missing}
+            }, status=status.HTTP_404_NOT_FOUND)
+        
+        grids = [(customers[grid['mprn']], grid['year'], grid['projections']) for grid in grids_data]
+        counts = save_projection_grids(grids)
+        
+        results = []
+        seen = set()
+        for customer, year, _ in grids:
+            if (customer.id, year) in seen:
+                continue
+            seen.add((customer.id, year))
+            created_count, updated_count = counts[(customer.id, year)]
+            results.append({
+                'mprn': customer.mprn,
+                'year': year,
+                'created': created_count,
+                'updated': updated_count
+            })
+        created_total = sum(result['created'] for result in results)
+        updated_total = sum(result['updated'] for result in results)
+        
+        logger.info(f"Projection batch saved for business {business.id}: {len(results)} grids, {created_total} created, {updated_total} updated")
+        
+        return Response({
+            'success': True,
+            'message': f'Projections saved successfully. {created_total} created, {updated_total} updated.',
+            'data': {
+                'grids': results,
+                'created': created_total,
+                'updated': updated_total
+            }
+        })
+
+
+class PortfolioCostView(APIView, ProjectionMixin):
+    """Projected annual cost across all customers of the business."""
+
+    def get(self, request):
+        """Get per-customer, per-month and grand total projected cost.
+        
+        Query params:
+        - year: Year
+        """
+        business, error_response = self._get_business(request)
+        if error_response:
+            return error_response
+        
+        year_param = request.query_params.get('year')
+        if not year_param:
+            return Response({
+                'success': False,
+                'message': 'Year is required.',
+                'errors': {}
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            year = int(year_param)
+        except ValueError:
+            return Response({
+                'success': False,
+                'message': 'Year must be a valid integer.',
+                'errors': {}
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response({
+            'success': True,
+            'message': 'Portfolio cost retrieved successfully.',
+            'data': portfolio_rollup(business, year)
+        })
+
+
+class PriceSensitivityView(APIView, ProjectionMixin):
+    """Annual and monthly cost of a customer year across a range of market prices."""
+
+    MAX_PRICE_POINTS = 2001
+
+    def get(self, request):
+        """Get the cost grid for hypothetical market prices on the unhedged volume.
+        
+        Query params:
+        - mprn: Customer MPRN (10 digits)
+        - year: Year
+        - price_min: Lowest market price in p/therm (default 0)
+        - price_max: Highest market price in p/therm (default 300)
+        - price_step: Step between prices in p/therm (default 10)
+        """
+        mprn = request.query_params.get('mprn')
+        year_param = request.query_params.get('year')
+        
+        if not mprn or not year_param:
+            return Response({
+                'success': False,
+                'message': 'MPRN and year are required.',
+                'errors': {}
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            year = int(year_param)
+            price_min = float(request.query_params.get('price_min', 0))
+            price_max = float(request.query_params.get('price_max', 300))
+            price_step = float(request.query_params.get('price_step', 10))
+            if not all(math.isfinite(price) for price in (price_min, price_max, price_step)):
+                raise ValueError
+        except ValueError:
+            return Response({
+                'success': False,
+                'message': 'Year and prices must be valid numbers.',
+                'errors': {}
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        if price_min < 0 or price_max < price_min or price_step <= 0:
+            return Response({
+                'success': False,
+                'message': 'Price range must be non-negative with a positive step.',
+                'errors': {}
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        if (price_max - price_min) / price_step + 1 > self.MAX_PRICE_POINTS:
+            return Response({
+                'success': False,
+                'message': f'At most {self.MAX_PRICE_POINTS} price points can be requested.',
+                'errors': {}
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        customer, error_response = self._get_customer(request, mprn)
+        if error_response:
+            return error_response
+        
+        inputs = load_customer_inputs(customer, year)
+        if inputs is None:
+            return Response({
+                'success': False,
+                'message': 'No projection data available for the specified year.',
+                'errors': {}
+            }, status=status.HTTP_404_NOT_FOUND)
+        
+        data = price_sensitivity(year, inputs, price_points(price_min, price_max, price_step))
+        data['mprn'] = mprn
+        return Response({
+            'success': True,
+            'message': 'Price sensitivity calculated successfully.',
+            'data': data
+        })
+
+
+class CostAtRiskView(APIView, ProjectionMixin):
+    """Monte Carlo distribution of a customer's annual cost for the unhedged volume."""
+
+    MAX_PATHS = 100000
+
+    def get(self, request):
+        """Simulate annual cost percentiles for a customer year.
+        
+        Query params:
+        - mprn: Customer MPRN (10 digits)
+        - year: Year
+        - curve_id: Forward curve for the base prices (optional, defaults to the latest)
+        - base_price: Flat p/therm price for months missing from the curve (optional)
+        - vol: Annualised price volatility (default 0.5)
+        - correlation: Correlation between delivery months, 0 to <1 (default 0.9)
+        - paths: Number of simulated price paths (default 10000)
+        - seed: Random seed for reproducible results (optional)
+        """
+        mprn = request.query_params.get('mprn')
+        year_param = request.query_params.get('year')
+        
+        if not mprn or not year_param:
+            return Response({
+                'success': False,
+                'message': 'MPRN and year are required.',
+                'errors': {}
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        params = request.query_params
+        try:
+            year = int(year_param)
+            vol = float(params.get('vol', 0.5))
+            correlation = float(params.get('correlation', 0.9))
+            paths = int(params.get('paths', 10000))
+            seed = int(params['seed']) if params.get('seed') else None
+            base_price = float(params['base_price']) if params.get('base_price') else None
+            curve_id = int(params['curve_id']) if params.get('curve_id') else None
+            if not all(math.isfinite(value) for value in (vol, correlation, base_price or 0)):
+                raise ValueError
+        except ValueError:
+            return Response({
+                'success': False,
+                'message': 'Simulation parameters must be valid numbers.',
+                'errors': {}
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        if vol <= 0 or not 0 <= correlation < 1 or not 1 <= paths <= self.MAX_PATHS:
+            return Response({
+                'success': False,
+                'message': f'vol must be positive, correlation between 0 and 1, and paths between 1 and {self.MAX_PATHS}.',
+                'errors': {}
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        customer, error_response = self._get_customer(request, mprn)
+        if error_response:
+            return error_response
+        
+        curves = ForwardCurve.objects.filter(business_id=customer.business_id)
+        curve = curves.filter(id=curve_id).first() if curve_id else curves.first()
+        if curve_id and not curve:
+            return Response({
+                'success': False,
+                'message': 'Forward curve not found.',
+                'errors': {}
+            }, status=status.HTTP_404_NOT_FOUND)
+        
+        try:
+            forward_prices = load_forward_prices(curve, year, base_price)
+        except ValueError as e:
+            return Response({
+                'success': False,
+                'message': 'Please check your input.',
+                'errors': {'base_price': str(e)}
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        inputs = load_customer_inputs(customer, year)
+        if inputs is None:
+            return Response({
+                'success': False,
+                'message': 'No projection data available for the specified year.',
+                'errors': {}
+            }, status=status.HTTP_404_NOT_FOUND)
+        
+        data = cost_at_risk(
+            [(customer.id, customer.mprn, None)],
+            {key: values[np.newaxis] for key, values in inputs.items()},
+            year,
+            forward_prices,
+            curve.as_of_date if curve else date.today(),
+            vol,
+            correlation,
+            paths,
+            seed,
+        )
+        result = data.pop('customers')[0]
+        result.pop('name')
+        data.update(result)
+        return Response({
+            'success': True,
+            'message': 'Cost at risk simulated successfully.',
+            'data': data
+        })
+
 
 class ProjectionDetailView(APIView, ProjectionMixin):
     """Retrieve, update, or delete a single projection."""
@@ -321,25 +540,24 @@ class CustomerDashboardMixin:
         Returns:
             tuple: (customer, error_response)
         """
-        if not request.user.is_authenticated:
+        tenant = get_tenant(request)
+        if not tenant.is_authenticated:
             return None, Response({
                 'success': False,
                 'message': 'Login required.',
                 'errors': {}
             }, status=status.HTTP_401_UNAUTHORIZED)
         
-        # Check if user is in Customer group
-        is_customer = request.user.groups.filter(name='Customer').exists()
-        if not is_customer:
+        # Check the customer role (from the token claims, no group query)
+        if tenant.role != ROLE_CUSTOMER:
             return None, Response({
                 'success': False,
                 'message': 'This page is only for customers',
                 'errors': {}
             }, status=status.HTTP_403_FORBIDDEN)
         
-        try:
-            customer = request.user.customer
-        except Customer.DoesNotExist:
+        customer = tenant.customer
+        if customer is None:
             return None, Response({
                 'success': False,
                 'message': 'Customer profile not found.',
@@ -348,99 +566,138 @@ class CustomerDashboardMixin:
         
         return customer, None
     
+    def _get_dashboard_validators(self, request, customer):
+        """ETag/Last-Modified over everything a customer dashboard view reads.
+
+        One query over the customer's trades, trade summaries and
+        projections, plus the profile fields and params of the request.
+        """
+        return collection_validators(
+            [
+                Trade.objects.filter(customer=customer),
+                TradeMonthSummary.objects.filter(customer=customer),
+                CostProjection.objects.filter(customer=customer),
+                # Touched when a projection is deleted or the user saved;
+                # the tenant's cached customer may predate that
+                Customer.objects.filter(pk=customer.id),
+            ],
+            customer.id, customer.user.get_full_name(), customer.user.username,
+            # Default years fall back to the current year
+            date.today().year, sorted(request.query_params.lists()),
+        )
+
+    def _get_available_years(self, customer):
+        """Years with trades and years with projections, newest first.
+
+        Returns:
+            tuple: (trading_years, projection_years) as lists
+        """
+        # One UNION query, tagging each year with the table it came from
+        years = (
+            Trade.objects.filter(customer=customer).order_by()
+            .values_list('year', Value('trading'))
+            .union(
+                CostProjection.objects.filter(customer=customer).order_by()
+                .values_list('year', Value('projection'))
+            )
+        )
+        trading_years = []
+        projection_years = []
+        for year, source in sorted(years, reverse=True):
+            (trading_years if source == 'trading' else projection_years).append(year)
+        return trading_years, projection_years
+
+    def _get_default_years(self, trading_years, projection_years):
+        """Default trading, previous and current years for the dashboard.
+
+        Trading: max year with trading data
+        Previous Year: max trading year, or max projection year - 1
+        Current Year: latest available projection year
+        """
+        max_trading_year = trading_years[0] if trading_years else None
+        max_projection_year = projection_years[0] if projection_years else None
+
+        previous_year = None
+        if max_trading_year:
+            previous_year = max_trading_year
+        elif max_projection_year:
+            previous_year = max_projection_year - 1
+
+        return {
+            'trading_year': max_trading_year,
+            'previous_year': previous_year,
+            'current_year': max_projection_year
+        }
+
+    def _get_customer_info(self, customer):
+        return {
+            'id': customer.id,
+            'mprn': customer.mprn,
+            'name': customer.user.get_full_name() or customer.user.username
+        }
+
     def _get_projection_rows(self, customer, year):
-        """Get projection rows for a specific customer and year."""
-        rows = []
-        for month in range(1, 13):
-            no_of_days = calendar.monthrange(year, month)[1]
-            
-            try:
-                projection = CostProjection.objects.get(
-                    customer=customer,
-                    year=year,
-                    month=month
-                )
-                row = {
-                    'month': month,
-                    'no_of_days': no_of_days,
-                    'st_charge': projection.st_charge,
-                    'consumption': projection.consumption,
-                    'flex_rate': projection.flex_rate,
-                    'traded_price': projection.traded_price,
-                    'cost': projection.cost
-                }
-            except CostProjection.DoesNotExist:
-                # Create empty row with defaults
-                temp_projection = CostProjection(
-                    customer=customer,
-                    year=year,
-                    month=month,
-                    st_charge=0,
-                    consumption=0,
-                    flex_rate=0
-                )
-                row = {
-                    'month': month,
-                    'no_of_days': no_of_days,
-                    'st_charge': 0,
-                    'consumption': 0,
-                    'flex_rate': 0,
-                    'traded_price': temp_projection.traded_price,
-                    'cost': temp_projection.cost
-                }
-            
-            rows.append(row)
-        
-        return rows
+        """Get projection rows for a specific customer and year (response-cached)."""
+        return response_cache.get_or_set(
+            'customer-projection-rows', customer, [year],
+            lambda: build_projection_rows(customer, year, prefill_consumption=False),
+        )
+
+    def _get_cached_trading_pivot_data(self, customer, year):
+        """_get_trading_pivot_data through the response cache."""
+        return response_cache.get_or_set(
+            'customer-trading-pivot', customer, [year],
+            lambda: self._get_trading_pivot_data(customer, year),
+            profile=True,
+        )
     
     def _get_trading_pivot_data(self, customer, year):
-        """Get trading pivot data for a specific customer and year."""
-        from trading.serializers import TradeSerializer
-        
+        """Get trading pivot data for a specific customer and year.
+
+        One trades query (read through the values() row builder) grouped by
+        month in a single pass, plus the year's monthly trade summaries.
+        """
+        from trading.fast_serializers import MONTH_NAMES, TRADE_COLUMNS, RowBuilder
+
         # Get all trades for this customer and year
         trades = Trade.objects.filter(
             customer=customer,
             year=year
         ).order_by('month', 'trade_no')
-        
-        # Serialize trades
-        trade_serializer = TradeSerializer(trades, many=True)
-        
-        # Build pivot data structure
-        months = [
-            'January', 'February', 'March', 'April', 'May', 'June',
-            'July', 'August', 'September', 'October', 'November', 'December'
-        ]
-        
-        # Get all trade numbers for this year
-        trade_numbers = sorted(trades.values_list('trade_no', flat=True).distinct())
-        
+
+        trades_by_month = {month_num: [] for month_num in range(1, 13)}
+        trade_numbers = set()
+        for trade in RowBuilder(TRADE_COLUMNS).rows(trades):
+            trades_by_month[trade['month']].append(trade)
+            trade_numbers.add(trade['trade_no'])
+
+        # Monthly totals come from the maintained trade summaries
+        summaries = {
+            summary.month: summary
+            for summary in TradeMonthSummary.objects.filter(customer=customer, year=year).order_by()
+        }
+
         # Build pivot structure by month
         pivot_data = []
         for month_num in range(1, 13):
-            month_trades = trades.filter(month=month_num)
-            month_trades_serialized = TradeSerializer(month_trades, many=True).data
-            
-            # Calculate totals for this month
-            total_percent = sum(float(t.get('percent', 0) or 0) for t in month_trades_serialized)
-            
-            # Calculate weighted average price
-            weighted_sum = sum(
-                float(t.get('p_therm', 0) or 0) * float(t.get('percent', 0) or 0) 
-                for t in month_trades_serialized
-            )
-            avg_price = weighted_sum / total_percent if total_percent > 0 else 0
-            
+            summary = summaries.get(month_num)
+
+            # Totals for this month, in Decimal like TradingPivotView
+            total_percent = summary.total_percent if summary and summary.trade_count else 0
+
+            # Weighted average price
+            avg_price = round(summary.traded_price, 4) if total_percent > 0 else 0
+
             pivot_data.append({
                 'month': month_num,
-                'month_name': months[month_num - 1],
-                'trades': month_trades_serialized,
-                'total_percent': round(total_percent, 2),
-                'avg_price': round(avg_price, 4)
+                'month_name': MONTH_NAMES[month_num],
+                'trades': trades_by_month[month_num],
+                'total_percent': total_percent,
+                'avg_price': avg_price
             })
-        
+
         return {
-            'trade_numbers': list(trade_numbers),
+            'trade_numbers': sorted(trade_numbers),
             'months': pivot_data
         }
 
@@ -459,53 +716,23 @@ class CustomerDashboardDataView(APIView, CustomerDashboardMixin):
         if error_response:
             return error_response
         
-        # Get available trading years (years with trade data)
-        trading_years = Trade.objects.filter(
-            customer=customer
-        ).values_list('year', flat=True).distinct().order_by('-year')
+        validators = self._get_dashboard_validators(request, customer)
+        not_modified = validators.not_modified(request)
+        if not_modified:
+            return not_modified
         
-        # Get available projection years
-        projection_years = CostProjection.objects.filter(
-            customer=customer
-        ).values_list('year', flat=True).distinct().order_by('-year')
-        
-        # Get max year for trading (default)
-        max_trading_year = trading_years.first() if trading_years else None
-        
-        # Get max year for projection (latest available)
-        max_projection_year = projection_years.first() if projection_years else None
-        
-        # Determine default years
-        # Trading: max year with trading data
-        # Previous Year: last completed year (max trading year - 1 or max projection year - 1)
-        # Current Year: latest available projection year
-        
-        previous_year = None
-        if max_trading_year:
-            previous_year = max_trading_year
-        elif max_projection_year:
-            previous_year = max_projection_year - 1
-        
-        current_year = max_projection_year
-        
-        return Response({
+        trading_years, projection_years = self._get_available_years(customer)
+
+        return validators.apply(Response({
             'success': True,
             'message': 'Customer dashboard data retrieved successfully.',
             'data': {
-                'customer': {
-                    'id': customer.id,
-                    'mprn': customer.mprn,
-                    'name': customer.user.get_full_name() or customer.user.username
-                },
-                'trading_years': list(trading_years),
-                'projection_years': list(projection_years),
-                'defaults': {
-                    'trading_year': max_trading_year,
-                    'previous_year': previous_year,
-                    'current_year': current_year
-                }
+                'customer': self._get_customer_info(customer),
+                'trading_years': trading_years,
+                'projection_years': projection_years,
+                'defaults': self._get_default_years(trading_years, projection_years)
             }
-        })
+        }))
 
 
 class CustomerTradingDataView(APIView, CustomerDashboardMixin):
@@ -523,16 +750,22 @@ class CustomerTradingDataView(APIView, CustomerDashboardMixin):
         if error_response:
             return error_response
         
+        validators = self._get_dashboard_validators(request, customer)
+        not_modified = validators.not_modified(request)
+        if not_modified:
+            return not_modified
+        
         year_param = request.query_params.get('year')
         
-        # Get available years
-        trading_years = Trade.objects.filter(
-            customer=customer
-        ).values_list('year', flat=True).distinct().order_by('-year')
+        # Get available years (one query, reused below)
+        trading_years = list(
+            Trade.objects.filter(customer=customer)
+            .values_list('year', flat=True).distinct().order_by('-year')
+        )
         
         # Use max year if not specified
         if not year_param:
-            year = trading_years.first() if trading_years else None
+            year = trading_years[0] if trading_years else None
         else:
             try:
                 year = int(year_param)
@@ -544,21 +777,20 @@ class CustomerTradingDataView(APIView, CustomerDashboardMixin):
                 }, status=status.HTTP_400_BAD_REQUEST)
         
         if not year:
-            return Response({
+            return validators.apply(Response({
                 'success': True,
                 'message': 'No trading data available for selected year',
                 'data': {
                     'year': None,
                     'pivot_data': None,
-                    'available_years': list(trading_years)
+                    'available_years': trading_years
                 }
-            })
+            }))
         
         # Validate year belongs to this customer
         if year not in trading_years:
             # Check if year exists at all for this customer
-            all_customer_years = list(trading_years)
-            if all_customer_years:
+            if trading_years:
                 return Response({
                     'success': False,
                     'message': 'No trading data available for selected year',
@@ -572,17 +804,17 @@ class CustomerTradingDataView(APIView, CustomerDashboardMixin):
                 }, status=status.HTTP_404_NOT_FOUND)
         
         # Get trading pivot data
-        pivot_data = self._get_trading_pivot_data(customer, year)
+        pivot_data = self._get_cached_trading_pivot_data(customer, year)
         
-        return Response({
+        return validators.apply(Response({
             'success': True,
             'message': 'Trading data retrieved successfully.',
             'data': {
                 'year': year,
                 'pivot_data': pivot_data,
-                'available_years': list(trading_years)
+                'available_years': trading_years
             }
-        })
+        }))
 
 
 class CustomerProjectionDataView(APIView, CustomerDashboardMixin):
@@ -600,16 +832,22 @@ class CustomerProjectionDataView(APIView, CustomerDashboardMixin):
         if error_response:
             return error_response
         
+        validators = self._get_dashboard_validators(request, customer)
+        not_modified = validators.not_modified(request)
+        if not_modified:
+            return not_modified
+        
         year_param = request.query_params.get('year')
         
-        # Get available years
-        projection_years = CostProjection.objects.filter(
-            customer=customer
-        ).values_list('year', flat=True).distinct().order_by('-year')
+        # Get available years (one query, reused below)
+        projection_years = list(
+            CostProjection.objects.filter(customer=customer)
+            .values_list('year', flat=True).distinct().order_by('-year')
+        )
         
         # Use max year if not specified
         if not year_param:
-            year = projection_years.first() if projection_years else None
+            year = projection_years[0] if projection_years else None
         else:
             try:
                 year = int(year_param)
@@ -621,28 +859,109 @@ class CustomerProjectionDataView(APIView, CustomerDashboardMixin):
                 }, status=status.HTTP_400_BAD_REQUEST)
         
         if not year:
-            return Response({
+            return validators.apply(Response({
                 'success': True,
                 'message': 'Projection data not available',
                 'data': {
                     'year': None,
                     'rows': [],
-                    'available_years': list(projection_years)
+                    'available_years': projection_years
                 }
-            })
+            }))
         
         # Get projection rows
         rows = self._get_projection_rows(customer, year)
         
-        return Response({
+        return validators.apply(Response({
             'success': True,
             'message': 'Projection data retrieved successfully.',
             'data': {
                 'year': year,
                 'rows': rows,
-                'available_years': list(projection_years)
+                'available_years': projection_years
             }
-        })
+        }))
+
+
+class CustomerDashboardBundleView(APIView, CustomerDashboardMixin):
+    """Everything the customer dashboard shows on load, in one response."""
+    
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request):
+        """Get customer info, available years, trading pivot and projections.
+        
+        Replaces the customer-dashboard-data, customer-trading-data and two
+        customer-projection-data calls of a dashboard load. Access is
+        checked and the available years are resolved once.
+        
+        Query params:
+        - trading_year: Year for the trading pivot (optional, defaults to max trading year)
+        - current_year: Projection year (optional, defaults to max projection year,
+          or this year when there are no projections)
+        - previous_year: Comparison projection year (optional, defaults to current_year - 1)
+        """
+        customer, error_response = self._get_customer_for_user(request)
+        if error_response:
+            return error_response
+        
+        validators = self._get_dashboard_validators(request, customer)
+        not_modified = validators.not_modified(request)
+        if not_modified:
+            return not_modified
+        
+        trading_years, projection_years = self._get_available_years(customer)
+        defaults = self._get_default_years(trading_years, projection_years)
+        
+        trading_year = request.query_params.get('trading_year')
+        current_year = request.query_params.get('current_year')
+        previous_year = request.query_params.get('previous_year')
+        try:
+            trading_year = int(trading_year) if trading_year else defaults['trading_year']
+            current_year = int(current_year) if current_year else (defaults['current_year'] or date.today().year)
+            previous_year = int(previous_year) if previous_year else current_year - 1
+        except ValueError:
+            return Response({
+                'success': False,
+                'message': 'Year must be a valid integer.',
+                'errors': {}
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        # Only years this customer has trades for get a pivot
+        pivot_data = None
+        if trading_year in trading_years:
+            pivot_data = self._get_cached_trading_pivot_data(customer, trading_year)
+        
+        years = sorted({previous_year, current_year})
+        projection_rows = response_cache.get_or_set(
+            'customer-projection-years', customer, years,
+            lambda: build_projection_years(customer, years, prefill_consumption=False),
+        )
+        
+        return validators.apply(Response({
+            'success': True,
+            'message': 'Customer dashboard retrieved successfully.',
+            'data': {
+                'customer': self._get_customer_info(customer),
+                'trading_years': trading_years,
+                'projection_years': projection_years,
+                'defaults': defaults,
+                'trading': {
+                    'year': trading_year,
+                    'pivot_data': pivot_data
+                },
+                'projection': {
+                    'previous_year': {
+                        'year': previous_year,
+                        'rows': projection_rows[previous_year]
+                    },
+                    'current_year': {
+                        'year': current_year,
+                        'rows': projection_rows[current_year]
+                    }
+                }
+            }
+        }))
 
 
 class CalculateCostView(APIView, CustomerDashboardMixin):
@@ -688,35 +1007,33 @@ class CalculateCostView(APIView, CustomerDashboardMixin):
                 'errors': {}
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        # Validate year belongs to this customer (has projection data)
-        projection_years = CostProjection.objects.filter(
-            customer=customer
-        ).values_list('year', flat=True).distinct()
+        # Load the year's projections once; the year must belong to this customer
+        projections = {
+            projection.month: projection
+            for projection in CostProjection.objects.filter(customer=customer, year=year).order_by()
+        }
         
-        if year not in projection_years:
+        if not projections:
             return Response({
                 'success': False,
                 'message': 'No projection data available for the specified year.',
                 'errors': {}
             }, status=status.HTTP_403_FORBIDDEN)
         
+        # Booked traded prices for the year, read once
+        traded_prices = get_traded_prices(customer, year)
+        
         # Calculate costs for each month
         results = []
         for month in range(1, 13):
             no_of_days = calendar.monthrange(year, month)[1]
             
-            try:
-                projection = CostProjection.objects.get(
-                    customer=customer,
-                    year=year,
-                    month=month
-                )
-                
+            projection = projections.get(month)
+            if projection:
                 st_charge = Decimal(str(projection.st_charge))
                 consumption = Decimal(str(projection.consumption))
                 flex_rate = Decimal(str(projection.flex_rate))
-                
-            except CostProjection.DoesNotExist:
+            else:
                 st_charge = Decimal('0')
                 consumption = Decimal('0')
                 flex_rate = Decimal('0')
@@ -726,16 +1043,8 @@ class CalculateCostView(APIView, CustomerDashboardMixin):
             if custom_price is not None:
                 tp = Decimal(str(custom_price))
             else:
-                # Get default traded price from Trade model
-                temp_projection = CostProjection(
-                    customer=customer,
-                    year=year,
-                    month=month,
-                    st_charge=0,
-                    consumption=0,
-                    flex_rate=0
-                )
-                tp = temp_projection.traded_price
+                # Default to the booked traded price
+                tp = traded_prices.get(month, Decimal('0'))
             
             # Calculate cost using the formula:
             # Cost = (st_charge * days_in_month / 100) + (consumption * (flex_rate + tp/29.3071) / 100)
@@ -762,3 +1071,176 @@ class CalculateCostView(APIView, CustomerDashboardMixin):
                 'rows': results
             }
         })
+
+
+class CalculateCostScenariosView(APIView, CustomerDashboardMixin):
+    """Compare many trade price scenarios for the logged-in customer in one request."""
+    
+    permission_classes = [IsAuthenticated]
+    MAX_SCENARIOS = 100
+    
+    def post(self, request):
+        """Calculate the 12-month cost under each of several price curves.
+        
+        Request body:
+        {
+            "year": 2025,
+            "scenarios": [
+                {"name": "High", "trade_prices": {"1": 80.0, "2": 82.5, ...}},
+                {"name": "Low", "trade_prices": {"1": 40.0, ...}}
+            ]
+        }
+        
+        Months missing from a scenario use the booked traded price. Every
+        scenario is returned with its monthly and total delta against the
+        booked cost.
+        """
+        customer, error_response = self._get_customer_for_user(request)
+        if error_response:
+            return error_response
+        
+        year = request.data.get('year')
+        scenarios = request.data.get('scenarios')
+        
+        if not year:
+            return Response({
+                'success': False,
+                'message': 'Year is required.',
+                'errors': {}
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            year = int(year)
+        except (TypeError, ValueError):
+            return Response({
+                'success': False,
+                'message': 'Year must be a valid integer.',
+                'errors': {}
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        if not isinstance(scenarios, list) or not scenarios:
+            return Response({
+                'success': False,
+                'message': 'At least one scenario is required.',
+                'errors': {}
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        if len(scenarios) > self.MAX_SCENARIOS:
+            return Response({
+                'success': False,
+                'message': f'At most {self.MAX_SCENARIOS} scenarios can be compared at once.',
+                'errors': {}
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            names, scenario_prices = parse_scenarios(scenarios)
+        except ValueError as e:
+            return Response({
+                'success': False,
+                'message': 'Please check your input.',
+                'errors': {'scenarios': str(e)}
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        inputs = load_customer_inputs(customer, year)
+        if inputs is None:
+            return Response({
+                'success': False,
+                'message': 'No projection data available for the specified year.',
+                'errors': {}
+            }, status=status.HTTP_403_FORBIDDEN)
+        
+        return Response({
+            'success': True,
+            'message': 'Scenario costs calculated successfully.',
+            'data': evaluate_scenarios(year, inputs, names, scenario_prices)
+        })
+
+
+class ForwardCurveListCreateView(APIView, ProjectionMixin):
+    """List and create forward price curves for the business."""
+
+    def get(self, request):
+        """List the business's forward curves, newest as-of date first."""
+        business, error_response = self._get_business(request)
+        if error_response:
+            return error_response
+        
+        curves = ForwardCurve.objects.filter(business=business).prefetch_related('points')
+        return Response({
+            'success': True,
+            'message': 'Forward curves retrieved successfully.',
+            'data': ForwardCurveSerializer(curves, many=True).data
+        })
+
+    def post(self, request):
+        """Create a forward curve with its monthly prices.
+        
+        Request body:
+        {
+            "name": "Gas",
+            "as_of_date": "2025-06-30",
+            "points": [{"year": 2025, "month": 7, "price": 85.25}, ...]
+        }
+        """
+        business, error_response = self._get_business(request)
+        if error_response:
+            return error_response
+        
+        serializer = ForwardCurveSerializer(data=request.data, context={'business': business})
+        if not serializer.is_valid():
+            return Response({
+                'success': False,
+                'message': 'Please check your input.',
+                'errors': serializer.errors
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        curve = serializer.save()
+        logger.info(f"Forward curve created: {curve.name} as of {curve.as_of_date} for business {business.id}")
+        return Response({
+            'success': True,
+            'message': 'Forward curve created successfully.',
+            'data': ForwardCurveSerializer(curve).data
+        }, status=status.HTTP_201_CREATED)
+
+
+class ValuationView(APIView, ProjectionMixin):
+    """Mark-to-market valuation of all booked trades of the business."""
+
+    def get(self, request):
+        """Value every trade against a forward curve.
+        
+        Query params:
+        - curve_id: Forward curve to use (optional, defaults to the latest as-of date)
+        """
+        business, error_response = self._get_business(request)
+        if error_response:
+            return error_response
+        
+        curves = ForwardCurve.objects.filter(business=business)
+        curve_id = request.query_params.get('curve_id')
+        if curve_id:
+            try:
+                curve = curves.get(id=int(curve_id))
+            except ValueError:
+                return Response({
+                    'success': False,
+                    'message': 'curve_id must be an integer.',
+                    'errors': {}
+                }, status=status.HTTP_400_BAD_REQUEST)
+            except ForwardCurve.DoesNotExist:
+                curve = None
+        else:
+            curve = curves.first()
+        
+        if not curve:
+            return Response({
+                'success': False,
+                'message': 'Forward curve not found.',
+                'errors': {}
+            }, status=status.HTTP_404_NOT_FOUND)
+        
+        return Response({
+            'success': True,
+            'message': 'Valuation calculated successfully.',
+            'data': value_trades(business, curve)
+        })
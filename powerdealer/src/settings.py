@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
 import os
+import sys
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -46,6 +47,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so its timings cover the rest of the stack
+    'trading.middleware.PerformanceMiddleware',
+    'trading.middleware.NPlusOneMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -158,7 +162,7 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # REST Framework Configuration
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'trading.authentication.TenantJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.AllowAny',
@@ -192,6 +196,15 @@ LOGGING = {
             'class': 'logging.StreamHandler',
             'formatter': 'simple',
         },
+        'slow_queries': {
+            'level': 'WARNING',
+            'class': 'logging.handlers.RotatingFileHandler',
+            'filename': BASE_DIR / 'logs' / 'slow_queries.log',
+            'maxBytes': 10 * 1024 * 1024,
+            'backupCount': 5,
+            'delay': True,
+            'formatter': 'verbose',
+        },
     },
     'loggers': {
         'trading': {
@@ -199,6 +212,24 @@ LOGGING = {
             'level': 'INFO',
             'propagate': True,
         },
+        # Request timings (trading/middleware.py): slow requests at INFO,
+        # every request at DEBUG
+        'trading.performance': {
+            'handlers': ['file', 'console'],
+            'level': os.environ.get('PERFORMANCE_LOG_LEVEL', 'INFO'),
+            'propagate': False,
+        },
+        # Slow statements with their call site (trading/slow_queries.py)
+        'trading.slow_queries': {
+            'handlers': ['slow_queries'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+        'trading.nplusone': {
+            'handlers': ['file', 'console'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
         'django': {
             'handlers': ['file', 'console'],
             'level': 'WARNING',
@@ -211,9 +242,74 @@ LOGGING = {
 from datetime import timedelta
 
 SIMPLE_JWT = {
-    'ACCESS_TOKEN_LIFETIME': timedelta(hours=24),
+    # Access tokens carry role/tenant claims that are re-read on refresh, so
+    # keep them short-lived; the frontend refreshes transparently on 401
+    'ACCESS_TOKEN_LIFETIME': timedelta(minutes=int(os.environ.get('JWT_ACCESS_TOKEN_MINUTES', '30'))),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=7),
     'ALGORITHM': 'HS256',
+    'TOKEN_REFRESH_SERIALIZER': 'trading.authentication.TenantTokenRefreshSerializer',
+}
+
+# Cache of authenticated users with their business/customer (trading/user_cache.py).
+# TTL 0 disables it; set USER_CACHE_ALIAS to share entries between processes
+USER_CACHE = {
+    'MAX_ENTRIES': int(os.environ.get('USER_CACHE_MAX_ENTRIES', '1024')),
+    'TTL': int(os.environ.get('USER_CACHE_TTL', '60')),
+    'CACHE_ALIAS': os.environ.get('USER_CACHE_ALIAS') or None,
+}
+
+# Caches. 'responses' holds pivot/projection data (trading/response_cache.py);
+# a file cache is shared by the gunicorn workers of a container, local memory
+# only by one process (fine for runserver and tests)
+RESPONSE_CACHE_DIR = os.environ.get('RESPONSE_CACHE_DIR', '' if DEBUG else '/tmp/powerdealer-responses')
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'responses': {
+        'BACKEND': (
+            'django.core.cache.backends.filebased.FileBasedCache' if RESPONSE_CACHE_DIR
+            else 'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': RESPONSE_CACHE_DIR or 'responses',
+        'TIMEOUT': int(os.environ.get('RESPONSE_CACHE_TIMEOUT', '86400')),
+        'OPTIONS': {'MAX_ENTRIES': int(os.environ.get('RESPONSE_CACHE_MAX_ENTRIES', '5000'))},
+    },
+}
+RESPONSE_CACHE = {
+    'ALIAS': 'responses',
+    'ENABLED': os.environ.get('RESPONSE_CACHE_ENABLED', 'True').lower() in ('true', '1', 'yes'),
+}
+
+# Per-request Server-Timing headers and performance logs (trading/middleware.py)
+PERFORMANCE_TIMING = os.environ.get('PERFORMANCE_TIMING', 'True').lower() in ('true', '1', 'yes')
+PERFORMANCE_SLOW_MS = int(os.environ.get('PERFORMANCE_SLOW_MS', '500'))
+
+# Prometheus metrics at /metrics (trading/metrics.py). Each gunicorn worker
+# writes its series to DIR, and a scrape of any worker sums them; without
+# a DIR only the answering process is reported. Set METRICS_TOKEN to
+# require "Authorization: Bearer <token>" from the scraper
+METRICS = {
+    'DIR': os.environ.get('METRICS_DIR', '' if DEBUG else '/tmp/powerdealer-metrics'),
+    'FLUSH_INTERVAL': float(os.environ.get('METRICS_FLUSH_INTERVAL', '1')),
+    'TOKEN': os.environ.get('METRICS_TOKEN', ''),
+}
+
+# Opt-in slow-query log (trading/slow_queries.py): statements slower than
+# THRESHOLD_MS go to logs/slow_queries.log and to /admin/slow-queries/
+SLOW_QUERY_LOG = {
+    'ENABLED': os.environ.get('SLOW_QUERY_LOG', 'False').lower() in ('true', '1', 'yes'),
+    'THRESHOLD_MS': int(os.environ.get('SLOW_QUERY_THRESHOLD_MS', '100')),
+    'BUFFER_SIZE': int(os.environ.get('SLOW_QUERY_BUFFER_SIZE', '200')),
+}
+
+# N+1 detector (trading/nplusone.py): a request running one statement more
+# than THRESHOLD times raises in the test suite; set NPLUSONE_MODE=log on
+# staging. Off (not loaded) otherwise
+TESTING = sys.argv[1:2] == ['test']
+NPLUSONE = {
+    'MODE': os.environ.get('NPLUSONE_MODE', 'raise' if TESTING else 'off'),
+    'THRESHOLD': int(os.environ.get('NPLUSONE_THRESHOLD', '5')),
 }
 
 # CORS Configuration (for frontend)
@@ -18,9 +18,15 @@ from django.contrib import admin
 from django.urls import path, include
 from rest_framework_simplejwt.views import TokenRefreshView
 
+from trading.admin import slow_queries_view
+from trading.views import MetricsView
+
 urlpatterns = [
+    path('admin/slow-queries/', admin.site.admin_view(slow_queries_view), name='slow-queries'),
     path('admin/', admin.site.urls),
     path('api/', include('trading.urls')),
     path('api/', include('projection.urls')),
     path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    # Outside /api/, so the nginx proxy does not publish it
+    path('metrics', MetricsView.as_view(), name='metrics'),
 ]
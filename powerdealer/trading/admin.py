@@ -1,5 +1,14 @@
+import os
+
+from django import forms
+from django.conf import settings
 from django.contrib import admin
-from .models import Business, Customer, Trade
+from django.db import transaction
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+
+from .models import BookedPercentExceeded, Business, Customer, Trade, TradeMonthSummary
+from .slow_queries import slow_query_log
 
 
 @admin.register(Business)
@@ -29,8 +38,42 @@ class CustomerAdmin(admin.ModelAdmin):
     )
 
 
+class TradeAdminForm(forms.ModelForm):
+    """Trade form reporting the 100% booked cap as a field error."""
+
+    class Meta:
+        model = Trade
+        fields = '__all__'
+
+    def clean(self):
+        cleaned_data = super().clean()
+        customer = cleaned_data.get('customer')
+        year, month, percent = (cleaned_data.get(field) for field in ('year', 'month', 'percent'))
+        if customer is None or None in (year, month, percent):
+            return cleaned_data
+
+        # The admin validates and saves in one transaction, so the summary
+        # lock taken here holds until Trade.save re-checks the cap
+        summary = TradeMonthSummary.lock(customer.id, year, month)
+        if self.instance.pk:
+            previous = Trade.objects.filter(pk=self.instance.pk).values(
+                'customer_id', 'year', 'month', 'percent'
+            ).first()
+            if previous and TradeMonthSummary.key_of(previous) == summary.key:
+                # Check the month without the edited trade, as Trade.save does;
+                # the locked row is only read here, Trade.save re-reads it
+                summary.trade_count -= 1
+                summary.total_percent -= previous['percent']
+        try:
+            summary.check_cap(percent)
+        except BookedPercentExceeded as e:
+            self.add_error('percent', str(e))
+        return cleaned_data
+
+
 @admin.register(Trade)
 class TradeAdmin(admin.ModelAdmin):
+    form = TradeAdminForm
     list_display = ['trade_no', 'customer', 'month', 'year', 'p_therm', 'percent', 'trade_date', 'created_at']
     list_filter = ['year', 'month', 'customer__business']
     search_fields = ['customer__user__first_name', 'customer__user__last_name', 'customer__mprn', 'customer__mobile']
@@ -42,3 +85,34 @@ class TradeAdmin(admin.ModelAdmin):
         ('Timestamps', {'fields': ('created_at', 'updated_at')}),
     )
 
+    def delete_queryset(self, request, queryset):
+        # "Delete selected" would otherwise run queryset.delete(), which skips
+        # Trade.delete and leaves the month summaries counting the trades.
+        # Months are locked in key order, like Trade.save.
+        with transaction.atomic():
+            for trade in queryset.order_by('customer_id', 'year', 'month', 'trade_no'):
+                trade.delete()
+
+
+@admin.register(TradeMonthSummary)
+class TradeMonthSummaryAdmin(admin.ModelAdmin):
+    list_display = ['customer', 'month', 'year', 'trade_count', 'total_percent', 'weighted_price', 'max_trade_no', 'updated_at']
+    list_filter = ['year', 'month', 'customer__business']
+    search_fields = ['customer__mprn']
+    readonly_fields = ['customer', 'year', 'month', 'trade_count', 'total_percent', 'weighted_price', 'max_trade_no', 'updated_at']
+    ordering = ['-year', '-month', 'customer']
+
+
+def slow_queries_view(request):
+    """Staff page listing the slow queries captured by this worker (see slow_queries.py)."""
+    if request.method == 'POST':
+        slow_query_log.clear()
+        return redirect(request.path)
+    return TemplateResponse(request, 'admin/trading/slow_queries.html', {
+        **admin.site.each_context(request),
+        'title': 'Slow queries',
+        'captures': slow_query_log.recent(),
+        'enabled': getattr(settings, 'SLOW_QUERY_LOG', {}).get('ENABLED', False),
+        'threshold_ms': slow_query_log.threshold * 1000,
+        'pid': os.getpid(),
+    })
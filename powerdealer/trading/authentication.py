@@ -0,0 +1,176 @@
+"""
+JWT authentication carrying the user's role and tenant as signed claims.
+
+Tokens minted by TenantRefreshToken.for_user carry three extra claims,
+which simplejwt copies into every access token:
+
+- role: 'administrator', 'customer' or None
+- business_id: the business the user owns or belongs to
+- customer_id: the customer profile (customers only)
+
+TenantJWTAuthentication exposes them on the request and loads the user
+with just the tenant their role needs joined in (an administrator's
+business, a customer's profile), so neither authentication nor role
+checks query auth_group (see tenant.get_tenant). Claims are re-read from
+the database whenever an access token is refreshed
+(TenantTokenRefreshSerializer), so group or profile changes take effect
+at the next refresh.
+"""
+from django.contrib.auth.models import User
+from django.db.models import Exists, OuterRef
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from .models import Business, Customer
+from .user_cache import user_cache
+
+ROLE_ADMINISTRATOR = 'administrator'
+ROLE_CUSTOMER = 'customer'
+TENANT_CLAIMS = ('role', 'business_id', 'customer_id')
+
+
+def resolve_tenant_claims(user):
+    """Look up a user's role, business_id and customer_id in the database.
+
+    Administrator wins if a user is in both groups, as at login.
+
+    Returns:
+        dict: role, business_id and customer_id (None when not applicable)
+    """
+    groups = set(
+        user.groups.filter(name__in=['Administrator', 'Customer']).values_list('name', flat=True)
+    )
+    claims = {'role': None, 'business_id': None, 'customer_id': None}
+    if 'Administrator' in groups:
+        claims['role'] = ROLE_ADMINISTRATOR
+        claims['business_id'] = Business.objects.filter(owner=user).values_list('id', flat=True).first()
+    elif 'Customer' in groups:
+        claims['role'] = ROLE_CUSTOMER
+        customer = Customer.objects.filter(user=user).values('id', 'business_id').first()
+        if customer:
+            claims['customer_id'] = customer['id']
+            claims['business_id'] = customer['business_id']
+    return claims
+
+
+def tenant_relations(role):
+    """User relations the tenant of a role lives on: an administrator's owned
+    business, a customer's profile, both when the role is unknown or None."""
+    return {
+        ROLE_ADMINISTRATOR: ('business',),
+        ROLE_CUSTOMER: ('customer',),
+    }.get(role, ('business', 'customer'))
+
+
+def tenant_user_queryset(with_roles=False, role=None):
+    """Users with the tenant of their role joined in.
+
+    Args:
+        with_roles: Also annotate is_administrator / is_customer, for
+                    when the role is not known from the token
+        role: Role from the token claims; only its relation is joined
+
+    One query loads everything the tenant context needs (see tenant.py).
+    """
+    joins = {'business': 'business', 'customer': 'customer__business'}
+    users = User.objects.select_related(*(joins[name] for name in tenant_relations(role)))
+    if with_roles:
+        memberships = User.groups.through.objects.filter(user_id=OuterRef('pk'))
+        users = users.annotate(
+            is_administrator=Exists(memberships.filter(group__name='Administrator')),
+            is_customer=Exists(memberships.filter(group__name='Customer')),
+        )
+    return users
+
+
+class TenantRefreshToken(RefreshToken):
+    """Refresh token whose access tokens carry the tenant claims."""
+
+    @classmethod
+    def for_user(cls, user, claims=None):
+        """Mint a token for a user.
+
+        Args:
+            claims: Already-known tenant claims (saves the lookup at login)
+        """
+        token = super().for_user(user)
+        for claim, value in (claims or resolve_tenant_claims(user)).items():
+            token[claim] = value
+        return token
+
+
+class TenantTokenRefreshSerializer(TokenRefreshSerializer):
+    """Token refresh that re-reads the tenant claims instead of copying them.
+
+    simplejwt's own validate() runs first, so refresh token rotation and
+    blacklisting behave as configured; the claims of the new tokens are
+    then replaced with fresh ones.
+    """
+
+    def validate(self, attrs):
+        try:
+            data = super().validate(attrs)
+        except User.DoesNotExist:
+            raise AuthenticationFailed(
+                self.error_messages['no_active_account'],
+                'no_active_account',
+            )
+
+        access = self.token_class.access_token_class(data['access'])
+        user = User.objects.get(**{api_settings.USER_ID_FIELD: access[api_settings.USER_ID_CLAIM]})
+        claims = resolve_tenant_claims(user)
+        for claim, value in claims.items():
+            access[claim] = value
+        data['access'] = str(access)
+        if 'refresh' in data:
+            refresh = self.token_class(data['refresh'])
+            for claim, value in claims.items():
+                refresh[claim] = value
+            data['refresh'] = str(refresh)
+        return data
+
+
+class TenantJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication that also puts the token's tenant claims on the request."""
+
+    def get_user(self, validated_token):
+        """Same checks as JWTAuthentication.get_user, loading the tenant in the same query.
+
+        The loaded user is reused across requests through user_cache.
+        """
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken('Token contained no recognizable user identification')
+
+        # With claims the role is known, so only its tenant is joined and
+        # the group memberships are not queried
+        if 'role' in validated_token:
+            users = tenant_user_queryset(role=validated_token['role'])
+        else:
+            users = tenant_user_queryset(with_roles=True)
+        try:
+            user = user_cache.get(user_id, lambda: users.get(**{api_settings.USER_ID_FIELD: user_id}))
+        except User.DoesNotExist:
+            raise AuthenticationFailed('User not found', code='user_not_found')
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed('User is inactive', code='user_inactive')
+        if api_settings.CHECK_REVOKE_TOKEN and (
+            validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password)
+        ):
+            raise AuthenticationFailed("The user's password has been changed.", code='password_changed')
+        return user
+
+    def authenticate(self, request):
+        result = super().authenticate(request)
+        if result is not None:
+            _, token = result
+            if 'role' in token:
+                request.tenant_claims = {claim: token.get(claim) for claim in TENANT_CLAIMS}
+        return result
@@ -0,0 +1,85 @@
+"""
+Conditional GET support (ETag / Last-Modified) for read endpoints.
+
+The validator of a response is computed from the rows it is built from:
+MAX(updated_at) and COUNT(*) of each source queryset, read together in a
+single UNION ALL query, plus any extra inputs (request params, profile
+fields). A client whose If-None-Match still matches gets a 304 before the
+view loads or serializes anything.
+
+Deletes lower the row count, so they always change the ETag. For
+Last-Modified, and so for clients sending only If-Modified-Since, every
+delete and every echoed field must also move a timestamp among the
+sources: trade-based endpoints list the month summaries (Trade.delete
+saves its month's summary), and signals.py touches the customer when
+one of its projections is deleted or its user is saved, and the
+business when one of its customers is deleted. Endpoints therefore list
+the customer or business row itself as a source, read fresh rather than
+from the user cache.
+"""
+import hashlib
+
+from django.db.models import Count, IntegerField, Max, Value
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.dateparse import parse_datetime
+from django.utils.http import http_date
+
+
+class Validators:
+    """ETag and Last-Modified of a response."""
+
+    def __init__(self, etag, last_modified=None):
+        self.etag = etag
+        self.last_modified = last_modified
+
+    def not_modified(self, request):
+        """A 304 response if the request's conditional headers still match, else None."""
+        timestamp = int(self.last_modified.timestamp()) if self.last_modified else None
+        response = get_conditional_response(request, etag=self.etag, last_modified=timestamp)
+        if response is not None:
+            self.apply(response)
+        return response
+
+    def apply(self, response):
+        """Set the validator headers on a response and return it."""
+        response['ETag'] = self.etag
+        if self.last_modified:
+            response['Last-Modified'] = http_date(self.last_modified.timestamp())
+        # Let browsers keep the body but always revalidate, per user
+        response['Cache-Control'] = 'private, no-cache'
+        patch_vary_headers(response, ['Authorization'])
+        return response
+
+
+def collection_validators(querysets, *extra):
+    """Validators for the rows of some querysets (one query).
+
+    Args:
+        querysets: Source querysets, each with an updated_at field
+        extra: Other values the response depends on (params, profile
+               fields, timestamps); datetimes also count toward Last-Modified
+
+    Returns:
+        Validators
+    """
+    parts = [
+        queryset.order_by()
+        .annotate(source=Value(index, output_field=IntegerField()))
+        .values('source')
+        .annotate(last=Max('updated_at'), count=Count('pk'))
+        .values_list('source', 'last', 'count')
+        for index, queryset in enumerate(querysets)
+    ]
+    states = sorted(parts[0].union(*parts[1:], all=True)) if len(parts) > 1 else list(parts[0])
+
+    timestamps = []
+    for _, last, _ in states:
+        # UNION results skip the field converters on some backends
+        if isinstance(last, str):
+            last = parse_datetime(last)
+        if last is not None:
+            timestamps.append(last)
+    timestamps.extend(value for value in extra if hasattr(value, 'timestamp'))
+
+    digest = hashlib.sha1(repr((states, extra)).encode()).hexdigest()
+    return Validators(f'W/"{digest}"', max(timestamps) if timestamps else None)
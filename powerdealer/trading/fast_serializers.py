@@ -0,0 +1,180 @@
+"""
+Read-only fast path for list endpoints.
+
+DRF's ModelSerializer builds a model instance per row and then walks its
+fields one by one, calling SerializerMethodFields along the way. For large
+read-only lists we instead fetch plain values_list() tuples (with the
+joins done in SQL) and map each tuple to a dict through a RowBuilder
+compiled once per request.
+
+Each column list below mirrors the read fields of a serializer in
+serializers.py, with the same keys, order and value formats. The JSON
+output is identical, so the two can be swapped freely. Keep them in step
+when a serializer changes.
+"""
+import calendar
+from decimal import Decimal
+
+from django.utils import timezone
+
+from .middleware import timed_serialization
+
+MONTH_NAMES = list(calendar.month_name)
+
+
+def decimal_formatter(decimal_places):
+    """DRF DecimalField output: a fixed-point string with exactly decimal_places."""
+    exponent = Decimal(1).scaleb(-decimal_places)
+
+    def format_decimal(value):
+        return '{:f}'.format(value.quantize(exponent))
+    return format_decimal
+
+
+def format_date(value):
+    """DRF DateField output (ISO 8601)."""
+    return value.isoformat()
+
+
+def datetime_formatter(tz):
+    """DRF DateTimeField output: ISO 8601 in time zone tz, with UTC written as 'Z'."""
+    def format_datetime(value):
+        value = value.astimezone(tz).isoformat()
+        if value.endswith('+00:00'):
+            value = value[:-6] + 'Z'
+        return value
+    return format_datetime
+
+
+def format_datetime(value):
+    """DRF DateTimeField output in the current time zone.
+
+    In column lists RowBuilder swaps this for a datetime_formatter bound
+    to the time zone once, since looking it up costs more than formatting.
+    """
+    return datetime_formatter(timezone.get_current_timezone())(value)
+
+
+def full_name(first_name, last_name, username):
+    """Same as user.get_full_name() or user.username."""
+    return f"{first_name} {last_name}".strip() or username
+
+
+def _nested_user(user_id, username, email, first_name, last_name):
+    return {
+        'id': user_id,
+        'username': username,
+        'email': email,
+        'first_name': first_name,
+        'last_name': last_name,
+    }
+
+
+def _nested_customer(customer_id, mprn, first_name, last_name, username, email, mobile):
+    return {
+        'id': customer_id,
+        'mprn': mprn,
+        'name': full_name(first_name, last_name, username),
+        'email': email,
+        'mobile': mobile,
+    }
+
+
+# (output key, values_list lookups, converter) in serializer field order.
+# A converter of None passes the single looked-up value through.
+
+# Matches CustomerSerializer
+CUSTOMER_COLUMNS = [
+    ('user', ('user_id', 'user__username', 'user__email', 'user__first_name', 'user__last_name'), _nested_user),
+    ('mobile', ('mobile',), None),
+    ('address', ('address',), None),
+    ('mprn', ('mprn',), None),
+    ('is_active', ('is_active',), None),
+    ('created_at', ('created_at',), format_datetime),
+    ('updated_at', ('updated_at',), format_datetime),
+]
+
+# Matches TradeSerializer (with CustomerNestedSerializer for customer)
+TRADE_COLUMNS = [
+    ('id', ('id',), None),
+    ('customer', (
+        'customer_id', 'customer__mprn', 'customer__user__first_name', 'customer__user__last_name',
+        'customer__user__username', 'customer__user__email', 'customer__mobile',
+    ), _nested_customer),
+    ('trade_no', ('trade_no',), None),
+    ('month', ('month',), None),
+    ('month_name', ('month',), MONTH_NAMES.__getitem__),
+    ('year', ('year',), None),
+    ('p_therm', ('p_therm',), decimal_formatter(4)),
+    ('percent', ('percent',), decimal_formatter(2)),
+    ('trade_date', ('trade_date',), format_date),
+    ('created_at', ('created_at',), format_datetime),
+    ('updated_at', ('updated_at',), format_datetime),
+]
+
+
+def _getter(positions, convert):
+    """Compile one column into a function of the row tuple."""
+    if convert is None:
+        position, = positions
+        return lambda row: row[position]
+    if len(positions) == 1:
+        position, = positions
+
+        def get_single(row):
+            value = row[position]
+            return None if value is None else convert(value)
+        return get_single
+    return lambda row: convert(*[row[position] for position in positions])
+
+
+class RowBuilder:
+    """Maps values_list() tuples to serializer-shaped dicts.
+
+    Args:
+        columns: Column list such as TRADE_COLUMNS
+        fields: Optional output keys to keep, in column order (the ?fields=
+                option of the trade list)
+        extra_lookups: Lookups to fetch even if no output column uses them,
+                       e.g. the keyset of a paginated list
+    """
+
+    def __init__(self, columns, fields=None, extra_lookups=()):
+        if fields is not None:
+            columns = [column for column in columns if column[0] in fields]
+
+        format_local_datetime = datetime_formatter(timezone.get_current_timezone())
+
+        self.lookups = []
+        self.positions = {}
+        self.getters = []
+        for key, lookups, convert in columns:
+            if convert is format_datetime:
+                convert = format_local_datetime
+            self.getters.append((key, _getter([self._position(lookup) for lookup in lookups], convert)))
+        for lookup in extra_lookups:
+            self._position(lookup)
+
+    def _position(self, lookup):
+        if lookup not in self.positions:
+            self.positions[lookup] = len(self.lookups)
+            self.lookups.append(lookup)
+        return self.positions[lookup]
+
+    def fetch(self, queryset):
+        """Run the query for just the needed columns, returning raw tuples."""
+        return list(queryset.values_list(*self.lookups))
+
+    def build(self, row):
+        return {key: get(row) for key, get in self.getters}
+
+    def build_all(self, rows):
+        return timed_serialization(self._build_all, rows)
+
+    def _build_all(self, rows):
+        getters = self.getters
+        return [{key: get(row) for key, get in getters} for row in rows]
+
+    def rows(self, queryset):
+        """Fetch and build every row of a queryset."""
+        return self.build_all(self.fetch(queryset))
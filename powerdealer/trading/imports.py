@@ -0,0 +1,246 @@
+"""
+Bulk trade import.
+
+Validates a batch of trade rows (from CSV or JSON) with set-based checks
+and books them in one transaction:
+
+- MPRNs are resolved with one query for the whole batch
+- the 100% booked cap is checked per (customer, year, month) against the
+  trade summaries plus the batch's own grouped totals
+- trade numbers continue from each month's summary and trades are inserted
+  with bulk_create
+
+The batch is all-or-nothing: any row error rejects the whole import and
+every error is reported with its row number.
+"""
+import csv
+import io
+from collections import defaultdict
+from datetime import date
+from decimal import Decimal, InvalidOperation
+from functools import reduce
+from operator import or_
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import BookedPercentExceeded, Customer, Trade, TradeMonthSummary
+from .response_cache import response_cache
+
+IMPORT_FIELDS = ['mprn', 'month', 'year', 'p_therm', 'percent', 'trade_date']
+MAX_IMPORT_ROWS = 100000
+# Keys per summary lookup; three parameters each, within SQLite's 999
+SUMMARY_CHUNK_SIZE = 300
+
+
+class TradeImportError(Exception):
+    """Raised when an import batch cannot be booked; carries per-row errors."""
+
+    def __init__(self, row_errors):
+        super().__init__('Trade import failed.')
+        self.row_errors = row_errors
+
+
+def read_csv_rows(uploaded_file):
+    """Read trade rows from an uploaded CSV file with a header line."""
+    text = io.TextIOWrapper(uploaded_file, encoding='utf-8-sig', newline='')
+    return [
+        {key.strip().lower(): (value or '').strip() for key, value in row.items() if key}
+        for row in csv.DictReader(text)
+    ]
+
+
+def _parse_decimal(value, max_digits, decimal_places, max_value=None):
+    """Parse a non-negative Decimal that fits a DecimalField(max_digits, decimal_places)."""
+    number = Decimal(str(value).strip())
+    if not number.is_finite() or number < 0:
+        raise ValueError
+    if number >= 10 ** (max_digits - decimal_places):
+        raise ValueError
+    if max_value is not None and number > max_value:
+        raise ValueError
+    if number.normalize().as_tuple().exponent < -decimal_places:
+        raise ValueError
+    return number.quantize(Decimal(1).scaleb(-decimal_places))
+
+
+def parse_row(row):
+    """Validate one raw row.
+
+    Returns:
+        tuple: (values, errors) where values holds parsed fields and errors
+               maps field names to messages
+    """
+    values = {}
+    errors = {}
+    if not isinstance(row, dict):
+        return values, {'non_field_errors': 'Each row must be an object.'}
+
+    missing = [field for field in IMPORT_FIELDS if row.get(field) in (None, '')]
+    for field in missing:
+        errors[field] = 'This field is required.'
+
+    mprn = str(row.get('mprn') or '').strip()
+    if 'mprn' not in errors:
+        if not mprn.isdigit() or len(mprn) != 10:
+            errors['mprn'] = 'MPRN must be exactly 10 digits.'
+        values['mprn'] = mprn
+
+    for field, low, high in (('month', 1, 12), ('year', 2000, 2100)):
+        if field in errors:
+            continue
+        try:
+            number = int(str(row[field]).strip())
+            if number < low or number > high:
+                raise ValueError
+            values[field] = number
+        except ValueError:
+            errors[field] = f'Must be a whole number between {low} and {high}.'
+
+    if 'p_therm' not in errors:
+        try:
+            values['p_therm'] = _parse_decimal(row['p_therm'], 10, 4)
+        except (ValueError, InvalidOperation):
+            errors['p_therm'] = 'Must be a non-negative number with at most 4 decimal places.'
+
+    if 'percent' not in errors:
+        try:
+            values['percent'] = _parse_decimal(row['percent'], 5, 2, max_value=100)
+        except (ValueError, InvalidOperation):
+            errors['percent'] = 'Must be a number between 0 and 100 with at most 2 decimal places.'
+
+    if 'trade_date' not in errors:
+        try:
+            values['trade_date'] = date.fromisoformat(str(row['trade_date']).strip())
+        except ValueError:
+            errors['trade_date'] = 'Must be a date in YYYY-MM-DD format.'
+
+    return values, errors
+
+
+def _load_summaries(groups, lock=False):
+    """Trade summaries for the (customer, year, month) keys of a batch.
+
+    The keys are matched exactly, SUMMARY_CHUNK_SIZE keys per query, so a
+    batch spread over many customers does not read (or lock) the months
+    of the customer x year x month cross product it does not touch.
+    """
+    keys = sorted(groups)
+    summaries = {}
+    for start in range(0, len(keys), SUMMARY_CHUNK_SIZE):
+        chunk = keys[start:start + SUMMARY_CHUNK_SIZE]
+        queryset = TradeMonthSummary.objects.filter(reduce(or_, (
+            Q(customer_id=customer_id, year=year, month=month) for customer_id, year, month in chunk
+        )))
+        if lock:
+            # Lock in key order, like Trade.save, so concurrent imports cannot
+            # deadlock; the chunks are in key order too
+            queryset = queryset.select_for_update().order_by('customer_id', 'year', 'month')
+        summaries.update((summary.key, summary) for summary in queryset)
+    return summaries
+
+
+def _check_caps(groups, summaries):
+    """Errors for rows whose month would exceed 100% booked."""
+    row_errors = {}
+    for key, rows in groups.items():
+        summary = summaries.get(key) or TradeMonthSummary()
+        try:
+            summary.check_cap(sum(values['percent'] for _, values in rows))
+        except BookedPercentExceeded as e:
+            for index, _ in rows:
+                row_errors[index] = {'percent': str(e)}
+    return row_errors
+
+
+def import_trades(business, rows):
+    """Validate and book a batch of trades for a business.
+
+    Args:
+        rows: list of dicts with mprn, month, year, p_therm, percent, trade_date
+
+    Returns:
+        int: number of trades created
+
+    Raises:
+        TradeImportError: with {row_number: {field: message}} if any row is invalid
+    """
+    row_errors = {}
+    parsed = []
+    for index, row in enumerate(rows, start=1):
+        values, errors = parse_row(row)
+        if errors:
+            row_errors[index] = errors
+        else:
+            parsed.append((index, values))
+
+    customer_ids = dict(
+        Customer.objects
+        .filter(business=business, mprn__in={values['mprn'] for _, values in parsed})
+        .values_list('mprn', 'id')
+    )
+
+    groups = defaultdict(list)
+    for index, values in parsed:
+        customer_id = customer_ids.get(values['mprn'])
+        if customer_id is None:
+            row_errors[index] = {'mprn': 'Customer with this MPRN not found in your business.'}
+            continue
+        groups[(customer_id, values['year'], values['month'])].append((index, values))
+
+    # Check the cap up front too, so cap errors are reported alongside row errors
+    row_errors.update(_check_caps(groups, _load_summaries(groups)))
+    if row_errors:
+        raise TradeImportError(row_errors)
+    if not groups:
+        return 0
+
+    with transaction.atomic():
+        # Make sure every affected month has a summary row, then lock them all
+        TradeMonthSummary.objects.bulk_create(
+            [
+                TradeMonthSummary(customer_id=customer_id, year=year, month=month)
+                for customer_id, year, month in groups
+            ],
+            ignore_conflicts=True,
+        )
+        summaries = _load_summaries(groups, lock=True)
+
+        # Re-check under the lock in case another booking landed meanwhile
+        row_errors = _check_caps(groups, summaries)
+        if row_errors:
+            raise TradeImportError(row_errors)
+
+        now = timezone.now()
+        trades = []
+        for key, group_rows in groups.items():
+            summary = summaries[key]
+            for _, values in group_rows:
+                trade = Trade(
+                    customer_id=key[0],
+                    year=values['year'],
+                    month=values['month'],
+                    p_therm=values['p_therm'],
+                    percent=values['percent'],
+                    trade_date=values['trade_date'],
+                    trade_no=summary.max_trade_no + 1,
+                )
+                summary.add_trade(trade.trade_no, trade.p_therm, trade.percent)
+                trades.append(trade)
+            summary.updated_at = now
+
+        Trade.objects.bulk_create(trades, batch_size=1000)
+        # The rows are locked above, so write the new totals back as one
+        # upsert rather than bulk_update's per-row CASE expressions
+        TradeMonthSummary.objects.bulk_create(
+            summaries.values(),
+            update_conflicts=True,
+            unique_fields=['customer', 'year', 'month'],
+            update_fields=['trade_count', 'total_percent', 'weighted_price', 'max_trade_no', 'updated_at'],
+            batch_size=1000,
+        )
+        # bulk_create sends no signals
+        response_cache.invalidate_many((customer_id, year) for customer_id, year, _ in summaries)
+
+    return len(trades)
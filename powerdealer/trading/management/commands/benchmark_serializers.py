@@ -0,0 +1,63 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+
+from trading.fast_serializers import CUSTOMER_COLUMNS, TRADE_COLUMNS, RowBuilder
+from trading.models import Business, Customer, Trade
+from trading.serializers import CustomerSerializer, TradeSerializer
+
+
+class Command(BaseCommand):
+    help = 'Compare DRF serializers with the values()-based fast path on existing trades and customers.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--business', type=int, help='Only use data of this business id.')
+        parser.add_argument('--rows', type=int, default=10000, help='Number of trades to serialize.')
+        parser.add_argument('--repeat', type=int, default=5, help='Runs per timing; the best run is reported.')
+
+    def handle(self, *args, **options):
+        trades = Trade.objects.order_by('year', 'month', 'trade_no', 'id')
+        customers = Customer.objects.all()
+        if options['business'] is not None:
+            if not Business.objects.filter(id=options['business']).exists():
+                raise CommandError(f"Business {options['business']} not found.")
+            trades = trades.filter(customer__business_id=options['business'])
+            customers = customers.filter(business_id=options['business'])
+        trades = trades[:options['rows']]
+
+        renderer = JSONRenderer()
+        cases = [
+            (
+                'trades',
+                lambda: TradeSerializer(trades.select_related('customer__user'), many=True).data,
+                lambda: RowBuilder(TRADE_COLUMNS).rows(trades),
+            ),
+            (
+                'customers',
+                lambda: CustomerSerializer(customers.select_related('user'), many=True).data,
+                lambda: RowBuilder(CUSTOMER_COLUMNS).rows(customers),
+            ),
+        ]
+
+        for name, serializer_path, fast_path in cases:
+            slow_output = serializer_path()
+            fast_output = fast_path()
+            if renderer.render(slow_output) != renderer.render(fast_output):
+                raise CommandError(f'Fast path output differs from the serializer for {name}.')
+
+            slow = self._best_time(serializer_path, options['repeat'])
+            fast = self._best_time(fast_path, options['repeat'])
+            self.stdout.write(
+                f'{name}: {len(fast_output)} rows, serializer {slow * 1000:.1f} ms, '
+                f'fast path {fast * 1000:.1f} ms ({slow / fast if fast else 0:.1f}x)'
+            )
+
+    def _best_time(self, func, repeat):
+        best = None
+        for _ in range(max(repeat, 1)):
+            start = time.perf_counter()
+            func()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best
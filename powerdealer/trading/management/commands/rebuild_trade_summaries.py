@@ -0,0 +1,30 @@
+import logging
+
+from django.core.management.base import BaseCommand, CommandError
+
+from trading.models import Business, Customer, TradeMonthSummary
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the monthly trade summaries from the Trade table.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--business',
+            type=int,
+            help='Only rebuild summaries for customers of this business id.',
+        )
+
+    def handle(self, *args, **options):
+        customers = None
+        business_id = options.get('business')
+        if business_id is not None:
+            if not Business.objects.filter(id=business_id).exists():
+                raise CommandError(f'Business {business_id} not found.')
+            customers = Customer.objects.filter(business_id=business_id)
+
+        written = TradeMonthSummary.rebuild(customers)
+        logger.info(f"Trade summaries rebuilt: {written} rows (business={business_id or 'all'})")
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {written} trade summaries.'))
@@ -0,0 +1,382 @@
+"""
+Prometheus metrics, aggregated across gunicorn workers.
+
+PerformanceMiddleware (middleware.py) records every request here: latency
+histogram, status counts, SQL query count and time per view, and the
+number of requests in flight. The user and response caches contribute
+their hit/miss/eviction/invalidation counters and sizes; this token
+protected endpoint is where cache statistics are published, not the
+health check.
+
+Each process keeps its series in memory and a background thread writes
+them every FLUSH_INTERVAL seconds to its own file,
+<DIR>/metrics-<pid>-<start time>.json (settings.METRICS); the start time
+keeps a new worker that reuses a PID from overwriting an old one's file.
+The /metrics view sums the files of all workers, so any of them can
+answer a scrape. Prometheus expects counters never to go down, so the
+counters and histograms of workers that have exited are folded into
+<DIR>/metrics-aggregate.json and their files removed; their in-flight
+gauges are dropped. Without a DIR (runserver, tests) only the current
+process is reported.
+"""
+import atexit
+import fcntl
+import json
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'DIR': '',
+    'FLUSH_INTERVAL': 1.0,
+    'TOKEN': '',
+}
+
+AGGREGATE_FILE = 'metrics-aggregate.json'
+LOCK_FILE = 'metrics.lock'
+
+# Seconds; the API's requests mostly fall between 5ms and 1s
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# name: (type, help)
+METRICS = {
+    'powerdealer_http_requests_total': ('counter', 'Requests handled, by view, method and status.'),
+    'powerdealer_http_request_duration_seconds': ('histogram', 'Request latency by view.'),
+    'powerdealer_http_requests_in_flight': ('gauge', 'Requests being handled right now.'),
+    'powerdealer_db_queries_total': ('counter', 'SQL queries run, by view.'),
+    'powerdealer_db_query_duration_seconds_total': ('counter', 'Time spent in SQL queries, by view.'),
+    'powerdealer_cache_hits_total': ('counter', 'Cache lookups answered from the cache.'),
+    'powerdealer_cache_misses_total': ('counter', 'Cache lookups that had to compute.'),
+    'powerdealer_cache_evictions_total': ('counter', 'Entries dropped to stay under the size limit.'),
+    'powerdealer_cache_invalidations_total': ('counter', 'Entries or scopes dropped because their data changed.'),
+    'powerdealer_user_cache_entries': ('gauge', 'Users held in the in-process user caches.'),
+    'powerdealer_cache_hit_ratio': ('gauge', 'Hits over lookups since the workers started.'),
+    'powerdealer_response_cache_entries': ('gauge', 'Entries in the response cache backend.'),
+    'powerdealer_response_cache_bytes': ('gauge', 'Size of the response cache backend.'),
+}
+
+
+def labels_key(**labels):
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def cache_counters():
+    """Hit, miss, eviction and invalidation counters of this process's user and response caches."""
+    from .response_cache import response_cache
+    from .user_cache import user_cache
+
+    series = {}
+    for name, cache in (('user', user_cache), ('response', response_cache)):
+        series[('powerdealer_cache_hits_total', labels_key(cache=name))] = cache.hits
+        series[('powerdealer_cache_misses_total', labels_key(cache=name))] = cache.misses
+        series[('powerdealer_cache_invalidations_total', labels_key(cache=name))] = cache.invalidations
+    series[('powerdealer_cache_evictions_total', labels_key(cache='user'))] = user_cache.evictions
+    return series
+
+
+def cache_gauges():
+    """Size of this process's user cache."""
+    from .user_cache import user_cache
+
+    return {('powerdealer_user_cache_entries', ()): user_cache.stats()['size']}
+
+
+def pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class MetricsStore:
+    """Counters, gauges and histograms of one process, optionally shared through files.
+
+    Args:
+        directory: Directory for the per-process files ('' keeps everything in memory)
+        flush_interval: Seconds between writes of this process's file
+        buckets: Upper bounds of the latency histogram buckets
+    """
+
+    def __init__(self, directory='', flush_interval=1.0, buckets=LATENCY_BUCKETS):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.buckets = tuple(buckets)
+        self.collectors = [cache_counters]
+        self.gauge_collectors = [cache_gauges]
+        self._lock = threading.Lock()
+        self._reset()
+
+    @classmethod
+    def from_settings(cls):
+        options = {**DEFAULTS, **getattr(settings, 'METRICS', {})}
+        return cls(directory=options['DIR'], flush_interval=options['FLUSH_INTERVAL'])
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._filename = f'metrics-{self._pid}-{time.time_ns()}.json'
+        self._counters = {}
+        self._gauges = {}
+        # key: [count per bucket (last one is +Inf)..., sum]
+        self._histograms = {}
+        self._dirty = False
+        self._flusher = None
+
+    def _check_process(self, start_flusher=True):
+        # Series recorded before a fork (gunicorn --preload) belong to the parent
+        if self._pid != os.getpid():
+            self._reset()
+        if start_flusher and self.directory and self._flusher is None:
+            self._flusher = threading.Thread(target=self._flush_loop, name='metrics-flush', daemon=True)
+            self._flusher.start()
+
+    def inc(self, name, labels=(), amount=1):
+        with self._lock:
+            self._check_process()
+            key = (name, labels)
+            self._counters[key] = self._counters.get(key, 0) + amount
+            self._dirty = True
+
+    def add_gauge(self, name, labels=(), amount=1):
+        with self._lock:
+            self._check_process()
+            key = (name, labels)
+            self._gauges[key] = self._gauges.get(key, 0) + amount
+            self._dirty = True
+
+    def observe(self, name, labels, value):
+        with self._lock:
+            self._check_process()
+            key = (name, labels)
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [0] * (len(self.buckets) + 2)
+            index = len(self.buckets)
+            for position, bound in enumerate(self.buckets):
+                if value <= bound:
+                    index = position
+                    break
+            histogram[index] += 1
+            histogram[-1] += value
+            self._dirty = True
+
+    def record_request(self, view, method, status, duration, queries, sql_time):
+        """Record a finished request (called by PerformanceMiddleware)."""
+        view = view or 'unmatched'
+        self.inc('powerdealer_http_requests_total', labels_key(view=view, method=method, status=status))
+        self.observe('powerdealer_http_request_duration_seconds', labels_key(view=view), duration)
+        self.inc('powerdealer_db_queries_total', labels_key(view=view), queries)
+        self.inc('powerdealer_db_query_duration_seconds_total', labels_key(view=view), sql_time)
+
+    def snapshot(self):
+        """This process's series, as written to its file."""
+        with self._lock:
+            self._check_process(start_flusher=False)
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+            histograms = {key: list(values) for key, values in self._histograms.items()}
+            self._dirty = False
+        for collect in self.collectors:
+            counters.update(collect())
+        for collect in self.gauge_collectors:
+            gauges.update(collect())
+        return {
+            'pid': self._pid,
+            'buckets': list(self.buckets),
+            'counters': [[name, labels, value] for (name, labels), value in counters.items()],
+            'gauges': [[name, labels, value] for (name, labels), value in gauges.items()],
+            'histograms': [[name, labels, values] for (name, labels), values in histograms.items()],
+        }
+
+    def flush(self):
+        """Write this process's series to its file (atomically)."""
+        if not self.directory:
+            return
+        data = self.snapshot()
+        os.makedirs(self.directory, exist_ok=True)
+        write_json(os.path.join(self.directory, self._filename), data)
+
+    def _flush_loop(self):
+        pid = os.getpid()
+        while self._pid == pid:
+            time.sleep(self.flush_interval)
+            if self._dirty:
+                try:
+                    self.flush()
+                except OSError as e:
+                    logger.warning(f"Metrics flush failed: {e}")
+
+    def _snapshots(self):
+        if not self.directory:
+            return [self.snapshot()]
+        self.flush()
+        # One scrape at a time, so a file is never read both on its own and folded
+        with open(os.path.join(self.directory, LOCK_FILE), 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            self._fold_exited()
+            return [data for _, data in self._read_files()]
+
+    def _read_files(self):
+        """(name, data) of the metrics files in the directory, the aggregate included."""
+        files = []
+        for entry in os.scandir(self.directory):
+            if not (entry.name.startswith('metrics-') and entry.name.endswith('.json')):
+                continue
+            data = read_json(entry.path)
+            if data is not None:
+                files.append((entry.name, data))
+        return files
+
+    def _fold_exited(self):
+        """Move the counters and histograms of exited workers into the aggregate file."""
+        aggregate_path = os.path.join(self.directory, AGGREGATE_FILE)
+        aggregate = read_json(aggregate_path) or {
+            'pid': None, 'buckets': list(self.buckets), 'counters': [], 'gauges': [], 'histograms': [],
+            'folded': [],
+        }
+        if aggregate['buckets'] != list(self.buckets):
+            return
+
+        exited = []
+        for name, data in self._read_files():
+            if name == AGGREGATE_FILE:
+                continue
+            if name in aggregate['folded']:
+                # Folded by a scrape that stopped before removing it
+                remove_file(os.path.join(self.directory, name))
+            elif data['buckets'] == aggregate['buckets'] and not (
+                data['pid'] == os.getpid() or pid_alive(data['pid'])
+            ):
+                exited.append((name, data))
+        if not exited:
+            return
+
+        counters, _, histograms = sum_series([aggregate] + [data for _, data in exited])
+        aggregate['counters'] = [[name, labels, value] for (name, labels), value in counters.items()]
+        aggregate['histograms'] = [[name, labels, values] for (name, labels), values in histograms.items()]
+        # Recorded first, so a file is never counted twice even if removing it fails
+        aggregate['folded'] = [name for name, _ in exited]
+        write_json(aggregate_path, aggregate)
+        for name, _ in exited:
+            remove_file(os.path.join(self.directory, name))
+
+    def collect(self):
+        """Series summed over every process: (counters, gauges, histograms)."""
+        return sum_series(
+            data for data in self._snapshots() if data['buckets'] == list(self.buckets)
+        )
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format."""
+        counters, gauges, histograms = self.collect()
+
+        for cache in ('user', 'response'):
+            hits = counters.get(('powerdealer_cache_hits_total', labels_key(cache=cache)), 0)
+            misses = counters.get(('powerdealer_cache_misses_total', labels_key(cache=cache)), 0)
+            if hits + misses:
+                gauges[('powerdealer_cache_hit_ratio', labels_key(cache=cache))] = hits / (hits + misses)
+        gauges.setdefault(('powerdealer_http_requests_in_flight', ()), 0)
+
+        # The response cache backend is shared, so read it once here rather than per worker
+        from .response_cache import response_cache
+        entries, size = response_cache.usage()
+        if entries is not None:
+            gauges[('powerdealer_response_cache_entries', ())] = entries
+            gauges[('powerdealer_response_cache_bytes', ())] = size
+
+        lines = []
+        for name, (kind, description) in METRICS.items():
+            if kind == 'histogram':
+                series = sorted((key, value) for key, value in histograms.items() if key[0] == name)
+            else:
+                source = counters if kind == 'counter' else gauges
+                series = sorted((key, value) for key, value in source.items() if key[0] == name)
+            if not series:
+                continue
+            lines.append(f'# HELP {name} {description}')
+            lines.append(f'# TYPE {name} {kind}')
+            for (_, labels), value in series:
+                if kind == 'histogram':
+                    lines.extend(self._histogram_lines(name, labels, value))
+                else:
+                    lines.append(f'{name}{format_labels(labels)} {format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+    def _histogram_lines(self, name, labels, values):
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), values[:-1]):
+            cumulative += count
+            le = '+Inf' if bound == float('inf') else format_value(bound)
+            yield f'{name}_bucket{format_labels(labels + (("le", le),))} {cumulative}'
+        yield f'{name}_sum{format_labels(labels)} {format_value(values[-1])}'
+        yield f'{name}_count{format_labels(labels)} {cumulative}'
+
+
+def sum_series(snapshots):
+    """(counters, gauges, histograms) summed over snapshots; gauges of live processes only."""
+    counters, gauges, histograms = {}, {}, {}
+    for data in snapshots:
+        live = data['pid'] is not None and (data['pid'] == os.getpid() or pid_alive(data['pid']))
+        for name, labels, value in data['counters']:
+            key = (name, tuple(map(tuple, labels)))
+            counters[key] = counters.get(key, 0) + value
+        if live:
+            for name, labels, value in data['gauges']:
+                key = (name, tuple(map(tuple, labels)))
+                gauges[key] = gauges.get(key, 0) + value
+        for name, labels, values in data['histograms']:
+            key = (name, tuple(map(tuple, labels)))
+            total = histograms.setdefault(key, [0] * len(values))
+            for index, value in enumerate(values):
+                total[index] += value
+    return counters, gauges, histograms
+
+
+def read_json(path):
+    try:
+        with open(path) as handle:
+            return json.load(handle)
+    except (OSError, ValueError):
+        # Removed or being replaced; its next version is picked up by the next scrape
+        return None
+
+
+def write_json(path, data):
+    temporary = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(temporary, 'w') as handle:
+        json.dump(data, handle)
+    os.replace(temporary, path)
+
+
+def remove_file(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    pairs = (
+        key + '="' + value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') + '"'
+        for key, value in labels
+    )
+    return '{' + ','.join(pairs) + '}'
+
+
+def format_value(value):
+    if isinstance(value, float):
+        return repr(round(value, 6))
+    return str(value)
+
+
+metrics = MetricsStore.from_settings()
+atexit.register(metrics.flush)
@@ -0,0 +1,199 @@
+"""
+Per-request performance instrumentation.
+
+PerformanceMiddleware times every request and splits it into:
+
+- db: SQL time and query count, measured by a connection.execute_wrapper
+- serialize: turning models into response data, measured around
+  to_representation of serializers using TimedSerializerMixin and around
+  RowBuilder (SQL run meanwhile counts as db, not serialize)
+- render: DRF rendering of the response (JSON encoding), measured from
+  process_template_response to the response's post-render callback
+- app: everything else (Python in views, validation, middleware)
+
+The split is sent back as a Server-Timing header, which browser dev
+tools show next to each request, and logged to the 'trading.performance'
+logger with structured fields (view_name, business_id, ...). Requests
+slower than settings.PERFORMANCE_SLOW_MS are logged at INFO, the rest at
+DEBUG. Every request is also counted in the Prometheus metrics served
+at /metrics (metrics.py).
+
+NPlusOneMiddleware flags requests that run one statement many times
+(nplusone.py).
+"""
+import logging
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+
+from . import nplusone
+from .metrics import metrics
+
+logger = logging.getLogger('trading.performance')
+
+# RequestTimings of the request this thread is handling, for timed_serialization
+current_timings = ContextVar('current_timings', default=None)
+
+
+class RequestTimings:
+    """Timings collected for one request; also the SQL execute wrapper."""
+
+    def __init__(self):
+        self.queries = 0
+        self.sql = 0.0
+        self.serialize = 0.0
+        self.render = 0.0
+        self._serialize_started = None
+        self._render_started = None
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql += time.perf_counter() - start
+            self.queries += 1
+
+    def start_serialize(self):
+        """Start timing serialization; False if already timing it (a nested serializer)."""
+        if self._serialize_started is not None:
+            return False
+        self._serialize_started = (time.perf_counter(), self.sql)
+        return True
+
+    def end_serialize(self):
+        started, sql = self._serialize_started
+        self.serialize += time.perf_counter() - started - (self.sql - sql)
+        self._serialize_started = None
+
+    def start_render(self):
+        self._render_started = time.perf_counter()
+
+    def end_render(self, response):
+        if self._render_started is not None:
+            self.render += time.perf_counter() - self._render_started
+            self._render_started = None
+
+
+def timed_serialization(serialize, *args):
+    """Call serialize(*args), counting it as the current request's serialize time."""
+    timings = current_timings.get()
+    if timings is None or not timings.start_serialize():
+        return serialize(*args)
+    try:
+        return serialize(*args)
+    finally:
+        timings.end_serialize()
+
+
+def view_name(request):
+    """URL name of the resolved view (its dotted path for unnamed routes), or None."""
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match else None
+
+
+def business_id(request):
+    """Business of the request's tenant, if a view resolved one (see tenant.get_tenant)."""
+    tenant = getattr(request, 'tenant', None)
+    if tenant is None:
+        return None
+    if tenant.business is not None:
+        return tenant.business.id
+    if tenant.customer is not None:
+        return tenant.customer.business_id
+    return None
+
+
+class PerformanceMiddleware:
+    """Adds Server-Timing headers and performance log lines to every request."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = getattr(settings, 'PERFORMANCE_TIMING', True)
+
+    def __call__(self, request):
+        if not self.enabled:
+            return self.get_response(request)
+
+        timings = request.timings = RequestTimings()
+        metrics.add_gauge('powerdealer_http_requests_in_flight')
+        token = current_timings.set(timings)
+        start = time.perf_counter()
+        try:
+            with connection.execute_wrapper(timings):
+                response = self.get_response(request)
+        finally:
+            current_timings.reset(token)
+            metrics.add_gauge('powerdealer_http_requests_in_flight', amount=-1)
+        total = time.perf_counter() - start
+        metrics.record_request(
+            view_name(request), request.method, response.status_code, total, timings.queries, timings.sql,
+        )
+
+        app = max(total - timings.sql - timings.serialize - timings.render, 0)
+        response['Server-Timing'] = (
+            f'db;dur={timings.sql * 1000:.2f};desc="{timings.queries} queries", '
+            f'serialize;dur={timings.serialize * 1000:.2f}, '
+            f'render;dur={timings.render * 1000:.2f}, '
+            f'app;dur={app * 1000:.2f}, '
+            f'total;dur={total * 1000:.2f}'
+        )
+        self.log(request, response, timings, total)
+        return response
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered after this hook returns
+        timings = getattr(request, 'timings', None)
+        if timings is not None:
+            timings.start_render()
+            response.add_post_render_callback(timings.end_render)
+        return response
+
+    def log(self, request, response, timings, total):
+        slow = getattr(settings, 'PERFORMANCE_SLOW_MS', 500) / 1000
+        level = logging.INFO if total >= slow else logging.DEBUG
+        if not logger.isEnabledFor(level):
+            return
+        fields = {
+            'view_name': view_name(request),
+            'business_id': business_id(request),
+            'method': request.method,
+            'path': request.path,
+            'status_code': response.status_code,
+            'duration_ms': round(total * 1000, 2),
+            'db_ms': round(timings.sql * 1000, 2),
+            'db_queries': timings.queries,
+            'serialize_ms': round(timings.serialize * 1000, 2),
+            'render_ms': round(timings.render * 1000, 2),
+        }
+        logger.log(
+            level,
+            ' '.join(f'{key}={value}' for key, value in fields.items()),
+            extra=fields,
+        )
+
+
+class NPlusOneMiddleware:
+    """Raises or logs when a request repeats a statement (settings.NPLUSONE)."""
+
+    def __init__(self, get_response):
+        options = {**nplusone.DEFAULTS, **getattr(settings, 'NPLUSONE', {})}
+        if options['MODE'] not in ('raise', 'log'):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.mode = options['MODE']
+        self.threshold = options['THRESHOLD']
+
+    def __call__(self, request):
+        fingerprints = nplusone.QueryFingerprints(
+            self.threshold, f'{request.method} {request.path}', raise_early=self.mode == 'raise',
+        )
+        with connection.execute_wrapper(fingerprints):
+            response = self.get_response(request)
+        nplusone.check(
+            fingerprints, self.mode, view_name=view_name(request), business_id=business_id(request),
+        )
+        return response
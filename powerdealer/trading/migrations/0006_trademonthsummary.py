@@ -0,0 +1,58 @@
+# Generated by Django 5.2.11 on 2026-10-18 14:58
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, DecimalField, F, Max, Sum
+
+
+def build_summaries(apps, schema_editor):
+    """Populate summaries for trades booked before the table existed."""
+    Trade = apps.get_model('trading', 'Trade')
+    TradeMonthSummary = apps.get_model('trading', 'TradeMonthSummary')
+    monthly_totals = (
+        Trade.objects
+        .order_by()
+        .values('customer_id', 'year', 'month')
+        .annotate(
+            trade_count=Count('id'),
+            total_percent=Sum('percent'),
+            weighted_price=Sum(
+                F('p_therm') * F('percent'),
+                output_field=DecimalField(max_digits=20, decimal_places=6),
+            ),
+            max_trade_no=Max('trade_no'),
+        )
+    )
+    TradeMonthSummary.objects.bulk_create(
+        [TradeMonthSummary(**totals) for totals in monthly_totals],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trading', '0005_remove_customer_unique_mobile_per_business_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TradeMonthSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.PositiveSmallIntegerField()),
+                ('month', models.PositiveSmallIntegerField()),
+                ('trade_count', models.PositiveIntegerField(default=0)),
+                ('total_percent', models.DecimalField(decimal_places=2, default=0, max_digits=7)),
+                ('weighted_price', models.DecimalField(decimal_places=6, default=0, max_digits=20, verbose_name='Σ(P/Therm × Percent)')),
+                ('max_trade_no', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('customer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trade_summaries', to='trading.customer')),
+            ],
+            options={
+                'ordering': ['-year', '-month'],
+                'constraints': [models.UniqueConstraint(fields=('customer', 'year', 'month'), name='unique_trade_summary_per_customer_month_year')],
+            },
+        ),
+        migrations.RunPython(build_summaries, migrations.RunPython.noop),
+    ]
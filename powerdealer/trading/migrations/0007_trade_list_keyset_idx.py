@@ -0,0 +1,17 @@
+# Generated by Django 5.2.11 on 2026-10-18 15:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trading', '0006_trademonthsummary'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='trade',
+            index=models.Index(fields=['year', 'month', 'trade_no', 'id'], name='trade_list_keyset_idx'),
+        ),
+    ]
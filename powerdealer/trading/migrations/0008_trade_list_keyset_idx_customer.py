@@ -0,0 +1,21 @@
+# Generated by Django 5.2.11 on 2026-10-18 16:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trading', '0007_trade_list_keyset_idx'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='trade',
+            name='trade_list_keyset_idx',
+        ),
+        migrations.AddIndex(
+            model_name='trade',
+            index=models.Index(fields=['customer', 'year', 'month', 'trade_no', 'id'], name='trade_list_keyset_idx'),
+        ),
+    ]
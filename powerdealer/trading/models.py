@@ -1,7 +1,11 @@
-from django.db import models
+from decimal import Decimal
+
+from django.db import models, transaction
 from django.contrib.auth.models import User
 from django.core.validators import RegexValidator, MinValueValidator, MaxValueValidator
-from django.db.models import Max
+from django.db.models import DecimalField, F, Max, Sum, Count
+
+from .response_cache import response_cache
 
 
 class Business(models.Model):
@@ -55,6 +59,17 @@ class Customer(models.Model):
         return f"{self.user.get_full_name()} - {self.mprn}"
 
 
+class BookedPercentExceeded(Exception):
+    """Raised when a booking would take a month's booked percent over 100%."""
+
+    def __init__(self, total_percent, new_total):
+        self.total_percent = total_percent
+        self.new_total = new_total
+        super().__init__(
+            f"Total booked ({new_total}%) would exceed 100%. Current total: {total_percent}%"
+        )
+
+
 class Trade(models.Model):
     """Trade model for monthly trading records per customer"""
     customer = models.ForeignKey(Customer, on_delete=models.CASCADE, related_name='trades')
@@ -88,16 +103,197 @@ class Trade(models.Model):
                 name='unique_trade_per_customer_month_year',
             )
         ]
+        indexes = [
+            # Keyset pagination order for the trade list, within the customer
+            # every list query is scoped to
+            models.Index(fields=['customer', 'year', 'month', 'trade_no', 'id'], name='trade_list_keyset_idx'),
+        ]
 
     def __str__(self):
         return f"Trade {self.trade_no} - {self.customer} ({self.month}/{self.year})"
 
     def save(self, *args, **kwargs):
-        if not self.trade_no:
-            max_trade = Trade.objects.filter(
-                customer=self.customer,
-                year=self.year,
-                month=self.month
-            ).aggregate(Max('trade_no'))['trade_no__max']
-            self.trade_no = (max_trade or 0) + 1
-        super().save(*args, **kwargs)
+        with transaction.atomic():
+            previous = None
+            if self.pk:
+                previous = Trade.objects.filter(pk=self.pk).values(
+                    'customer_id', 'year', 'month', 'trade_no', 'p_therm', 'percent'
+                ).first()
+
+            # Lock the month's summary row before writing. It doubles as the
+            # trade_no counter, so concurrent bookings for the same month
+            # queue on this lock instead of racing on MAX(trade_no) + 1.
+            keys = {(self.customer_id, self.year, self.month)}
+            if previous:
+                keys.add(TradeMonthSummary.key_of(previous))
+            summaries = {key: TradeMonthSummary.lock(*key) for key in sorted(keys)}
+            summary = summaries[(self.customer_id, self.year, self.month)]
+
+            if previous:
+                previous_summary = summaries[TradeMonthSummary.key_of(previous)]
+                previous_summary.remove_trade(**previous)
+
+            # Enforce the 100% cap under the same lock, so concurrent
+            # bookings cannot jointly push a month over
+            summary.check_cap(self.percent)
+
+            if not self.trade_no:
+                self.trade_no = summary.max_trade_no + 1
+            super().save(*args, **kwargs)
+
+            if previous and previous_summary is not summary:
+                previous_summary.save()
+            summary.add_trade(self.trade_no, self.p_therm, self.percent)
+            summary.save()
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            summary = TradeMonthSummary.lock(self.customer_id, self.year, self.month)
+            result = super().delete(*args, **kwargs)
+            summary.remove_trade(trade_no=self.trade_no, p_therm=self.p_therm, percent=self.percent)
+            summary.save()
+        return result
+
+
+class TradeMonthSummary(models.Model):
+    """Running trade totals for one customer delivery month.
+
+    Kept up to date by Trade.save and Trade.delete inside the same
+    transaction as the trade write, so readers get the booked percent and
+    weighted price of a month with one indexed lookup instead of rescanning
+    its trades. The locked row is also the month's trade_no counter.
+    Every write path of the app goes through Trade.save and Trade.delete
+    (the admin's bulk delete included) or, for imports, updates the
+    summaries itself. Queryset updates and deletes from a shell or a data
+    migration do not; run the rebuild_trade_summaries command after them.
+    """
+    customer = models.ForeignKey(Customer, on_delete=models.CASCADE, related_name='trade_summaries')
+    year = models.PositiveSmallIntegerField()
+    month = models.PositiveSmallIntegerField()
+    trade_count = models.PositiveIntegerField(default=0)
+    total_percent = models.DecimalField(max_digits=7, decimal_places=2, default=0)
+    weighted_price = models.DecimalField(
+        max_digits=20,
+        decimal_places=6,
+        default=0,
+        verbose_name='Σ(P/Therm × Percent)',
+    )
+    max_trade_no = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-year', '-month']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['customer', 'year', 'month'],
+                name='unique_trade_summary_per_customer_month_year',
+            )
+        ]
+
+    def __str__(self):
+        return f"Trade summary - {self.customer_id} ({self.month}/{self.year})"
+
+    @property
+    def key(self):
+        return (self.customer_id, self.year, self.month)
+
+    @staticmethod
+    def key_of(values):
+        return (values['customer_id'], values['year'], values['month'])
+
+    @property
+    def traded_price(self):
+        """Weighted average traded price: SUM(p_therm × percent) / SUM(percent).
+
+        Returns:
+            Decimal: Weighted average traded price in p/therm (8 decimal places)
+        """
+        if self.total_percent > 0:
+            return round(self.weighted_price / self.total_percent, 8)
+        return Decimal('0')
+
+    @classmethod
+    def lock(cls, customer_id, year, month):
+        """Fetch (creating if needed) and row-lock the summary for a month.
+
+        A missing row is inserted with ON CONFLICT DO NOTHING, so two
+        transactions creating the same month both end up waiting on the one
+        row lock rather than one of them failing with an IntegrityError.
+        """
+        locked = cls.objects.select_for_update().filter(
+            customer_id=customer_id, year=year, month=month
+        )
+        summary = locked.first()
+        if summary is None:
+            cls.objects.bulk_create(
+                [cls(customer_id=customer_id, year=year, month=month)],
+                ignore_conflicts=True,
+            )
+            summary = locked.get()
+        return summary
+
+    def check_cap(self, percent):
+        """Raise BookedPercentExceeded if booking percent more would pass 100%."""
+        total_percent = self.total_percent if self.trade_count else 0
+        new_total = total_percent + percent
+        if new_total > 100:
+            raise BookedPercentExceeded(total_percent, new_total)
+
+    def add_trade(self, trade_no, p_therm, percent):
+        self.trade_count += 1
+        self.total_percent += percent
+        self.weighted_price += p_therm * percent
+        self.max_trade_no = max(self.max_trade_no, trade_no)
+
+    def remove_trade(self, trade_no, p_therm, percent, **kwargs):
+        self.trade_count -= 1
+        self.total_percent -= percent
+        self.weighted_price -= p_therm * percent
+        if trade_no >= self.max_trade_no:
+            # Only the highest number needs a rescan, and only on removal
+            self.max_trade_no = Trade.objects.filter(
+                customer_id=self.customer_id, year=self.year, month=self.month
+            ).exclude(trade_no=trade_no).aggregate(Max('trade_no'))['trade_no__max'] or 0
+
+    @classmethod
+    def rebuild(cls, customers=None):
+        """Recompute summaries from the Trade table.
+
+        Args:
+            customers: Optional Customer queryset to limit the rebuild to
+
+        Returns:
+            int: Number of summary rows written
+        """
+        trades = Trade.objects.all()
+        summaries = cls.objects.all()
+        if customers is not None:
+            trades = trades.filter(customer__in=customers)
+            summaries = summaries.filter(customer__in=customers)
+
+        monthly_totals = (
+            trades
+            .order_by()
+            .values('customer_id', 'year', 'month')
+            .annotate(
+                trade_count=Count('id'),
+                total_percent=Sum('percent'),
+                weighted_price=Sum(
+                    F('p_therm') * F('percent'),
+                    output_field=DecimalField(max_digits=20, decimal_places=6),
+                ),
+                max_trade_no=Max('trade_no'),
+            )
+        )
+
+        with transaction.atomic():
+            # Summaries feed cached pivots and projections; bulk writes send no signals
+            keys = set(summaries.order_by().values_list('customer_id', 'year').distinct())
+            summaries.delete()
+            created = cls.objects.bulk_create(
+                [cls(**totals) for totals in monthly_totals],
+                batch_size=1000,
+            )
+            keys.update((summary.customer_id, summary.year) for summary in created)
+            response_cache.invalidate_many(keys)
+        return len(created)
@@ -0,0 +1,135 @@
+"""
+N+1 query detection.
+
+Code that runs the same parameterized statement in a loop (a .get() per
+month, a lazy foreign key per row) shows up as one SQL string with many
+parameter sets. QueryFingerprints counts the SELECTs of a request by
+fingerprint (the SQL with IN lists and numeric literals collapsed) and
+reports every fingerprint run more than THRESHOLD times, with the project
+stack of one of the repeats.
+
+Only single-row style reads are counted. Writes are not: bulk_create
+sends one INSERT per batch and upserts repeat by design. Neither are
+batched reads with BATCH_PARAMS or more parameters, such as the chunked
+summary lookups of a trade import.
+
+NPlusOneMiddleware (middleware.py) applies it to every request according
+to settings.NPLUSONE['MODE']:
+
+- 'raise': the query over the threshold raises RepeatedQueries, so the
+  request's transaction rolls back and its test fails; the default when
+  running the test suite
+- 'log': a warning on the 'trading.nplusone' logger (staging)
+- 'off': the middleware is not loaded (production)
+
+detect_repeated_queries() does the same around any block of code.
+"""
+import logging
+import re
+import sys
+from collections import Counter
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connection
+
+from .slow_queries import project_frames
+
+logger = logging.getLogger('trading.nplusone')
+
+DEFAULTS = {
+    'MODE': 'off',
+    'THRESHOLD': 5,
+}
+
+# Reads with this many parameters are batches, not per-row lookups
+BATCH_PARAMS = 100
+
+IN_LIST = re.compile(r'IN \((?:%s, )*%s\)')
+NUMBER = re.compile(r'\b\d+\b')
+
+
+class RepeatedQueries(Exception):
+    """Raised in 'raise' mode when a statement runs more than THRESHOLD times."""
+
+
+def fingerprint(sql, params=None, many=False):
+    """Normalised statement, or None for statements that are not checked."""
+    if many or sql.lstrip()[:6].upper() != 'SELECT':
+        return None
+    if params is not None and len(params) >= BATCH_PARAMS:
+        return None
+    return NUMBER.sub('?', IN_LIST.sub('IN (...)', sql))
+
+
+class QueryFingerprints:
+    """Execute wrapper counting statements by fingerprint.
+
+    Args:
+        threshold: A fingerprint run more than this many times is repeated
+        label: Name of the request or block, for reports
+        raise_early: Raise RepeatedQueries from the first query over the
+                     threshold, before it runs and before anything commits
+    """
+
+    def __init__(self, threshold=5, label='block', raise_early=False):
+        self.threshold = threshold
+        self.label = label
+        self.raise_early = raise_early
+        self.counts = Counter()
+        self.stacks = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        key = fingerprint(sql, params, many)
+        if key is not None:
+            self.counts[key] += 1
+            if self.counts[key] == self.threshold + 1:
+                # One repeat's stack is enough to find the loop
+                self.stacks[key] = project_frames(sys._getframe(1))
+                if self.raise_early:
+                    raise RepeatedQueries(self.report())
+        return execute(sql, params, many, context)
+
+    def repeated(self):
+        """[(fingerprint, count, stack)] of the statements over the threshold."""
+        return [
+            (key, count, self.stacks.get(key, []))
+            for key, count in self.counts.most_common()
+            if count > self.threshold
+        ]
+
+    def report(self):
+        lines = [f'Repeated queries in {self.label} (threshold {self.threshold}):']
+        for key, count, stack in self.repeated():
+            lines.append(f'  {count}x {key}')
+            lines.extend(f'      at {name} ({path}:{line})' for name, path, line in stack)
+        return '\n'.join(lines)
+
+
+@contextmanager
+def detect_repeated_queries(label='block', threshold=None, mode='raise'):
+    """Check the statements run inside the block ('raise' or 'log' on repeats)."""
+    if threshold is None:
+        threshold = {**DEFAULTS, **getattr(settings, 'NPLUSONE', {})}['THRESHOLD']
+    fingerprints = QueryFingerprints(threshold, label, raise_early=mode == 'raise')
+    with connection.execute_wrapper(fingerprints):
+        yield fingerprints
+    check(fingerprints, mode)
+
+
+def check(fingerprints, mode, **fields):
+    """Raise or log if fingerprints found repeated statements.
+
+    In 'raise' mode this also catches a repeat whose early RepeatedQueries
+    was swallowed by the code under test.
+    """
+    repeated = fingerprints.repeated()
+    if not repeated:
+        return
+    report = fingerprints.report()
+    if mode == 'raise':
+        raise RepeatedQueries(report)
+    logger.warning(report, extra={
+        **fields,
+        'repeated_queries': [{'sql': key, 'count': count} for key, count, _ in repeated],
+    })
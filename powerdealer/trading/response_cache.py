@@ -0,0 +1,180 @@
+"""
+Response cache for per-customer, per-year reads (pivots and projection grids).
+
+Entries are keyed by (endpoint, business, customer, year(s), params) plus
+the current version of every scope the data depends on:
+
+- year scope (customer, year): trades, trade summaries and projections of
+  that year. Bumped by the signal handlers in signals.py and by the bulk
+  paths that bypass signals (trade import, projection grid save, summary
+  rebuild).
+- profile scope (the customer's user): the customer/user fields echoed in
+  a response, bumped on Customer and User saves.
+
+Bumping a version makes every entry built on the old one unreachable; the
+stale entries age out of the cache on their own. Versions are kept in the
+same cache as the entries, so with a file cache (the production default,
+settings.CACHES['responses']) all gunicorn workers of a container see an
+invalidation at once.
+
+Only successful data payloads are cached, after the view has checked
+access, so a hit never skips authorization.
+"""
+import hashlib
+import os
+import threading
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+
+DEFAULTS = {
+    'ALIAS': 'responses',
+    'ENABLED': True,
+}
+
+
+def year_scope(customer_id, year):
+    return f'{customer_id}:{year}'
+
+
+def profile_scope(user_id):
+    return f'user:{user_id}'
+
+
+class ResponseCache:
+    """Version-keyed cache of response data with hit/miss counters.
+
+    Args:
+        alias: Django cache alias holding entries and versions
+        enabled: When False every lookup computes (for debugging)
+    """
+
+    def __init__(self, alias='responses', enabled=True):
+        self.alias = alias
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @classmethod
+    def from_settings(cls):
+        options = {**DEFAULTS, **getattr(settings, 'RESPONSE_CACHE', {})}
+        return cls(alias=options['ALIAS'], enabled=options['ENABLED'])
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def _versions(self, scopes):
+        """Current version token of each scope, creating missing ones.
+
+        A missing version (never set, or culled by the backend) gets a
+        fresh token rather than a default, so it can never match an entry
+        written under an earlier version.
+        """
+        keys = [f'rc-version:{scope}' for scope in scopes]
+        versions = self.cache.get_many(keys)
+        for key in keys:
+            if key not in versions:
+                self.cache.add(key, uuid.uuid4().hex, None)
+                versions[key] = self.cache.get(key)
+        return [versions[key] for key in keys]
+
+    def get_or_set(self, endpoint, customer, years, compute, params=None, profile=False):
+        """Cached result of compute() for a customer's years.
+
+        Args:
+            endpoint: Name of the cached computation
+            customer: Customer the data belongs to (scopes the key to its business)
+            years: Years the data reads; each one's year scope is a dependency
+            compute: Callable building the data on a miss
+            params: Other inputs that change the output (hashed into the key)
+            profile: Whether the data includes customer/user profile fields
+        """
+        if not self.enabled:
+            return compute()
+
+        years = sorted(set(years))
+        scopes = [year_scope(customer.id, year) for year in years]
+        if profile:
+            scopes.append(profile_scope(customer.user_id))
+        digest = hashlib.sha1(
+            repr((sorted((params or {}).items()), self._versions(scopes))).encode()
+        ).hexdigest()
+        key = f"rc:{endpoint}:{customer.business_id}:{customer.id}:{'-'.join(map(str, years))}:{digest}"
+
+        data = self.cache.get(key)
+        if data is not None:
+            with self._lock:
+                self.hits += 1
+            return data
+
+        with self._lock:
+            self.misses += 1
+        data = compute()
+        self.cache.set(key, data)
+        return data
+
+    def invalidate(self, customer_id, *years):
+        """Bump the year scopes of a customer now and again on commit.
+
+        The second bump drops anything a concurrent request cached from
+        the pre-commit rows in between.
+        """
+        self._bump_on_commit([year_scope(customer_id, year) for year in years])
+
+    def invalidate_many(self, keys):
+        """Bump the year scopes of many (customer_id, year) pairs."""
+        self._bump_on_commit([year_scope(customer_id, year) for customer_id, year in set(keys)])
+
+    def invalidate_profile(self, user_id):
+        """Bump the profile scope of a customer's user."""
+        self._bump_on_commit([profile_scope(user_id)])
+
+    def _bump_on_commit(self, scopes):
+        self._bump(scopes)
+        transaction.on_commit(lambda: self._bump(scopes))
+
+    def _bump(self, scopes):
+        if not scopes:
+            return
+        self.cache.set_many({f'rc-version:{scope}': uuid.uuid4().hex for scope in scopes}, None)
+        with self._lock:
+            self.invalidations += len(scopes)
+
+    def usage(self):
+        """(entries, bytes) held by the backend, where it can tell."""
+        cache = self.cache
+        if isinstance(cache, LocMemCache):
+            with cache._lock:
+                return len(cache._cache), sum(len(value) for value in cache._cache.values())
+        if isinstance(cache, FileBasedCache):
+            try:
+                files = [entry for entry in os.scandir(cache._dir) if entry.name.endswith(cache.cache_suffix)]
+            except FileNotFoundError:
+                return 0, 0
+            return len(files), sum(entry.stat().st_size for entry in files)
+        return None, None
+
+    def stats(self):
+        entries, size = self.usage()
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'enabled': self.enabled,
+                'backend': type(self.cache).__name__,
+                'entries': entries,
+                'bytes': size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else None,
+                'invalidations': self.invalidations,
+            }
+
+
+response_cache = ResponseCache.from_settings()
@@ -1,15 +1,24 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
-from .models import Business, Customer, Trade
+from .models import BookedPercentExceeded, Business, Customer, Trade, TradeMonthSummary
+from .middleware import timed_serialization
+from .tenant import get_tenant
 
 
-class UserSerializer(serializers.ModelSerializer):
+class TimedSerializerMixin:
+    """Reports to_representation as serialize time in the Server-Timing header."""
+
+    def to_representation(self, instance):
+        return timed_serialization(super().to_representation, instance)
+
+
+class UserSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ['id', 'username', 'email', 'first_name', 'last_name']
 
 
-class BusinessSerializer(serializers.ModelSerializer):
+class BusinessSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     owner = UserSerializer(read_only=True)
 
     class Meta:
@@ -59,7 +68,7 @@ class LoginSerializer(serializers.Serializer):
     password = serializers.CharField(write_only=True)
 
 
-class CustomerSerializer(serializers.ModelSerializer):
+class CustomerSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Serializer for Customer read/update operations. id is never exposed."""
     user = UserSerializer(read_only=True)
     name = serializers.CharField(write_only=True, required=False)
@@ -177,7 +186,7 @@ class CustomerCreateSerializer(serializers.Serializer):
         return customer
 
 
-class CustomerNestedSerializer(serializers.ModelSerializer):
+class CustomerNestedSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Nested serializer for customer details (MPRN, name)"""
     name = serializers.SerializerMethodField()
     email = serializers.EmailField(source='user.email', read_only=True)
@@ -192,7 +201,7 @@ class CustomerNestedSerializer(serializers.ModelSerializer):
         return full_name if full_name else obj.user.username
 
 
-class TradeSerializer(serializers.ModelSerializer):
+class TradeSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Serializer for Trade model with nested customer details"""
     customer = CustomerNestedSerializer(read_only=True)
     customer_id = serializers.PrimaryKeyRelatedField(
@@ -235,7 +244,7 @@ class TradeSerializer(serializers.ModelSerializer):
             request = self.context.get('request')
             if request and request.user.is_authenticated:
                 try:
-                    business = request.user.business
+                    business = get_tenant(request).business
                     customer = Customer.objects.get(mprn=mprn, business=business)
                     attrs['customer'] = customer
                 except Customer.DoesNotExist:
@@ -256,23 +265,33 @@ class TradeSerializer(serializers.ModelSerializer):
         percent = attrs.get('percent', 0)
 
         if customer and month and year:
-            # Get existing trades for this customer/month/year
-            queryset = Trade.objects.filter(
+            # Booked total for this customer/month/year from the trade summary
+            summary = TradeMonthSummary.objects.filter(
                 customer=customer,
                 month=month,
                 year=year
-            )
-
-            # Exclude current instance if updating
-            if self.instance:
-                queryset = queryset.exclude(pk=self.instance.pk)
+            ).first()
+
+            total_percent = 0
+            trade_count = 0
+            if summary:
+                total_percent = summary.total_percent
+                trade_count = summary.trade_count
+
+            # Exclude current instance if updating within the same month
+            instance = self.instance
+            if instance and (instance.customer_id, instance.month, instance.year) == (customer.id, month, year):
+                total_percent -= instance.percent
+                trade_count -= 1
+            if not trade_count:
+                total_percent = 0
 
-            total_percent = sum(t.percent for t in queryset)
             new_total = total_percent + percent
 
+            # Early feedback only; Trade.save re-checks under the month's row lock
             if new_total > 100:
                 raise serializers.ValidationError({
-                    'percent': f"Total booked ({new_total}%) would exceed 100%. Current total: {total_percent}%"
+                    'percent': str(BookedPercentExceeded(total_percent, new_total))
                 })
 
         return attrs
@@ -0,0 +1,96 @@
+"""
+Signal handlers keeping the user cache (user_cache.py) and the response
+cache (response_cache.py) fresh.
+
+A cached user carries their business, customer profile (with its
+business) and group membership, so a change to any of them drops the
+affected users. Cached responses depend on a customer's trades, trade
+summaries and projections per year, and on the customer/user fields
+they echo.
+
+The touch_* handlers move the updated_at of a parent row for changes the
+conditional GET validators (conditional.py) would otherwise not see as
+a newer timestamp.
+"""
+from django.contrib.auth.models import Group, User
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import Business, Customer, Trade, TradeMonthSummary
+from .response_cache import response_cache
+from .user_cache import user_cache
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user(sender, instance, **kwargs):
+    user_cache.invalidate(instance.pk)
+    response_cache.invalidate_profile(instance.pk)
+
+
+@receiver(post_save, sender=Business)
+@receiver(post_delete, sender=Business)
+def invalidate_business_users(sender, instance, **kwargs):
+    # The owner and every customer whose profile points at this business
+    user_ids = list(Customer.objects.filter(business_id=instance.pk).values_list('user_id', flat=True))
+    user_cache.invalidate(instance.owner_id, *user_ids)
+
+
+@receiver(post_save, sender=Customer)
+@receiver(post_delete, sender=Customer)
+def invalidate_customer_user(sender, instance, **kwargs):
+    user_cache.invalidate(instance.user_id)
+    response_cache.invalidate_profile(instance.user_id)
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def invalidate_group_members(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        user_cache.invalidate(instance.pk)
+    elif pk_set:
+        user_cache.invalidate(*pk_set)
+    else:
+        # group.user_set.clear() does not say which users were removed
+        user_cache.clear()
+
+
+@receiver(post_delete, sender=Group)
+def invalidate_deleted_group(sender, instance, **kwargs):
+    # Deleting a group removes its memberships without m2m_changed
+    user_cache.clear()
+
+
+# Trade.save and Trade.delete always save the month's summary, which also
+# covers the old year of a trade moved to another year. Trade's own
+# post_delete catches cascades and queryset deletes.
+@receiver(post_save, sender=TradeMonthSummary)
+@receiver(post_delete, sender=TradeMonthSummary)
+@receiver(post_delete, sender=Trade)
+@receiver(post_save, sender='projection.CostProjection')
+@receiver(post_delete, sender='projection.CostProjection')
+def invalidate_customer_year(sender, instance, **kwargs):
+    response_cache.invalidate(instance.customer_id, instance.year)
+
+
+# Deleting a projection leaves no row behind to carry a newer updated_at,
+# so the customer's moves instead; likewise the business for a deleted
+# customer. A user's name and email are echoed as customer fields.
+@receiver(post_delete, sender='projection.CostProjection')
+def touch_projection_customer(sender, instance, **kwargs):
+    Customer.objects.filter(pk=instance.customer_id).update(updated_at=timezone.now())
+
+
+@receiver(post_delete, sender=Customer)
+def touch_customer_business(sender, instance, **kwargs):
+    Business.objects.filter(pk=instance.business_id).update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=User)
+def touch_user_customer(sender, instance, created, update_fields=None, **kwargs):
+    # Logins only save last_login, which no response shows
+    if created or (update_fields is not None and set(update_fields) <= {'last_login'}):
+        return
+    Customer.objects.filter(user_id=instance.pk).update(updated_at=timezone.now())
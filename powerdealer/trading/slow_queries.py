@@ -0,0 +1,165 @@
+"""
+Slow-query log with Python call-site attribution (opt-in).
+
+When settings.SLOW_QUERY_LOG['ENABLED'] is set, every new database
+connection gets an execute wrapper (installed from the connection_created
+signal, see apps.py) that times each statement. Statements slower than
+THRESHOLD_MS are captured with their SQL, parameters, duration and the
+project frames that ran them, e.g.
+
+    CostProjection.traded_price (projection/models.py:95)
+    called from ProjectionListCreateView.get (projection/views.py:212)
+
+Captures go to the 'trading.slow_queries' logger (a rotating file, see
+LOGGING) and to an in-memory ring buffer of the last BUFFER_SIZE captures,
+which staff can browse at /admin/slow-queries/. The buffer is per process:
+with several gunicorn workers the page shows the worker that answered,
+the log file has them all.
+"""
+import logging
+import os
+import sys
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+from django.utils import timezone
+
+logger = logging.getLogger('trading.slow_queries')
+
+DEFAULTS = {
+    'ENABLED': False,
+    'THRESHOLD_MS': 100,
+    'BUFFER_SIZE': 200,
+    'MAX_PARAMS_LENGTH': 500,
+}
+
+# Frames of these modules are the instrumentation itself, not call sites
+SKIPPED_FILES = {
+    os.path.abspath(__file__),
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'middleware.py'),
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'nplusone.py'),
+}
+
+
+def project_frames(frame):
+    """(qualname, path, line) of the project frames on a stack, innermost first."""
+    root = str(settings.BASE_DIR)
+    frames = []
+    while frame is not None:
+        filename = os.path.abspath(frame.f_code.co_filename)
+        if filename.startswith(root) and 'site-packages' not in filename and filename not in SKIPPED_FILES:
+            code = frame.f_code
+            frames.append((
+                getattr(code, 'co_qualname', code.co_name),
+                os.path.relpath(filename, root),
+                frame.f_lineno,
+            ))
+        frame = frame.f_back
+    return frames
+
+
+def call_site(frames):
+    """'site called from origin': the innermost project frame and the view that led to it.
+
+    The origin is the outermost frame in a views module, or the outermost
+    project frame when no view is involved (management commands, tests).
+    """
+    if not frames:
+        return 'unknown'
+    views = [frame for frame in frames if os.path.basename(frame[1]) == 'views.py']
+    origin = views[-1] if views else frames[-1]
+    site = f'{frames[0][0]} ({frames[0][1]}:{frames[0][2]})'
+    if origin == frames[0]:
+        return site
+    return f'{site} called from {origin[0]} ({origin[1]}:{origin[2]})'
+
+
+class SlowQueryLog:
+    """Execute wrapper capturing slow statements into a ring buffer and a log.
+
+    Args:
+        threshold_ms: Statements at least this slow are captured
+        buffer_size: Captures kept in memory
+        max_params_length: Parameters are truncated to this many characters
+    """
+
+    def __init__(self, threshold_ms=100, buffer_size=200, max_params_length=500):
+        self.threshold = threshold_ms / 1000
+        self.max_params_length = max_params_length
+        self.captures = deque(maxlen=buffer_size)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls):
+        options = {**DEFAULTS, **getattr(settings, 'SLOW_QUERY_LOG', {})}
+        return cls(
+            threshold_ms=options['THRESHOLD_MS'],
+            buffer_size=options['BUFFER_SIZE'],
+            max_params_length=options['MAX_PARAMS_LENGTH'],
+        )
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            if duration >= self.threshold:
+                self.capture(sql, params, many, duration, context['connection'].alias)
+
+    def capture(self, sql, params, many, duration, alias):
+        frames = project_frames(sys._getframe(1))
+        params = repr(params)
+        if len(params) > self.max_params_length:
+            params = params[:self.max_params_length] + '...'
+        entry = {
+            'time': timezone.now(),
+            'duration_ms': round(duration * 1000, 2),
+            'sql': sql,
+            'params': params,
+            'many': many,
+            'database': alias,
+            'call_site': call_site(frames),
+            'stack': [f'{name} ({path}:{line})' for name, path, line in frames],
+            'pid': os.getpid(),
+        }
+        with self._lock:
+            self.captures.append(entry)
+        logger.warning(
+            f"Slow query {entry['duration_ms']}ms at {entry['call_site']}: {sql} params={params}",
+            extra={
+                'duration_ms': entry['duration_ms'],
+                'call_site': entry['call_site'],
+                'sql': sql,
+                'params': params,
+            },
+        )
+
+    def recent(self):
+        """Captures in the buffer, newest first."""
+        with self._lock:
+            return list(reversed(self.captures))
+
+    def clear(self):
+        with self._lock:
+            self.captures.clear()
+
+    def install(self, connection):
+        """Add the wrapper to a connection (once).
+
+        It goes first, as the outermost wrapper: connection_created can
+        fire inside a connection.execute_wrapper() block, which pops the
+        last wrapper on exit.
+        """
+        if self not in connection.execute_wrappers:
+            connection.execute_wrappers.insert(0, self)
+
+
+slow_query_log = SlowQueryLog.from_settings()
+
+
+def install_slow_query_log(sender, connection, **kwargs):
+    """connection_created receiver; connected in apps.py when enabled."""
+    slow_query_log.install(connection)
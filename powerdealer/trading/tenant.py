@@ -0,0 +1,127 @@
+"""
+Request-scoped tenant context.
+
+get_tenant(request) resolves who is calling, and for which business or
+customer, once per request. Views and serializers read it instead of
+walking request.user.business / request.user.customer themselves.
+
+With TenantJWTAuthentication the role comes from the token and the user
+already arrives with that role's tenant joined in, so this costs no
+queries. The tenant is the one the token names: an administrator's
+business or a customer's profile whose id no longer matches the claims
+is not used. Otherwise (session login, force_authenticate in tests,
+tokens without claims) the user is reloaded once with everything joined
+and the group memberships annotated.
+"""
+from rest_framework import status
+from rest_framework.response import Response
+
+from .authentication import ROLE_ADMINISTRATOR, ROLE_CUSTOMER, tenant_relations, tenant_user_queryset
+from .models import Business, Customer
+
+
+class TenantContext:
+    """The authenticated user with their role and tenant.
+
+    Attributes:
+        user: The user (AnonymousUser when not logged in)
+        role: ROLE_ADMINISTRATOR, ROLE_CUSTOMER or None
+        business: The business the user owns, or None; business-scoped
+                  endpoints use this, as request.user.business did
+        customer: The user's customer profile (with its business), or None
+    """
+
+    def __init__(self, user, role=None, business=None, customer=None):
+        self.user = user
+        self.role = role
+        self.business = business
+        self.customer = customer
+
+    @property
+    def is_authenticated(self):
+        return self.user.is_authenticated
+
+
+def _related(user, accessor, model):
+    try:
+        return getattr(user, accessor)
+    except model.DoesNotExist:
+        return None
+
+
+def _role_from_annotations(user):
+    if user.is_administrator:
+        return ROLE_ADMINISTRATOR
+    if user.is_customer:
+        return ROLE_CUSTOMER
+    return None
+
+
+def resolve_tenant(request):
+    """Build the TenantContext for a request (see get_tenant)."""
+    user = request.user
+    if not user.is_authenticated:
+        return TenantContext(user)
+
+    claims = getattr(request, 'tenant_claims', None)
+    if claims is None:
+        return _resolve_without_claims(user)
+
+    role = claims['role']
+    relations = tenant_relations(role)
+    if not all(getattr(type(user), name).is_cached(user) for name in relations):
+        user = tenant_user_queryset(role=role).get(pk=user.pk)
+    business = _related(user, 'business', Business) if 'business' in relations else None
+    customer = _related(user, 'customer', Customer) if 'customer' in relations else None
+    if role == ROLE_ADMINISTRATOR and business is not None and business.id != claims['business_id']:
+        business = None
+    if role == ROLE_CUSTOMER and customer is not None and customer.id != claims['customer_id']:
+        customer = None
+    return TenantContext(user, role=role, business=business, customer=customer)
+
+
+def _resolve_without_claims(user):
+    loaded = type(user).business.is_cached(user) and type(user).customer.is_cached(user)
+    if not loaded or not hasattr(user, 'is_administrator'):
+        user = tenant_user_queryset(with_roles=True).get(pk=user.pk)
+    return TenantContext(
+        user,
+        role=_role_from_annotations(user),
+        business=_related(user, 'business', Business),
+        customer=_related(user, 'customer', Customer),
+    )
+
+
+def get_tenant(request):
+    """The request's TenantContext, resolved on first use and kept on the request.
+
+    It is stored on the underlying HttpRequest, so middleware sees it too.
+    """
+    http_request = getattr(request, '_request', request)
+    tenant = getattr(http_request, 'tenant', None)
+    if tenant is None:
+        tenant = resolve_tenant(request)
+        http_request.tenant = tenant
+    return tenant
+
+
+def get_business(request):
+    """Business owned by the authenticated user.
+
+    Returns:
+        tuple: (business, error_response)
+    """
+    tenant = get_tenant(request)
+    if not tenant.is_authenticated:
+        return None, Response({
+            'success': False,
+            'message': 'Login required.',
+            'errors': {}
+        }, status=status.HTTP_401_UNAUTHORIZED)
+    if tenant.business is None:
+        return None, Response({
+            'success': False,
+            'message': 'Business not found.',
+            'errors': {}
+        }, status=status.HTTP_404_NOT_FOUND)
+    return tenant.business, None
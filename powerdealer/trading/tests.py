@@ -1,3 +1,1637 @@
-from django.test import TestCase
+import base64
+import calendar
+import csv
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+from datetime import date, timedelta
+from unittest import mock
+from decimal import Decimal
 
-# Create your tests here.
+import numpy as np
+from django.contrib.auth.models import Group, User, update_last_login
+from django.core.cache import caches
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.db.models import F
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from rest_framework_simplejwt import serializers as jwt_serializers
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from projection import grid
+from projection.models import CostProjection, calculate_monthly_cost
+from projection.simulation import cost_at_risk, load_forward_prices
+from projection.views import CustomerDashboardMixin
+
+from . import imports
+from .authentication import ROLE_ADMINISTRATOR, ROLE_CUSTOMER, TenantRefreshToken
+from .fast_serializers import CUSTOMER_COLUMNS, TRADE_COLUMNS, RowBuilder
+from .metrics import MetricsStore, labels_key
+from .middleware import NPlusOneMiddleware, RequestTimings, current_timings
+from .models import BookedPercentExceeded, Business, Customer, Trade, TradeMonthSummary
+from .nplusone import RepeatedQueries, detect_repeated_queries, fingerprint
+from .serializers import CustomerSerializer, TradeSerializer
+from .slow_queries import SlowQueryLog, slow_query_log
+from .response_cache import response_cache
+from .user_cache import UserCache, user_cache
+from .views import TradeListCreateView, trade_keyset_after
+
+
+def create_customer(username='customer', mprn='1234567890'):
+    owner = User.objects.create_user(f'{username}-owner', password='pw123456')
+    business = Business.objects.create(owner=owner, name=f'{username} energy', email=f'{username}@example.com')
+    user = User.objects.create_user(username, password='pw123456')
+    return Customer.objects.create(user=user, business=business, mprn=mprn)
+
+
+def book_trade(customer, month=1, year=2025, percent='1.00', p_therm='100.0000'):
+    return Trade.objects.create(
+        customer=customer,
+        year=year,
+        month=month,
+        p_therm=Decimal(p_therm),
+        percent=Decimal(percent),
+        trade_date=date(year, 1, 1),
+    )
+
+
+class TradeNumberingTests(TestCase):
+    def setUp(self):
+        self.customer = create_customer()
+
+    def test_numbers_follow_summary_counter(self):
+        trades = [book_trade(self.customer) for _ in range(3)]
+        self.assertEqual([trade.trade_no for trade in trades], [1, 2, 3])
+        self.assertEqual(book_trade(self.customer, month=2).trade_no, 1)
+
+        summary = TradeMonthSummary.objects.get(customer=self.customer, year=2025, month=1)
+        self.assertEqual(summary.max_trade_no, 3)
+        self.assertEqual(summary.trade_count, 3)
+
+    def test_numbering_continues_after_delete(self):
+        first, second, third = [book_trade(self.customer) for _ in range(3)]
+        second.delete()
+        self.assertEqual(book_trade(self.customer).trade_no, 4)
+        # Removing the highest number rewinds the counter, as MAX(trade_no) + 1 did
+        Trade.objects.get(customer=self.customer, trade_no=4).delete()
+        self.assertEqual(book_trade(self.customer).trade_no, 4)
+
+    def test_moving_trade_updates_both_summaries(self):
+        trade = book_trade(self.customer, percent='10.00')
+        trade.month = 2
+        trade.save()
+
+        january = TradeMonthSummary.objects.get(customer=self.customer, year=2025, month=1)
+        february = TradeMonthSummary.objects.get(customer=self.customer, year=2025, month=2)
+        self.assertEqual((january.trade_count, january.total_percent), (0, Decimal('0')))
+        self.assertEqual((february.trade_count, february.total_percent), (1, Decimal('10.00')))
+
+
+class BookedPercentCapTests(TestCase):
+    def setUp(self):
+        self.customer = create_customer()
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer.business.owner)
+
+    def test_save_enforces_cap(self):
+        book_trade(self.customer, percent='60.00')
+        with self.assertRaises(BookedPercentExceeded):
+            book_trade(self.customer, percent='40.01')
+        book_trade(self.customer, percent='40.00')
+
+        summary = TradeMonthSummary.objects.get(customer=self.customer, year=2025, month=1)
+        self.assertEqual((summary.trade_count, summary.total_percent), (2, Decimal('100.00')))
+
+    def test_update_excludes_own_percent(self):
+        trade = book_trade(self.customer, percent='90.00')
+        trade.percent = Decimal('100.00')
+        trade.save()
+        trade.percent = Decimal('100.01')
+        with self.assertRaises(BookedPercentExceeded):
+            trade.save()
+
+    def test_api_error_unchanged(self):
+        book_trade(self.customer, percent='95.00')
+        response = self.client.post('/api/trades/', {
+            'mprn': self.customer.mprn,
+            'month': 1,
+            'year': 2025,
+            'p_therm': '100.0000',
+            'percent': '10.00',
+            'trade_date': '2025-01-01',
+        }, format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['errors']['percent'], [
+            'Total booked (105.00%) would exceed 100%. Current total: 95.00%'
+        ])
+
+    def book_concurrently(self, percent):
+        """Patch TradeMonthSummary.lock so another booking of percent lands just before the lock.
+
+        This is what a concurrent transaction committing between the
+        unlocked pre-check and the lock looks like, without threads.
+        """
+        lock = TradeMonthSummary.lock.__func__
+
+        def lock_after_other_booking(cls, customer_id, year, month):
+            TradeMonthSummary.objects.filter(customer_id=customer_id, year=year, month=month).update(
+                trade_count=F('trade_count') + 1, total_percent=F('total_percent') + Decimal(percent),
+            )
+            return lock(cls, customer_id, year, month)
+
+        return mock.patch.object(TradeMonthSummary, 'lock', classmethod(lock_after_other_booking))
+
+    def test_locked_recheck_in_api(self):
+        book_trade(self.customer, percent='30.00')
+        with self.book_concurrently('50.00'):
+            response = self.client.post('/api/trades/', {
+                'mprn': self.customer.mprn,
+                'month': 1,
+                'year': 2025,
+                'p_therm': '100.0000',
+                'percent': '30.00',
+                'trade_date': '2025-01-01',
+            }, format='json')
+
+        # The serializer saw 30% booked; the locked re-check sees 80%
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['errors']['percent'], [
+            'Total booked (110.00%) would exceed 100%. Current total: 80.00%'
+        ])
+        self.assertEqual(Trade.objects.count(), 1)
+
+    def test_locked_recheck_in_import(self):
+        book_trade(self.customer, percent='30.00')
+        rows = [{
+            'mprn': self.customer.mprn, 'month': 1, 'year': 2025,
+            'p_therm': '100', 'percent': '30.00', 'trade_date': '2025-01-01',
+        }]
+        other_booking = TradeMonthSummary.objects.filter(customer=self.customer, year=2025, month=1)
+        load_summaries = imports._load_summaries
+
+        def load_after_other_booking(groups, lock=False):
+            if lock:
+                other_booking.update(total_percent=F('total_percent') + Decimal('50.00'))
+            return load_summaries(groups, lock=lock)
+
+        with mock.patch.object(imports, '_load_summaries', load_after_other_booking):
+            with self.assertRaises(imports.TradeImportError) as raised:
+                imports.import_trades(self.customer.business, rows)
+        self.assertEqual(raised.exception.row_errors, {
+            1: {'percent': 'Total booked (110.00%) would exceed 100%. Current total: 80.00%'},
+        })
+        self.assertEqual(Trade.objects.count(), 1)
+
+    def test_import_loads_exact_summaries(self):
+        other = Customer.objects.create(
+            user=User.objects.create_user('other'), business=self.customer.business, mprn='0987654321',
+        )
+        for customer in (self.customer, other):
+            for month in (1, 2):
+                book_trade(customer, month=month, percent='10.00')
+        keys = {(self.customer.id, 2025, 1): [], (other.id, 2025, 2): []}
+
+        with mock.patch.object(imports, 'SUMMARY_CHUNK_SIZE', 1), self.assertNumQueries(2):
+            summaries = imports._load_summaries(keys, lock=True)
+        self.assertEqual(set(summaries), set(keys))
+
+    def test_unreadable_csv_rejected(self):
+        upload = SimpleUploadedFile(
+            'trades.csv', b'mprn,month\n"' + b'x' * (csv.field_size_limit() + 1) + b'",1\n', content_type='text/csv',
+        )
+        response = self.client.post('/api/trades/import/', {'file': upload}, format='multipart')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['message'], 'Could not read the CSV file. It must be UTF-8 with a header row.')
+
+    def test_admin_reports_cap_as_form_error(self):
+        book_trade(self.customer, percent='60.00')
+        trade = book_trade(self.customer, percent='30.00')
+        admin_user = User.objects.create_superuser('admin', 'admin@example.com', 'pw123456')
+        self.client.force_login(admin_user)
+        url = f'/admin/trading/trade/{trade.pk}/change/'
+        form = {
+            'customer': self.customer.pk, 'trade_no': trade.trade_no, 'month': 1, 'year': 2025,
+            'p_therm': '100.0000', 'trade_date': '2025-01-01',
+        }
+
+        response = self.client.post(url, {**form, 'percent': '40.01'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['adminform'].form.errors['percent'], [
+            'Total booked (100.01%) would exceed 100%. Current total: 60.00%'
+        ])
+
+        response = self.client.post(url, {**form, 'percent': '40.00'})
+        self.assertEqual(response.status_code, 302)
+        trade.refresh_from_db()
+        self.assertEqual(trade.percent, Decimal('40.00'))
+
+
+    def test_admin_bulk_delete_updates_summaries(self):
+        first = book_trade(self.customer, percent='60.00')
+        second = book_trade(self.customer, percent='30.00')
+        kept = book_trade(self.customer, percent='5.00')
+        admin_user = User.objects.create_superuser('admin', 'admin@example.com', 'pw123456')
+        self.client.force_login(admin_user)
+
+        response = self.client.post('/admin/trading/trade/', {
+            'action': 'delete_selected', '_selected_action': [first.pk, second.pk], 'post': 'yes',
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(list(Trade.objects.values_list('pk', flat=True)), [kept.pk])
+
+        summary = TradeMonthSummary.objects.get(customer=self.customer, year=2025, month=1)
+        self.assertEqual((summary.trade_count, summary.total_percent), (1, Decimal('5.00')))
+        book_trade(self.customer, percent='50.00')
+
+class TradeListPaginationTests(TestCase):
+    def setUp(self):
+        self.customer = create_customer()
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer.business.owner)
+        self.trades = [
+            book_trade(self.customer, month=month, year=year)
+            for year, month in ((2024, 12), (2025, 1), (2025, 1), (2025, 2), (2026, 1))
+        ]
+
+    def get(self, **params):
+        return self.client.get('/api/trades/', params)
+
+    def test_pages_follow_the_keyset(self):
+        ids, cursor = [], None
+        while True:
+            response = self.get(page_size=2, fields='id', **({'cursor': cursor} if cursor else {}))
+            self.assertEqual(response.status_code, 200)
+            ids.extend(row['id'] for row in response.data['data'])
+            pagination = response.data['pagination']
+            if not pagination['has_more']:
+                self.assertIsNone(pagination['next_cursor'])
+                break
+            cursor = pagination['next_cursor']
+        self.assertEqual(ids, [trade.id for trade in self.trades])
+
+    def test_cursor_keeps_filters(self):
+        first = self.get(page_size=1, year=2025)
+        second = self.get(page_size=1, year=2025, cursor=first.data['pagination']['next_cursor'])
+        self.assertEqual(
+            [first.data['data'][0]['id'], second.data['data'][0]['id']],
+            [self.trades[1].id, self.trades[2].id],
+        )
+
+    def test_page_size_is_capped(self):
+        response = self.get(page_size=100000)
+        self.assertEqual(response.data['pagination']['page_size'], TradeListCreateView.MAX_PAGE_SIZE)
+        self.assertEqual(len(response.data['data']), 5)
+        response = self.get(page_size=0)
+        self.assertEqual(response.data['pagination']['page_size'], 1)
+        self.assertEqual(len(response.data['data']), 1)
+
+    def test_tampered_cursor_rejected(self):
+        for cursor in ('not base64!', encode_raw('2025:1:1'), encode_raw('2025:1:x:1'), encode_raw('\xff')):
+            with self.subTest(cursor=cursor):
+                response = self.get(cursor=cursor)
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.data['message'], 'page_size and cursor must be valid.')
+
+    def test_keyset_predicate_has_a_leading_bound(self):
+        sql = str(Trade.objects.filter(trade_keyset_after(2025, 1, 1, 1)).query)
+        self.assertRegex(sql, r'WHERE \("trading_trade"."year" >= 2025 AND')
+
+
+def encode_raw(text):
+    return base64.urlsafe_b64encode(text.encode('latin-1')).decode()
+
+
+class FastSerializerTests(TestCase):
+    def setUp(self):
+        self.customer = create_customer()
+        self.customer.user.first_name = 'Ada'
+        self.customer.user.save()
+        other = Customer.objects.create(
+            user=User.objects.create_user('other', email='other@example.com'),
+            business=self.customer.business,
+            mprn='0987654321',
+            mobile='0123456789',
+            address='1 High Street',
+        )
+        for customer in (self.customer, other):
+            for month, percent, p_therm in ((1, '12.5', '99.1'), (2, '0.01', '0'), (12, '100', '123456.7891')):
+                book_trade(customer, month=month, percent=percent, p_therm=p_therm)
+
+    def assertSameJSON(self, fast, slow):
+        renderer = JSONRenderer()
+        self.assertEqual(renderer.render(fast), renderer.render(slow))
+
+    def test_trade_rows_match_serializer(self):
+        trades = Trade.objects.order_by('year', 'month', 'trade_no', 'id')
+        self.assertSameJSON(
+            RowBuilder(TRADE_COLUMNS).rows(trades),
+            TradeSerializer(trades, many=True).data,
+        )
+
+    def test_trade_field_selection_matches_serializer(self):
+        trades = Trade.objects.order_by('id')
+        fields = ['percent', 'id', 'month_name', 'created_at']
+        self.assertSameJSON(
+            RowBuilder(TRADE_COLUMNS, fields=fields).rows(trades),
+            [{key: row[key] for key in row if key in fields} for row in TradeSerializer(trades, many=True).data],
+        )
+
+    def test_customer_rows_match_serializer(self):
+        customers = Customer.objects.filter(business=self.customer.business)
+        self.assertSameJSON(
+            RowBuilder(CUSTOMER_COLUMNS).rows(customers),
+            CustomerSerializer(customers, many=True).data,
+        )
+
+
+class CustomerTradingPivotTests(TestCase):
+    def setUp(self):
+        self.customer = create_customer()
+        self.customer.user.groups.add(Group.objects.get(name='Customer'))
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer.user)
+
+    def test_pivot_structure(self):
+        book_trade(self.customer, month=1, percent='10.00', p_therm='100.0000')
+        book_trade(self.customer, month=1, percent='30.00', p_therm='200.0000')
+        book_trade(self.customer, month=3, percent='5.00', p_therm='50.0000')
+
+        pivot = CustomerDashboardMixin()._get_trading_pivot_data(self.customer, 2025)
+
+        self.assertEqual(pivot['trade_numbers'], [1, 2])
+        self.assertEqual(len(pivot['months']), 12)
+        january, february, march = pivot['months'][:3]
+        self.assertEqual([trade['trade_no'] for trade in january['trades']], [1, 2])
+        self.assertEqual(january['month_name'], 'January')
+        self.assertEqual(january['total_percent'], Decimal('40.00'))
+        self.assertEqual(january['avg_price'], Decimal('175.0000'))
+        self.assertEqual((february['trades'], february['total_percent'], february['avg_price']), ([], 0, 0))
+        self.assertEqual(march['trades'][0]['p_therm'], '50.0000')
+
+    def test_pivot_query_count_is_constant(self):
+        book_trade(self.customer)
+        with self.assertNumQueries(2):
+            CustomerDashboardMixin()._get_trading_pivot_data(self.customer, 2025)
+
+        for month in range(1, 13):
+            for _ in range(5):
+                book_trade(self.customer, month=month)
+        with self.assertNumQueries(2):
+            CustomerDashboardMixin()._get_trading_pivot_data(self.customer, 2025)
+
+    def test_trading_data_endpoint_query_count(self):
+        caches['responses'].clear()
+        for month in range(1, 13):
+            for _ in range(3):
+                book_trade(self.customer, month=month)
+
+        # user with tenant (cached after the first request), ETag validator,
+        # available years, trades, summaries
+        user_cache.clear()
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {TenantRefreshToken.for_user(self.customer.user).access_token}')
+        with self.assertNumQueries(5):
+            response = client.get('/api/customer-trading-data/', {'year': 2025})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['data']['pivot_data']['trade_numbers'], [1, 2, 3])
+        # validator and available years only; the pivot comes from the response cache
+        with self.assertNumQueries(2):
+            client.get('/api/customer-trading-data/', {'year': 2025})
+
+
+class TenantClaimsTests(TestCase):
+    def setUp(self):
+        self.customer = create_customer()
+        self.customer.user.groups.add(Group.objects.get(name='Customer'))
+        self.client = APIClient()
+
+    def login(self, username, password='pw123456'):
+        response = self.client.post('/api/auth/login/', {'username': username, 'password': password})
+        self.assertEqual(response.status_code, 200)
+        return response.data['data']['tokens']
+
+    def test_login_tokens_carry_claims(self):
+        tokens = self.login('customer')
+        access = AccessToken(tokens['access'])
+        self.assertEqual(access['role'], ROLE_CUSTOMER)
+        self.assertEqual(access['customer_id'], self.customer.id)
+        self.assertEqual(access['business_id'], self.customer.business_id)
+
+        owner = self.customer.business.owner
+        owner.groups.add(Group.objects.get(name='Administrator'))
+        access = AccessToken(self.login(owner.username)['access'])
+        self.assertEqual(access['role'], ROLE_ADMINISTRATOR)
+        self.assertEqual(access['business_id'], self.customer.business_id)
+        self.assertIsNone(access['customer_id'])
+
+    def test_refresh_rereads_claims(self):
+        tokens = self.login('customer')
+        self.customer.user.groups.clear()
+
+        response = self.client.post('/api/token/refresh/', {'refresh': tokens['refresh']})
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(AccessToken(response.data['access'])['role'])
+
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['access']}")
+        response = self.client.get('/api/auth/me/')
+        self.assertIsNone(response.data['data']['user_type'])
+
+    def test_refresh_rejects_inactive_user(self):
+        tokens = self.login('customer')
+        User.objects.filter(id=self.customer.user_id).update(is_active=False)
+
+        response = self.client.post('/api/token/refresh/', {'refresh': tokens['refresh']})
+        self.assertEqual(response.status_code, 401)
+
+        User.objects.filter(id=self.customer.user_id).delete()
+        response = self.client.post('/api/token/refresh/', {'refresh': tokens['refresh']})
+        self.assertEqual(response.status_code, 401)
+
+    def test_refresh_keeps_rotation(self):
+        tokens = self.login('customer')
+        # simplejwt binds its settings at import, so override_settings does not reach them
+        with mock.patch.object(jwt_serializers.api_settings, 'ROTATE_REFRESH_TOKENS', True):
+            response = self.client.post('/api/token/refresh/', {'refresh': tokens['refresh']})
+        self.assertEqual(response.status_code, 200)
+        refresh = RefreshToken(response.data['refresh'])
+        self.assertNotEqual(refresh['jti'], RefreshToken(tokens['refresh'])['jti'])
+        self.assertEqual(refresh['customer_id'], self.customer.id)
+        self.assertEqual(AccessToken(response.data['access'])['role'], ROLE_CUSTOMER)
+
+    def test_authentication_uses_the_claims(self):
+        owner = self.customer.business.owner
+        owner.groups.add(Group.objects.get(name='Administrator'))
+        with_claims = str(TenantRefreshToken.for_user(owner).access_token)
+        without_claims = str(RefreshToken.for_user(owner).access_token)
+
+        for token, queries_groups in ((with_claims, False), (without_claims, True)):
+            user_cache.clear()
+            self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(self.client.get('/api/business/').status_code, 200)
+            self.assertEqual(any('auth_user_groups' in query['sql'] for query in queries), queries_groups)
+
+    def test_tenant_must_match_the_claims(self):
+        owner = self.customer.business.owner
+        owner.groups.add(Group.objects.get(name='Administrator'))
+        token = str(TenantRefreshToken.for_user(owner).access_token)
+        self.customer.business.delete()
+        Business.objects.create(owner=owner, name='New Energy', email='new@example.com')
+
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        self.assertEqual(self.client.get('/api/business/').status_code, 404)
+
+
+class TenantContextTests(TestCase):
+    def setUp(self):
+        self.customer = create_customer()
+        self.customer.user.groups.add(Group.objects.get(name='Customer'))
+        self.owner = self.customer.business.owner
+        self.owner.groups.add(Group.objects.get(name='Administrator'))
+        self.trade = book_trade(self.customer)
+        user_cache.clear()
+
+    def auth_queries(self, client, user, url, params=None):
+        """Queries that read the requesting user or their groups."""
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url, params or {})
+        self.assertEqual(response.status_code, 200, url)
+        return [
+            query['sql'] for query in queries.captured_queries
+            if f'"auth_user"."id" = {user.id}' in query['sql'] or '"auth_group"' in query['sql']
+        ]
+
+    def client_for(self, token):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        return client
+
+    def test_endpoints_touch_auth_tables_at_most_once(self):
+        mprn = self.customer.mprn
+        owner_urls = [
+            ('/api/auth/me/', None),
+            ('/api/business/', None),
+            ('/api/customers/', None),
+            (f'/api/customers/{mprn}/', None),
+            ('/api/trades/', None),
+            (f'/api/trades/{self.trade.id}/', None),
+            ('/api/trading/pivot/', {'mprn': mprn, 'year': 2025}),
+            ('/api/projection/', {'mprn': mprn, 'year': 2025}),
+        ]
+        customer_urls = [
+            ('/api/auth/me/', None),
+            ('/api/customer-dashboard/', None),
+            ('/api/customer-trading-data/', {'year': 2025}),
+        ]
+        for user, urls in ((self.owner, owner_urls), (self.customer.user, customer_urls)):
+            for token in (TenantRefreshToken.for_user(user).access_token, RefreshToken.for_user(user).access_token):
+                client = self.client_for(token)
+                for url, params in urls:
+                    self.assertLessEqual(len(self.auth_queries(client, user, url, params)), 1, url)
+
+    def test_forced_authentication_resolves_tenant_once(self):
+        client = APIClient()
+        client.force_authenticate(self.customer.user)
+        queries = self.auth_queries(client, self.customer.user, '/api/customer-trading-data/', {'year': 2025})
+        self.assertEqual(len(queries), 1)
+
+    def test_trade_create_by_mprn_uses_tenant_business(self):
+        client = self.client_for(TenantRefreshToken.for_user(self.owner).access_token)
+        response = client.post('/api/trades/', {
+            'mprn': self.customer.mprn, 'month': 2, 'year': 2025,
+            'p_therm': '90.0000', 'percent': '10.00', 'trade_date': '2025-01-01',
+        })
+        self.assertEqual(response.status_code, 201)
+
+        other_business = Business.objects.create(
+            owner=User.objects.create_user('other-owner'), name='Other Energy', email='other@example.com',
+        )
+        other = Customer.objects.create(
+            user=User.objects.create_user('other'), business=other_business, mprn='9999999999',
+        )
+        response = client.post('/api/trades/', {
+            'mprn': other.mprn, 'month': 2, 'year': 2025,
+            'p_therm': '90.0000', 'percent': '10.00', 'trade_date': '2025-01-01',
+        })
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('mprn', response.data['errors'])
+
+    def test_customer_cannot_use_business_endpoints(self):
+        client = self.client_for(TenantRefreshToken.for_user(self.customer.user).access_token)
+        self.assertEqual(client.get('/api/trades/').status_code, 404)
+
+
+class UserCacheTests(TestCase):
+    def setUp(self):
+        self.customer = create_customer()
+        self.customer.user.groups.add(Group.objects.get(name='Customer'))
+        user_cache.clear()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.customer.user).access_token}')
+
+    def me(self):
+        response = self.client.get('/api/auth/me/')
+        self.assertEqual(response.status_code, 200)
+        return response.data['data']
+
+    def test_second_request_is_served_from_cache(self):
+        before = user_cache.stats()
+        self.me()
+        with self.assertNumQueries(1):
+            # Only the business owner for the nested BusinessSerializer
+            self.assertEqual(self.me()['customer']['mprn'], self.customer.mprn)
+        after = user_cache.stats()
+        self.assertEqual(after['misses'] - before['misses'], 1)
+        self.assertEqual(after['hits'] - before['hits'], 1)
+
+    def test_group_change_invalidates(self):
+        self.assertEqual(self.me()['user_type'], 'customer')
+        self.customer.user.groups.clear()
+        self.assertIsNone(self.me()['user_type'])
+
+        self.customer.user.groups.add(Group.objects.get(name='Customer'))
+        self.assertEqual(self.me()['user_type'], 'customer')
+
+        Group.objects.get(name='Customer').user_set.remove(self.customer.user)
+        self.assertIsNone(self.me()['user_type'])
+
+    def test_profile_changes_invalidate(self):
+        self.me()
+        self.customer.mobile = '0871234567'
+        self.customer.save()
+        self.assertEqual(self.me()['customer']['mobile'], '0871234567')
+
+        business = self.customer.business
+        business.name = 'Renamed Energy'
+        business.save()
+        self.assertEqual(self.me()['business']['name'], 'Renamed Energy')
+
+        User.objects.get(id=self.customer.user_id).delete()
+        self.assertEqual(self.client.get('/api/auth/me/').status_code, 401)
+
+    def test_cached_users_are_copies(self):
+        self.me()
+        first = user_cache.get(self.customer.user_id, lambda: None)
+        first.username = 'changed'
+        self.assertEqual(user_cache.get(self.customer.user_id, lambda: None).username, 'customer')
+
+    def test_lru_eviction_and_ttl(self):
+        cache = UserCache(max_entries=2, ttl=60)
+        for user_id in (1, 2, 3):
+            cache.get(user_id, lambda: user_id)
+        self.assertEqual(cache.get(1, lambda: 'reloaded'), 'reloaded')
+        self.assertEqual(cache.stats()['evictions'], 2)
+
+        disabled = UserCache(ttl=0)
+        self.assertEqual(disabled.get(1, lambda: 'loaded'), 'loaded')
+        self.assertEqual(disabled.stats()['misses'], 0)
+
+    def test_shared_cache_between_processes(self):
+        first, second = UserCache(cache_alias='default'), UserCache(cache_alias='default')
+        first.get(42, lambda: 'loaded')
+        self.assertEqual(second.get(42, lambda: 'reloaded'), 'loaded')
+
+        first.invalidate(42)
+        second.clear()
+        self.assertEqual(second.get(42, lambda: 'reloaded'), 'reloaded')
+
+    def test_stats_in_metrics(self):
+        self.client.get('/api/auth/me/')
+        body = self.client.get('/metrics').content.decode()
+        self.assertIn('powerdealer_cache_invalidations_total{cache="user"}', body)
+        self.assertIn('powerdealer_cache_evictions_total{cache="user"}', body)
+        self.assertIn('powerdealer_user_cache_entries ', body)
+
+
+class ResponseCacheTests(TestCase):
+    def setUp(self):
+        caches['responses'].clear()
+        self.customer = create_customer()
+        self.business = self.customer.business
+        self.client = APIClient()
+        self.client.force_authenticate(self.business.owner)
+
+    def pivot(self, year=2025):
+        response = self.client.get('/api/trading/pivot/', {'mprn': self.customer.mprn, 'year': year})
+        self.assertEqual(response.status_code, 200)
+        return response.data['data']
+
+    def booked(self, year=2025, month=1):
+        return self.pivot(year)['months'][month - 1]['total_percent']
+
+    def test_pivot_is_cached_until_its_year_changes(self):
+        book_trade(self.customer, year=2024)
+        book_trade(self.customer, year=2025, percent='10.00')
+        self.assertEqual(self.booked(2024), Decimal('1.00'))
+        self.assertEqual(self.booked(2025), Decimal('10.00'))
+
+        before = response_cache.stats()
+        # tenant, customer and ETag validator only; the pivot itself is not rebuilt
+        with self.assertNumQueries(3):
+            self.pivot(2024)
+        self.assertEqual(response_cache.stats()['hits'] - before['hits'], 1)
+
+        # A 2025 booking leaves the 2024 entry alone
+        book_trade(self.customer, year=2025, percent='5.00')
+        self.assertEqual(self.booked(2025), Decimal('15.00'))
+        with self.assertNumQueries(3):
+            self.pivot(2024)
+
+    def test_moving_and_deleting_trades_invalidate(self):
+        trade = book_trade(self.customer, year=2024)
+        self.assertEqual(self.booked(2024), Decimal('1.00'))
+
+        trade.year = 2025
+        trade.save()
+        self.assertEqual(self.booked(2024), 0)
+        self.assertEqual(self.booked(2025), Decimal('1.00'))
+
+        trade.delete()
+        self.assertEqual(self.booked(2025), 0)
+
+    def test_profile_change_invalidates(self):
+        self.pivot()
+        user = self.customer.user
+        user.first_name, user.last_name = 'Ada', 'Byrne'
+        user.save()
+        self.assertEqual(self.pivot()['customer_name'], 'Ada Byrne')
+
+    def test_bulk_paths_invalidate(self):
+        self.assertEqual(self.booked(), 0)
+        response = self.client.post('/api/trades/import/', {'trades': [{
+            'mprn': self.customer.mprn, 'month': 1, 'year': 2025,
+            'p_therm': '100.0000', 'percent': '20.00', 'trade_date': '2025-01-01',
+        }]}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.booked(), Decimal('20.00'))
+
+        def projection(year):
+            response = self.client.get('/api/projection/', {'mprn': self.customer.mprn, 'year': year})
+            return response.data['data']['rows'][0]
+
+        self.assertEqual(projection(2025)['consumption'], 0)
+        self.client.post('/api/projection/', {
+            'mprn': self.customer.mprn, 'year': 2024,
+            'projections': [{'month': month, 'consumption': '1000'} for month in range(1, 13)],
+        }, format='json')
+        # 2025 consumption is prefilled from 2024
+        self.assertEqual(projection(2025)['consumption'], Decimal('1000'))
+
+    def test_entries_are_scoped_to_the_customer(self):
+        other_business = Business.objects.create(
+            owner=User.objects.create_user('other-owner'), name='Other Energy', email='other@example.com',
+        )
+        other = Customer.objects.create(
+            user=User.objects.create_user('other'), business=other_business, mprn=self.customer.mprn,
+        )
+        book_trade(self.customer, percent='10.00')
+        book_trade(other, percent='30.00')
+        self.assertEqual(self.booked(), Decimal('10.00'))
+
+        self.client.force_authenticate(other_business.owner)
+        self.assertEqual(self.booked(), Decimal('30.00'))
+
+    def test_stats_in_metrics_not_health_check(self):
+        self.pivot()
+        health = self.client.get('/api/health/').data
+        self.assertEqual(set(health), {'status', 'database'})
+        body = self.client.get('/metrics').content.decode()
+        size = next(line for line in body.splitlines() if line.startswith('powerdealer_response_cache_bytes '))
+        self.assertGreater(float(size.split()[1]), 0)
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        self.customer = create_customer()
+        self.customer.user.groups.add(Group.objects.get(name='Customer'))
+        self.trade = book_trade(self.customer, percent='10.00')
+        self.owner_client = APIClient()
+        self.owner_client.force_authenticate(self.customer.business.owner)
+        self.customer_client = APIClient()
+        self.customer_client.force_authenticate(self.customer.user)
+
+    def assertRevalidates(self, client, url, params=None):
+        """The response carries validators that a repeat request turns into a 304."""
+        response = client.get(url, params or {})
+        self.assertEqual(response.status_code, 200, url)
+        etag = response['ETag']
+        self.assertTrue(response.has_header('Last-Modified'), url)
+
+        not_modified = client.get(url, params or {}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(not_modified.status_code, 304, url)
+        self.assertEqual(not_modified['ETag'], etag)
+        self.assertEqual(not_modified.content, b'')
+        return etag
+
+    def test_endpoints_answer_304(self):
+        mprn = self.customer.mprn
+        for url, params in [
+            ('/api/trading/pivot/', {'mprn': mprn, 'year': 2025}),
+            ('/api/projection/', {'mprn': mprn, 'year': 2025}),
+            ('/api/trades/', None),
+            ('/api/customers/', None),
+        ]:
+            self.assertRevalidates(self.owner_client, url, params)
+        for url, params in [
+            ('/api/customer-dashboard/', None),
+            ('/api/customer-dashboard-data/', None),
+            ('/api/customer-trading-data/', {'year': 2025}),
+            ('/api/customer-projection-data/', None),
+        ]:
+            self.assertRevalidates(self.customer_client, url, params)
+
+    def test_304_skips_the_computation(self):
+        url, params = '/api/trading/pivot/', {'mprn': self.customer.mprn, 'year': 2025}
+        etag = self.assertRevalidates(self.owner_client, url, params)
+        # tenant, customer, validator
+        with self.assertNumQueries(3):
+            self.owner_client.get(url, params, HTTP_IF_NONE_MATCH=etag)
+
+    def test_changes_and_deletes_change_the_etag(self):
+        url, params = '/api/trading/pivot/', {'mprn': self.customer.mprn, 'year': 2025}
+        etag = self.assertRevalidates(self.owner_client, url, params)
+
+        other = book_trade(self.customer, month=2)
+        changed = self.assertRevalidates(self.owner_client, url, params)
+        self.assertNotEqual(changed, etag)
+
+        other.delete()
+        after_delete = self.assertRevalidates(self.owner_client, url, params)
+        self.assertNotEqual(after_delete, changed)
+        self.assertEqual(
+            self.owner_client.get(url, params, HTTP_IF_NONE_MATCH=changed).status_code, 200
+        )
+
+        # Other years and params do not share validators
+        self.assertNotEqual(
+            self.owner_client.get(url, {**params, 'year': 2024})['ETag'], after_delete
+        )
+
+    def test_if_modified_since(self):
+        url = '/api/customers/'
+        response = self.owner_client.get(url)
+        last_modified = response['Last-Modified']
+        self.assertEqual(
+            self.owner_client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304
+        )
+        self.assertEqual(
+            self.owner_client.get(url, HTTP_IF_MODIFIED_SINCE='Mon, 01 Jan 2001 00:00:00 GMT').status_code, 200
+        )
+
+    def backdate(self):
+        """Move every timestamp a day back, so a touch shows as a newer Last-Modified."""
+        yesterday = timezone.now() - timedelta(days=1)
+        for model in (Business, Customer, Trade, TradeMonthSummary, CostProjection):
+            model.objects.update(updated_at=yesterday)
+
+    def assertStale(self, client, url, params, change):
+        """After change(), neither the ETag nor Last-Modified of url revalidate."""
+        response = client.get(url, params)
+        etag, last_modified = response['ETag'], response['Last-Modified']
+        change()
+        self.assertEqual(client.get(url, params, HTTP_IF_NONE_MATCH=etag).status_code, 200, url)
+        self.assertEqual(client.get(url, params, HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 200, url)
+
+    def test_projection_delete_is_seen(self):
+        projections = [
+            CostProjection.objects.create(customer=self.customer, year=2025, month=month, consumption=Decimal('100'))
+            for month in (1, 2)
+        ]
+        self.backdate()
+        self.assertStale(
+            self.owner_client, '/api/projection/', {'mprn': self.customer.mprn, 'year': 2025},
+            projections[0].delete,
+        )
+        self.backdate()
+        self.assertStale(self.customer_client, '/api/customer-projection-data/', None, projections[1].delete)
+
+    def test_customer_delete_is_seen(self):
+        other = Customer.objects.create(
+            user=User.objects.create_user('other'), business=self.customer.business, mprn='0987654321',
+        )
+        book_trade(other)
+        self.backdate()
+        self.assertStale(self.owner_client, '/api/customers/', None, other.delete)
+        other = Customer.objects.create(
+            user=User.objects.create_user('another'), business=self.customer.business, mprn='0987654322',
+        )
+        book_trade(other)
+        self.backdate()
+        self.assertStale(self.owner_client, '/api/trades/', None, other.delete)
+
+    def test_user_fields_are_seen(self):
+        user = self.customer.user
+
+        def rename(name):
+            def change():
+                user.first_name = name
+                user.save()
+            return change
+
+        for client, url in (
+            (self.owner_client, '/api/customers/'),
+            (self.owner_client, '/api/trades/'),
+            (self.customer_client, '/api/customer-dashboard/'),
+        ):
+            self.backdate()
+            self.assertStale(client, url, None, rename(url))
+
+    def test_logins_do_not_change_validators(self):
+        etag = self.owner_client.get('/api/customers/')['ETag']
+        update_last_login(None, self.customer.user)
+        self.assertEqual(self.owner_client.get('/api/customers/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_tenants_do_not_share_etags(self):
+        other_business = Business.objects.create(
+            owner=User.objects.create_user('other-owner'), name='Other Energy', email='other@example.com',
+        )
+        etag = self.owner_client.get('/api/customers/')['ETag']
+        client = APIClient()
+        client.force_authenticate(other_business.owner)
+        response = client.get('/api/customers/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Authorization', response['Vary'])
+
+
+class ProjectionRowsTests(TestCase):
+    def setUp(self):
+        self.customer = create_customer()
+        for month, st_charge, consumption, flex_rate in ((1, '30.50', '1200.00', '2.25'), (2, '31.00', '900.50', '2.40')):
+            CostProjection.objects.create(
+                customer=self.customer, year=2024, month=month,
+                st_charge=Decimal(st_charge), consumption=Decimal(consumption), flex_rate=Decimal(flex_rate),
+            )
+        CostProjection.objects.create(
+            customer=self.customer, year=2024, month=3, consumption=Decimal('700.00'),
+        )
+        for month, consumption in ((1, '1500.25'), (4, '650.00')):
+            CostProjection.objects.create(
+                customer=self.customer, year=2025, month=month,
+                st_charge=Decimal('32.10'), consumption=Decimal(consumption), flex_rate=Decimal('2.51234567'),
+            )
+        for month, percent, p_therm in ((1, '30.00', '95.1234'), (1, '45.50', '101.9876'), (2, '10.00', '88.0000')):
+            book_trade(self.customer, month=month, year=2025, percent=percent, p_therm=p_therm)
+
+    def per_month_rows(self, year, prefill_consumption):
+        """The rows as the views built them month by month, with the Trade-scan traded price."""
+        def traded_price(month):
+            trades = Trade.objects.filter(customer=self.customer, year=year, month=month)
+            total_percent = sum(trade.percent for trade in trades)
+            if total_percent > 0:
+                return round(sum(trade.p_therm * trade.percent for trade in trades) / total_percent, 8)
+            return Decimal('0')
+
+        def cost(month, st_charge, consumption, flex_rate, price):
+            days = calendar.monthrange(year, month)[1]
+            total = Decimal(st_charge) * Decimal(days) / Decimal('100') + (
+                Decimal(consumption) * (Decimal(flex_rate) + Decimal(price / Decimal('29.3071')))
+            ) / Decimal('100')
+            return round(total, 2)
+
+        rows = []
+        for month in range(1, 13):
+            try:
+                projection = CostProjection.objects.get(customer=self.customer, year=year, month=month)
+                values = (projection.st_charge, projection.consumption, projection.flex_rate)
+            except CostProjection.DoesNotExist:
+                consumption = 0
+                if prefill_consumption:
+                    previous = CostProjection.objects.filter(
+                        customer=self.customer, year=year - 1, month=month,
+                    ).first()
+                    consumption = previous.consumption if previous else 0
+                values = (0, consumption, 0)
+            price = traded_price(month)
+            rows.append({
+                'month': month,
+                'no_of_days': calendar.monthrange(year, month)[1],
+                'st_charge': values[0],
+                'consumption': values[1],
+                'flex_rate': values[2],
+                'traded_price': price,
+                'cost': cost(month, *values, price),
+            })
+        return rows
+
+    def test_matches_per_month_rows(self):
+        for prefill_consumption in (True, False):
+            with self.subTest(prefill_consumption=prefill_consumption):
+                self.assertEqual(
+                    grid.build_projection_rows(self.customer, 2025, prefill_consumption),
+                    self.per_month_rows(2025, prefill_consumption),
+                )
+
+    def test_prefill_copies_previous_consumption(self):
+        rows = grid.build_projection_rows(self.customer, 2025)
+        self.assertEqual([row['consumption'] for row in rows[:4]], [
+            Decimal('1500.25'), Decimal('900.50'), Decimal('700.00'), Decimal('650.00'),
+        ])
+        self.assertNotEqual(rows[0]['traded_price'], 0)
+
+
+class PortfolioCostTests(TestCase):
+    def setUp(self):
+        self.customer = create_customer()
+        self.other = Customer.objects.create(
+            user=User.objects.create_user('other', first_name='Ada', last_name='Lovelace'),
+            business=self.customer.business, mprn='0987654321',
+        )
+        outsider = create_customer('outsider', mprn='5555555555')
+        for customer, month, st_charge, consumption, flex_rate in (
+            (self.customer, 1, '30.25', '1234.56', '2.34567891'),
+            (self.customer, 2, '30.25', '987.65', '2.40000000'),
+            (self.customer, 7, '0.00', '400.00', '2.10000000'),
+            (self.other, 2, '45.10', '15000.00', '1.98765432'),
+            (self.other, 12, '45.10', '22000.00', '2.05000000'),
+            (outsider, 1, '30.00', '99999.00', '3.00000000'),
+        ):
+            CostProjection.objects.create(
+                customer=customer, year=2025, month=month, st_charge=Decimal(st_charge),
+                consumption=Decimal(consumption), flex_rate=Decimal(flex_rate),
+            )
+        for customer, month, percent, p_therm in (
+            (self.customer, 1, '40.00', '95.1234'),
+            (self.customer, 1, '35.00', '101.0000'),
+            (self.other, 12, '100.00', '120.5000'),
+            (self.other, 3, '20.00', '80.0000'),
+        ):
+            book_trade(customer, month=month, percent=percent, p_therm=p_therm)
+
+    def test_totals_match_per_customer_costs(self):
+        client = APIClient()
+        client.force_authenticate(self.customer.business.owner)
+        response = client.get('/api/projection/portfolio/', {'year': 2025})
+        self.assertEqual(response.status_code, 200)
+        data = response.data['data']
+
+        projections = CostProjection.objects.filter(customer__business=self.customer.business, year=2025)
+        customer_totals, month_totals = {}, {month: Decimal('0') for month in range(1, 13)}
+        for projection in projections:
+            customer_totals[projection.customer_id] = customer_totals.get(projection.customer_id, 0) + projection.cost
+            month_totals[projection.month] += projection.cost
+
+        self.assertEqual(
+            [(row['customer_id'], row['mprn'], row['name'], row['total_cost']) for row in data['customers']],
+            [
+                (self.customer.id, self.customer.mprn, 'customer', float(customer_totals[self.customer.id])),
+                (self.other.id, self.other.mprn, 'Ada Lovelace', float(customer_totals[self.other.id])),
+            ],
+        )
+        self.assertEqual(
+            [row['cost'] for row in data['month_totals']],
+            [float(month_totals[month]) for month in range(1, 13)],
+        )
+        self.assertEqual(data['grand_total'], float(sum(customer_totals.values())))
+
+
+class ValuationTests(TestCase):
+    def setUp(self):
+        self.customer = create_customer()
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer.business.owner)
+        # 1000 and 100 therms of consumption
+        for month, consumption in ((1, '29307.10'), (2, '2930.71')):
+            CostProjection.objects.create(customer=self.customer, year=2025, month=month, consumption=Decimal(consumption))
+        book_trade(self.customer, month=1, percent='50.00', p_therm='80.0000')
+        book_trade(self.customer, month=2, percent='25.00', p_therm='120.0000')
+        book_trade(self.customer, month=3, percent='10.00', p_therm='70.0000')
+
+    def create_curve(self, client, as_of_date='2025-01-01', points=None):
+        return client.post('/api/forward-curves/', {
+            'name': 'Gas',
+            'as_of_date': as_of_date,
+            'points': points or [
+                {'year': 2025, 'month': 1, 'price': '100.0000'},
+                {'year': 2025, 'month': 2, 'price': '90.0000'},
+            ],
+        }, format='json')
+
+    def test_known_answer(self):
+        response = self.create_curve(self.client)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.data['data']['points']), 2)
+
+        response = self.client.get('/api/valuation/')
+        self.assertEqual(response.status_code, 200)
+        data = response.data['data']
+        # January: 500 therms hedged at 80p, marked at 100p, a £100 gain.
+        # February: 25 therms at 120p marked at 90p, a £7.50 loss.
+        # March is not on the curve.
+        self.assertEqual((data['trade_count'], data['unpriced_trade_count']), (3, 1))
+        self.assertEqual(data['total_pnl'], 92.5)
+        self.assertEqual(
+            [(row['month'], row['market_price'], row['hedged_therms'], row['pnl']) for row in data['months']],
+            [(1, 100.0, 500.0, 100.0), (2, 90.0, 25.0, -7.5), (3, None, 0.0, 0.0)],
+        )
+        self.assertEqual(data['customers'], [{
+            'customer_id': self.customer.id, 'mprn': self.customer.mprn, 'trade_count': 3,
+            'hedged_therms': 525.0, 'pnl': 92.5,
+        }])
+
+    def test_duplicate_curve_rejected(self):
+        self.assertEqual(self.create_curve(self.client).status_code, 201)
+        response = self.create_curve(self.client)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('as_of_date', response.data['errors'])
+
+    def test_curves_are_scoped_to_the_business(self):
+        curve_id = self.create_curve(self.client).data['data']['id']
+        outsider = create_customer('outsider', mprn='5555555555')
+        client = APIClient()
+        client.force_authenticate(outsider.business.owner)
+
+        self.assertEqual(client.get('/api/forward-curves/').data['data'], [])
+        self.assertEqual(client.get('/api/valuation/', {'curve_id': curve_id}).status_code, 404)
+        self.assertEqual(client.get('/api/valuation/').status_code, 404)
+        # Same name and date as the other business's curve, on its own books
+        self.assertEqual(self.create_curve(client).status_code, 201)
+        data = client.get('/api/valuation/').data['data']
+        self.assertEqual((data['trade_count'], data['total_pnl']), (0, 0.0))
+
+
+class ProjectionGridSaveTests(TestCase):
+    def test_counts_per_posted_year(self):
+        customer = create_customer()
+        other = Customer.objects.create(
+            user=User.objects.create_user('other'), business=customer.business, mprn='0987654321',
+        )
+        for owner, year in ((customer, 2024), (customer, 2025), (other, 2024)):
+            CostProjection.objects.create(customer=owner, year=year, month=1, consumption=Decimal('100'))
+        months = [{'month': month, 'consumption': '200'} for month in (1, 2)]
+
+        with mock.patch.object(grid, 'GRID_CHUNK_SIZE', 1):
+            counts = grid.save_projection_grids([(customer, 2025, months), (other, 2025, months)])
+
+        self.assertEqual(counts, {(customer.id, 2025): (1, 1), (other.id, 2025): (2, 0)})
+        self.assertEqual(
+            CostProjection.objects.get(customer=customer, year=2024, month=1).consumption, Decimal('100'),
+        )
+
+
+class CostScenarioTests(TestCase):
+    def setUp(self):
+        self.customer = create_customer()
+        self.customer.user.groups.add(Group.objects.get(name='Customer'))
+        for month in (1, 2):
+            CostProjection.objects.create(
+                customer=self.customer, year=2025, month=month,
+                st_charge=Decimal('30.00'), consumption=Decimal('1000.00'), flex_rate=Decimal('2.50'),
+            )
+        book_trade(self.customer, month=1, percent='50.00', p_therm='90.0000')
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer.user)
+
+    def post(self, scenarios):
+        return self.client.post('/api/calculate-cost/scenarios/', {'year': 2025, 'scenarios': scenarios}, format='json')
+
+    def test_scenarios_match_monthly_cost(self):
+        response = self.post([{'name': 'High', 'trade_prices': {'2': 120}}])
+        self.assertEqual(response.status_code, 200)
+
+        data = response.data['data']
+        booked = [row['cost'] for row in data['booked']['rows']]
+        scenario = data['scenarios'][0]
+        self.assertEqual(scenario['name'], 'High')
+        self.assertEqual(booked[0], float(calculate_monthly_cost(
+            2025, 1, Decimal('30.00'), Decimal('1000.00'), Decimal('2.50'), Decimal('90'),
+        )))
+        # Month 1 keeps its booked price; month 2 is priced at 120
+        self.assertEqual(scenario['rows'][0]['cost'], booked[0])
+        self.assertEqual(scenario['rows'][1]['cost'], float(calculate_monthly_cost(
+            2025, 2, Decimal('30.00'), Decimal('1000.00'), Decimal('2.50'), Decimal('120'),
+        )))
+        self.assertEqual(scenario['total_delta'], round(scenario['rows'][1]['cost'] - booked[1], 2))
+
+    def test_non_finite_prices_rejected(self):
+        for price in ('Infinity', '-Infinity', 'NaN', '1e400'):
+            with self.subTest(price=price):
+                response = self.post([{'trade_prices': {'1': price}}])
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.data['errors']['scenarios'], 'Scenario 1 has an invalid price for month 1.')
+
+    def test_malformed_scenarios_rejected(self):
+        for scenarios, error in (
+            ([{'trade_prices': {'13': 50}}], 'Scenario 1 has an invalid month: 13.'),
+            ([{'trade_prices': {'x': 50}}], 'Scenario 1 has an invalid month or price.'),
+            ([{'trade_prices': []}], 'Scenario 1 must have a trade_prices object.'),
+        ):
+            with self.subTest(scenarios=scenarios):
+                response = self.post(scenarios)
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.data['errors']['scenarios'], error)
+
+
+class PriceSensitivityParameterTests(TestCase):
+    def setUp(self):
+        self.customer = create_customer()
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer.business.owner)
+
+    def test_non_finite_prices_rejected(self):
+        for name in ('price_min', 'price_max', 'price_step'):
+            for value in ('nan', 'inf', '1e400'):
+                with self.subTest(name=name, value=value):
+                    response = self.client.get('/api/projection/sensitivity/', {
+                        'mprn': self.customer.mprn, 'year': 2025, name: value,
+                    })
+                    self.assertEqual(response.status_code, 400)
+                    self.assertEqual(response.data['message'], 'Year and prices must be valid numbers.')
+
+
+class CostAtRiskParameterTests(TestCase):
+    def setUp(self):
+        self.customer = create_customer()
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer.business.owner)
+
+    def test_non_finite_parameters_rejected(self):
+        for name, value in [('vol', 'nan'), ('vol', 'inf'), ('correlation', 'nan'), ('base_price', 'inf')]:
+            with self.subTest(name=name, value=value):
+                response = self.client.get('/api/projection/cost-at-risk/', {
+                    'mprn': self.customer.mprn, 'year': 2025, name: value,
+                })
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.data['message'], 'Simulation parameters must be valid numbers.')
+
+    def test_simulation_rejects_non_finite_vol(self):
+        with self.assertRaises(ValueError):
+            cost_at_risk([], {}, 2025, np.ones(12), date(2025, 1, 1), float('nan'), 0.9, 100)
+        with self.assertRaises(ValueError):
+            load_forward_prices(None, 2025, float('inf'))
+
+
+class PerformanceMiddlewareTests(TestCase):
+    def setUp(self):
+        self.customer = create_customer()
+        self.trade = book_trade(self.customer, percent='10.00')
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer.business.owner)
+
+    def server_timing(self, response):
+        metrics = {}
+        for entry in response['Server-Timing'].split(', '):
+            name, *params = entry.split(';')
+            metrics[name] = dict(param.split('=', 1) for param in params)
+        return metrics
+
+    def test_server_timing_header(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/customers/')
+        self.assertEqual(response.status_code, 200)
+        metrics = self.server_timing(response)
+        self.assertEqual(list(metrics), ['db', 'serialize', 'render', 'app', 'total'])
+        self.assertEqual(metrics['db']['desc'], f'"{len(queries)} queries"')
+        self.assertGreater(float(metrics['serialize']['dur']), 0)
+        self.assertGreater(float(metrics['render']['dur']), 0)
+        self.assertGreaterEqual(
+            float(metrics['total']['dur']),
+            sum(float(metrics[name]['dur']) for name in ('db', 'serialize', 'render')),
+        )
+
+    def test_serializer_time_excludes_its_queries(self):
+        def slow_query(execute, sql, params, many, context):
+            time.sleep(0.05)
+            return execute(sql, params, many, context)
+
+        timings = RequestTimings()
+        token = current_timings.set(timings)
+        try:
+            with connection.execute_wrapper(timings), connection.execute_wrapper(slow_query):
+                # The nested customer and user are fetched lazily, inside serialization
+                data = TradeSerializer(Trade.objects.get(pk=self.trade.pk)).data
+        finally:
+            current_timings.reset(token)
+        self.assertEqual(data['customer']['mprn'], self.customer.mprn)
+        self.assertEqual(timings.queries, 3)
+        self.assertGreaterEqual(timings.sql, 0.15)
+        self.assertGreater(timings.serialize, 0)
+        self.assertLess(timings.serialize, 0.05)
+        self.assertIsNone(timings._serialize_started)
+
+    def test_not_modified_responses_are_timed(self):
+        etag = self.client.get('/api/customers/')['ETag']
+        response = self.client.get('/api/customers/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(self.server_timing(response)['render']['dur'], '0.00')
+
+    def test_log_fields(self):
+        with self.settings(PERFORMANCE_SLOW_MS=0), self.assertLogs('trading.performance', 'INFO') as logs:
+            self.client.get('/api/trading/pivot/', {'mprn': self.customer.mprn, 'year': 2025})
+        record = logs.records[-1]
+        self.assertEqual(record.view_name, 'trading-pivot')
+        self.assertEqual(record.business_id, self.customer.business_id)
+        self.assertEqual(record.status_code, 200)
+        self.assertGreater(record.db_queries, 0)
+        self.assertGreater(record.serialize_ms, 0)
+        self.assertIn('view_name=trading-pivot', record.getMessage())
+
+    def test_fast_requests_log_at_debug(self):
+        with self.assertLogs('trading.performance', 'DEBUG') as logs:
+            self.client.get('/api/customers/')
+        self.assertEqual(logs.records[-1].levelname, 'DEBUG')
+
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        self.customer = create_customer()
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer.business.owner)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def store(self):
+        # Long interval: the tests flush explicitly
+        return MetricsStore(self.directory, flush_interval=3600, buckets=(0.1, 1.0))
+
+    def write_worker(self, pid, store, started=1):
+        data = store.snapshot()
+        data['pid'] = pid
+        with open(os.path.join(self.directory, f'metrics-{pid}-{started}.json'), 'w') as handle:
+            json.dump(data, handle)
+
+    def requests_total(self, counters, status=200):
+        return counters[(
+            'powerdealer_http_requests_total', labels_key(view='trading-pivot', method='GET', status=status),
+        )]
+
+    def test_endpoint(self):
+        self.client.get('/api/customers/')
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        body = response.content.decode()
+        self.assertIn('# TYPE powerdealer_http_request_duration_seconds histogram', body)
+        self.assertIn(
+            'powerdealer_http_requests_total{method="GET",status="200",view="customer-list-create"}', body
+        )
+        self.assertIn('powerdealer_db_queries_total{view="customer-list-create"}', body)
+        self.assertIn('powerdealer_cache_hits_total{cache="user"}', body)
+        # The scrape itself is in flight
+        self.assertIn('powerdealer_http_requests_in_flight 1', body)
+
+    def test_token(self):
+        metrics_settings = {'DIR': '', 'FLUSH_INTERVAL': 1, 'TOKEN': 'secret'}
+        with self.settings(METRICS=metrics_settings):
+            self.assertEqual(self.client.get('/metrics').status_code, 401)
+            self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer wrong').status_code, 401)
+            self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer secret').status_code, 200)
+
+    def test_workers_are_summed(self):
+        store = self.store()
+        store.record_request('trading-pivot', 'GET', 200, 0.05, 3, 0.01)
+        store.add_gauge('powerdealer_http_requests_in_flight')
+
+        other = self.store()
+        other.record_request('trading-pivot', 'GET', 200, 0.5, 5, 0.02)
+        other.record_request('trading-pivot', 'GET', 404, 2.0, 1, 0.001)
+        other.add_gauge('powerdealer_http_requests_in_flight', amount=2)
+        # A live worker (our parent process) and one that has exited
+        self.write_worker(os.getppid(), other)
+        self.write_worker(2 ** 22 + 1, other)
+
+        counters, gauges, histograms = store.collect()
+        self.assertEqual(
+            counters[('powerdealer_http_requests_total', labels_key(view='trading-pivot', method='GET', status=200))],
+            3,
+        )
+        self.assertEqual(counters[('powerdealer_db_queries_total', labels_key(view='trading-pivot'))], 3 + 6 + 6)
+        # The exited worker's counters stay but its in-flight requests do not
+        self.assertEqual(gauges[('powerdealer_http_requests_in_flight', ())], 3)
+        self.assertEqual(
+            histograms[('powerdealer_http_request_duration_seconds', labels_key(view='trading-pivot'))][:-1],
+            [1, 2, 2],
+        )
+
+        body = store.render()
+        self.assertIn('powerdealer_http_request_duration_seconds_bucket{view="trading-pivot",le="0.1"} 1', body)
+        self.assertIn('powerdealer_http_request_duration_seconds_bucket{view="trading-pivot",le="1.0"} 3', body)
+        self.assertIn('powerdealer_http_request_duration_seconds_bucket{view="trading-pivot",le="+Inf"} 5', body)
+        self.assertIn('powerdealer_http_request_duration_seconds_count{view="trading-pivot"} 5', body)
+
+    def test_exited_workers_are_folded(self):
+        store = self.store()
+        exited = self.store()
+        exited.record_request('trading-pivot', 'GET', 200, 0.5, 5, 0.02)
+        exited.add_gauge('powerdealer_http_requests_in_flight')
+        self.write_worker(2 ** 22 + 1, exited)
+
+        counters, gauges, _ = store.collect()
+        self.assertEqual(self.requests_total(counters), 1)
+        self.assertNotIn('metrics-4194305-1.json', os.listdir(self.directory))
+        self.assertIn('metrics-aggregate.json', os.listdir(self.directory))
+
+        # A new worker reusing the PID writes its own file and adds to the total
+        reused = self.store()
+        reused.record_request('trading-pivot', 'GET', 200, 0.05, 1, 0.01)
+        self.write_worker(2 ** 22 + 1, reused, started=2)
+        counters, gauges, histograms = store.collect()
+        self.assertEqual(self.requests_total(counters), 2)
+        self.assertEqual(
+            histograms[('powerdealer_http_request_duration_seconds', labels_key(view='trading-pivot'))][:-1],
+            [1, 1, 0],
+        )
+        self.assertNotIn(('powerdealer_http_requests_in_flight', ()), gauges)
+
+        # Folding is not repeated
+        counters, _, _ = store.collect()
+        self.assertEqual(self.requests_total(counters), 2)
+
+    def test_folded_file_left_behind_is_not_counted_twice(self):
+        store = self.store()
+        exited = self.store()
+        exited.record_request('trading-pivot', 'GET', 200, 0.5, 5, 0.02)
+        self.write_worker(2 ** 22 + 1, exited)
+        store.collect()
+        # As if the scrape that folded it had stopped before removing it
+        self.write_worker(2 ** 22 + 1, exited)
+
+        counters, _, _ = store.collect()
+        self.assertEqual(self.requests_total(counters), 1)
+        self.assertNotIn('metrics-4194305-1.json', os.listdir(self.directory))
+
+
+
+class SlowQueryLogTests(TestCase):
+    def setUp(self):
+        self.customer = create_customer()
+        book_trade(self.customer)
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer.business.owner)
+
+    def install(self, log):
+        log.install(connection)
+        self.addCleanup(connection.execute_wrappers.remove, log)
+
+    def test_captures_with_call_site(self):
+        log = SlowQueryLog(threshold_ms=0)
+        self.install(log)
+        with self.assertLogs('trading.slow_queries', 'WARNING') as logs:
+            self.client.get('/api/trading/pivot/', {'mprn': self.customer.mprn, 'year': 2025})
+
+        captures = log.recent()
+        self.assertEqual(len(captures), len(logs.records))
+        self.assertTrue(any(
+            capture['call_site'].startswith('RowBuilder.fetch (trading/fast_serializers.py:')
+            and 'called from TradingPivotView.get (trading/views.py:' in capture['call_site']
+            for capture in captures
+        ))
+        self.assertIn('TradingPivotView.get', ' '.join(captures[0]['stack']))
+        self.assertIn(str(self.customer.id), ' '.join(capture['params'] for capture in captures))
+
+    def test_fast_queries_are_not_captured(self):
+        log = SlowQueryLog(threshold_ms=60_000, buffer_size=5)
+        self.install(log)
+        self.client.get('/api/customers/')
+        self.assertEqual(log.recent(), [])
+
+    def test_survives_a_temporary_execute_wrapper(self):
+        log = SlowQueryLog(threshold_ms=0)
+        with connection.execute_wrapper(lambda execute, *args: execute(*args)):
+            self.install(log)
+        self.assertIn(log, connection.execute_wrappers)
+
+    def test_admin_page(self):
+        self.addCleanup(slow_query_log.clear)
+        with self.assertLogs('trading.slow_queries', 'WARNING'):
+            slow_query_log.capture('SELECT 1', (), False, 0.5, 'default')
+
+        staff = User.objects.create_user('staff', password='x', is_staff=True)
+        self.client.force_login(staff)
+        response = self.client.get('/admin/slow-queries/')
+        self.assertContains(response, 'SELECT 1')
+        self.assertContains(response, '500.0')
+
+        self.client.post('/admin/slow-queries/')
+        self.assertEqual(slow_query_log.recent(), [])
+
+        self.client.force_login(self.customer.business.owner)
+        self.assertEqual(self.client.get('/admin/slow-queries/').status_code, 302)
+
+
+
+class NPlusOneTests(TestCase):
+    def setUp(self):
+        self.customer = create_customer()
+
+    def load_customers(self, times):
+        for _ in range(times):
+            Customer.objects.get(pk=self.customer.pk)
+
+    def test_fingerprint(self):
+        self.assertEqual(
+            fingerprint('SELECT * FROM "t" WHERE "id" IN (%s, %s, %s) LIMIT 21'),
+            fingerprint('SELECT * FROM "t" WHERE "id" IN (%s) LIMIT 5'),
+        )
+        self.assertIsNone(fingerprint('SAVEPOINT "s1_x1"'))
+        # Writes and batched reads are not per-row lookups
+        self.assertIsNone(fingerprint('INSERT INTO "t" ("a") VALUES (%s), (%s)', [1, 2]))
+        self.assertIsNone(fingerprint('INSERT OR IGNORE INTO "t" ("a") VALUES (%s)', [1]))
+        self.assertIsNone(fingerprint('SELECT "a" FROM "t" WHERE "id" = %s', [[1]], many=True))
+        self.assertIsNone(fingerprint('SELECT "a" FROM "t" WHERE "id" IN (%s)', list(range(100))))
+
+    def test_repeats_over_the_threshold_raise(self):
+        with detect_repeated_queries(threshold=5):
+            self.load_customers(5)
+        with self.assertRaises(RepeatedQueries) as raised:
+            with detect_repeated_queries('loop', threshold=5):
+                self.load_customers(6)
+        report = str(raised.exception)
+        self.assertIn('6x SELECT', report)
+        self.assertIn('at NPlusOneTests.load_customers (trading/tests.py:', report)
+
+    def test_raises_before_the_repeat_runs(self):
+        executed = []
+
+        def record(execute, sql, params, many, context):
+            executed.append(sql)
+            return execute(sql, params, many, context)
+
+        with self.assertRaises(RepeatedQueries):
+            with detect_repeated_queries(threshold=5):
+                with connection.execute_wrapper(record):
+                    self.load_customers(10)
+        self.assertEqual(len(executed), 5)
+
+    def test_middleware_modes(self):
+        request = RequestFactory().get('/api/customers/')
+
+        def view(request):
+            self.load_customers(3)
+            return HttpResponse()
+
+        with self.settings(NPLUSONE={'MODE': 'raise', 'THRESHOLD': 2}):
+            with self.assertRaises(RepeatedQueries):
+                NPlusOneMiddleware(view)(request)
+        with self.settings(NPLUSONE={'MODE': 'log', 'THRESHOLD': 2}):
+            with self.assertLogs('trading.nplusone', 'WARNING') as logs:
+                NPlusOneMiddleware(view)(request)
+            self.assertEqual(logs.records[0].repeated_queries[0]['count'], 3)
+        with self.settings(NPLUSONE={'MODE': 'off', 'THRESHOLD': 2}):
+            with self.assertRaises(MiddlewareNotUsed):
+                NPlusOneMiddleware(view)
+
+    def test_list_endpoints_do_not_repeat_queries(self):
+        # Trades of many customers: the nested customer/user must not load per row
+        for index in range(8):
+            user = User.objects.create_user(f'customer-{index}')
+            customer = Customer.objects.create(user=user, business=self.customer.business, mprn=f'55500000{index:02d}')
+            for month in range(1, 4):
+                book_trade(customer, month=month)
+        client = APIClient()
+        client.force_authenticate(self.customer.business.owner)
+        # The test settings run NPlusOneMiddleware in 'raise' mode
+        for url in ('/api/trades/', '/api/customers/'):
+            self.assertEqual(client.get(url).status_code, 200)
+
+    def test_large_import_passes(self):
+        # Batched INSERTs and summary upserts repeat by design
+        customers = [self.customer] + [
+            Customer.objects.create(
+                user=User.objects.create_user(f'import-{index}'),
+                business=self.customer.business, mprn=f'66600000{index:02d}',
+            )
+            for index in range(4)
+        ]
+        rows = [
+            {
+                'mprn': customer.mprn, 'month': month, 'year': year,
+                'p_therm': '80.5', 'percent': '0.05', 'trade_date': f'{year}-01-01',
+            }
+            for customer in customers for year in (2025, 2026) for month in range(1, 13)
+            for _ in range(100)
+        ]
+        client = APIClient()
+        client.force_authenticate(self.customer.business.owner)
+        response = client.post('/api/trades/import/', {'trades': rows}, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(Trade.objects.count(), len(rows))
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', 'Row locks need PostgreSQL')
+class ConcurrentTradeNumberingTests(TransactionTestCase):
+    THREADS = 16
+    BOOKINGS_PER_THREAD = 25
+
+    def test_concurrent_bookings_get_unique_numbers(self):
+        customer = create_customer()
+        barrier = threading.Barrier(self.THREADS)
+        errors = []
+
+        def worker():
+            try:
+                barrier.wait()
+                for _ in range(self.BOOKINGS_PER_THREAD):
+                    book_trade(customer, percent='0.10')
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        total = self.THREADS * self.BOOKINGS_PER_THREAD
+        trade_numbers = sorted(
+            Trade.objects.filter(customer=customer).values_list('trade_no', flat=True)
+        )
+        self.assertEqual(trade_numbers, list(range(1, total + 1)))
+
+        summary = TradeMonthSummary.objects.get(customer=customer, year=2025, month=1)
+        self.assertEqual(summary.trade_count, total)
+        self.assertEqual(summary.max_trade_no, total)
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', 'Row locks need PostgreSQL')
+class ConcurrentBookedPercentCapTests(TransactionTestCase):
+    THREADS = 20
+    BOOKINGS_PER_THREAD = 10
+
+    def test_concurrent_bookings_never_exceed_cap(self):
+        # 200 bookings of 1% race for one month; exactly 100 may land
+        customer = create_customer()
+        barrier = threading.Barrier(self.THREADS)
+        rejected = []
+        errors = []
+
+        def worker():
+            try:
+                barrier.wait()
+                for _ in range(self.BOOKINGS_PER_THREAD):
+                    try:
+                        book_trade(customer, percent='1.00')
+                    except BookedPercentExceeded:
+                        rejected.append(1)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(len(rejected), self.THREADS * self.BOOKINGS_PER_THREAD - 100)
+        self.assertEqual(Trade.objects.filter(customer=customer).count(), 100)
+
+        summary = TradeMonthSummary.objects.get(customer=customer, year=2025, month=1)
+        self.assertEqual(summary.total_percent, Decimal('100.00'))
@@ -2,7 +2,7 @@ from django.urls import path
 from .views import (
     SignupView, LoginView, BusinessDetailView, MeView, HealthCheckView,
     CustomerListCreateView, CustomerDetailView,
-    TradeListCreateView, TradeDetailView, TradingPivotView,
+    TradeListCreateView, TradeImportView, TradeDetailView, TradingPivotView,
 )
 
 urlpatterns = [
@@ -14,6 +14,7 @@ urlpatterns = [
     path('customers/', CustomerListCreateView.as_view(), name='customer-list-create'),
     path('customers/<str:mprn>/', CustomerDetailView.as_view(), name='customer-detail'),
     path('trades/', TradeListCreateView.as_view(), name='trade-list-create'),
+    path('trades/import/', TradeImportView.as_view(), name='trade-import'),
     path('trades/<int:trade_id>/', TradeDetailView.as_view(), name='trade-detail'),
     path('trading/pivot/', TradingPivotView.as_view(), name='trading-pivot'),
 ]
@@ -0,0 +1,163 @@
+"""
+Cross-request cache of authenticated users with their tenant.
+
+TenantJWTAuthentication would otherwise load the user (joined with
+business and customer, see authentication.tenant_user_queryset) on every
+request. This keeps that object in a process-local LRU with a TTL, and
+optionally in a Django cache shared between processes (settings.USER_CACHE).
+
+Entries are dropped by the signal handlers in signals.py whenever a user,
+their business, their customer profile or their group membership changes.
+Other processes only see the change in the shared cache; their local
+copy expires after TTL seconds, so keep it short.
+
+Cached users are stored pickled and unpickled per request, so a view
+can never modify the copy another request gets.
+"""
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+DEFAULTS = {
+    'MAX_ENTRIES': 1024,
+    'TTL': 60,
+    'CACHE_ALIAS': None,
+}
+
+
+class UserCache:
+    """LRU of pickled users keyed by id, with a TTL and hit/miss counters.
+
+    Args:
+        max_entries: Users kept per process (0 disables the cache)
+        ttl: Seconds an entry is trusted (0 disables the cache)
+        cache_alias: Optional Django cache shared between processes
+    """
+
+    def __init__(self, max_entries=1024, ttl=60, cache_alias=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.cache_alias = cache_alias
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # Bumped on every invalidation, so a load that raced with one is not cached
+        self._epoch = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @classmethod
+    def from_settings(cls):
+        options = {**DEFAULTS, **getattr(settings, 'USER_CACHE', {})}
+        return cls(
+            max_entries=options['MAX_ENTRIES'],
+            ttl=options['TTL'],
+            cache_alias=options['CACHE_ALIAS'],
+        )
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0 and self.ttl > 0
+
+    @property
+    def shared(self):
+        return caches[self.cache_alias] if self.cache_alias else None
+
+    def _key(self, user_id):
+        return f'user-cache:{user_id}'
+
+    def get(self, user_id, load):
+        """Cached user for user_id, calling load() on a miss.
+
+        Exceptions from load() (e.g. User.DoesNotExist) propagate and
+        nothing is cached.
+        """
+        if not self.enabled:
+            return load()
+
+        # Token claims carry the id as a string, signal handlers as an int
+        user_id = str(user_id)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                return pickle.loads(entry[1])
+            epoch = self._epoch
+
+        data = self.shared.get(self._key(user_id)) if self.shared else None
+        if data is not None:
+            with self._lock:
+                self.hits += 1
+            self._store(user_id, data, epoch)
+            return pickle.loads(data)
+
+        with self._lock:
+            self.misses += 1
+        user = load()
+        data = pickle.dumps(user, pickle.HIGHEST_PROTOCOL)
+        if self._store(user_id, data, epoch) and self.shared:
+            self.shared.set(self._key(user_id), data, self.ttl)
+        return user
+
+    def _store(self, user_id, data, epoch):
+        with self._lock:
+            if epoch != self._epoch:
+                return False
+            self._entries[user_id] = (time.monotonic() + self.ttl, data)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return True
+
+    def invalidate(self, *user_ids):
+        """Drop users now and again when the current transaction commits.
+
+        The second pass catches a request that re-cached the old rows
+        between the write and the commit.
+        """
+        self._drop(user_ids)
+        transaction.on_commit(lambda: self._drop(user_ids))
+
+    def _drop(self, user_ids):
+        user_ids = [str(user_id) for user_id in user_ids]
+        with self._lock:
+            self._epoch += 1
+            for user_id in user_ids:
+                if self._entries.pop(user_id, None) is not None:
+                    self.invalidations += 1
+        if self.shared and user_ids:
+            self.shared.delete_many([self._key(user_id) for user_id in user_ids])
+
+    def clear(self):
+        """Drop every local entry (the shared cache is left to expire)."""
+        with self._lock:
+            self._epoch += 1
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'enabled': self.enabled,
+                'size': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else None,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+            }
+
+
+user_cache = UserCache.from_settings()
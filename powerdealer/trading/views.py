@@ -1,20 +1,92 @@
+import base64
+import binascii
+import csv
 import logging
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from rest_framework_simplejwt.tokens import RefreshToken
+from django.conf import settings
 from django.contrib.auth import authenticate
 from django.contrib.auth.models import User, Group
 from django.db import connection
-
-from .models import Business, Customer, Trade
+from django.db.models import Q
+from django.http import HttpResponse
+from django.utils.crypto import constant_time_compare
+from django.views import View
+
+from .authentication import ROLE_ADMINISTRATOR, ROLE_CUSTOMER, TenantRefreshToken, resolve_tenant_claims
+from .conditional import collection_validators
+from .fast_serializers import CUSTOMER_COLUMNS, TRADE_COLUMNS, RowBuilder
+from .imports import MAX_IMPORT_ROWS, TradeImportError, import_trades, read_csv_rows
+from .metrics import metrics
+from .models import BookedPercentExceeded, Business, Customer, Trade, TradeMonthSummary
 from .serializers import (
     SignupSerializer, LoginSerializer, BusinessSerializer,
     CustomerSerializer, CustomerCreateSerializer, TradeSerializer,
 )
+from .tenant import get_business, get_tenant
+from .response_cache import response_cache
 
 logger = logging.getLogger(__name__)
 
+# Fields a trade list can be narrowed to with ?fields=
+TRADE_LIST_FIELDS = {
+    'id', 'customer', 'trade_no', 'month', 'month_name', 'year',
+    'p_therm', 'percent', 'trade_date', 'created_at', 'updated_at',
+}
+
+
+def booked_percent_error(exc):
+    """400 response for a booking rejected by the cap check under the month lock.
+
+    Same shape as the serializer's own percent error, so clients cannot
+    tell which of the two checks caught it.
+    """
+    return Response({
+        'success': False,
+        'message': 'Please check your input.',
+        'errors': {'percent': [str(exc)]},
+    }, status=status.HTTP_400_BAD_REQUEST)
+
+
+def encode_trade_cursor(year, month, trade_no, trade_id):
+    """Opaque cursor pointing just past a trade in (year, month, trade_no, id) order."""
+    raw = f"{year}:{month}:{trade_no}:{trade_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def decode_trade_cursor(cursor):
+    """Decode a cursor back into its (year, month, trade_no, id) key, or None.
+
+    Raises:
+        ValueError: if the cursor is malformed
+    """
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+    except (binascii.Error, UnicodeDecodeError):
+        raise ValueError('Invalid cursor.')
+    key = tuple(int(part) for part in raw.split(':'))
+    if len(key) != 4:
+        raise ValueError('Invalid cursor.')
+    return key
+
+
+def trade_keyset_after(year, month, trade_no, trade_id):
+    """Filter for trades strictly after a key in (year, month, trade_no, id) order.
+
+    The leading year >= bound is implied by the OR chain but gives the
+    planner a range to seek to on the keyset index, so a deep page does
+    not scan every earlier row.
+    """
+    return Q(year__gte=year) & (
+        Q(year__gt=year)
+        | Q(year=year, month__gt=month)
+        | Q(year=year, month=month, trade_no__gt=trade_no)
+        | Q(year=year, month=month, trade_no=trade_no, id__gt=trade_id)
+    )
+
 
 class HealthCheckView(APIView):
     """Health check endpoint for container orchestration"""
@@ -38,6 +110,21 @@ class HealthCheckView(APIView):
         })
 
 
+class MetricsView(View):
+    """Prometheus metrics of all workers (see metrics.py).
+
+    A plain Django view: the scraper sends no JWT, only the optional
+    METRICS['TOKEN'] bearer token.
+    """
+    def get(self, request):
+        token = settings.METRICS.get('TOKEN')
+        if token and not constant_time_compare(
+            request.headers.get('Authorization', ''), f'Bearer {token}'
+        ):
+            return HttpResponse('Unauthorized\n', status=401, content_type='text/plain')
+        return HttpResponse(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
 class SignupView(APIView):
     def post(self, request):
         serializer = SignupSerializer(data=request.data)
@@ -51,7 +138,11 @@ class SignupView(APIView):
             user.groups.add(admin_group)
             
             # Generate tokens
-            refresh = RefreshToken.for_user(user)
+            refresh = TenantRefreshToken.for_user(user, claims={
+                'role': ROLE_ADMINISTRATOR,
+                'business_id': business.id,
+                'customer_id': None,
+            })
             
             logger.info(f"User signup successful: {user.username} - added to Administrator group")
             
@@ -90,12 +181,12 @@ class LoginView(APIView):
             
             user = authenticate(username=username, password=password)
             if user:
-                # Check group membership
-                is_admin = user.groups.filter(name='Administrator').exists()
-                is_customer = user.groups.filter(name='Customer').exists()
+                # Check group membership (one query); the result is signed
+                # into the tokens so later requests skip this lookup
+                claims = resolve_tenant_claims(user)
                 
                 # Handle Administrator group (business owner)
-                if is_admin:
+                if claims['role'] == ROLE_ADMINISTRATOR:
                     try:
                         business = user.business
                     except Business.DoesNotExist:
@@ -106,7 +197,7 @@ class LoginView(APIView):
                             'errors': {}
                         }, status=status.HTTP_404_NOT_FOUND)
                     
-                    refresh = RefreshToken.for_user(user)
+                    refresh = TenantRefreshToken.for_user(user, claims)
                     
                     logger.info(f"Administrator login successful: {username}")
                     
@@ -129,7 +220,7 @@ class LoginView(APIView):
                     }, status=status.HTTP_200_OK)
                 
                 # Handle Customer group
-                elif is_customer:
+                elif claims['role'] == ROLE_CUSTOMER:
                     try:
                         customer = user.customer
                         business = customer.business
@@ -141,7 +232,7 @@ class LoginView(APIView):
                             'errors': {}
                         }, status=status.HTTP_404_NOT_FOUND)
                     
-                    refresh = RefreshToken.for_user(user)
+                    refresh = TenantRefreshToken.for_user(user, claims)
                     
                     logger.info(f"Customer login successful: {username}")
                     
@@ -195,42 +286,34 @@ class LoginView(APIView):
 class MeView(APIView):
     """Get current authenticated user and their business"""
     def get(self, request):
-        if not request.user.is_authenticated:
+        tenant = get_tenant(request)
+        if not tenant.is_authenticated:
             return Response({
                 'success': False,
                 'message': 'Login required.',
                 'errors': {}
             }, status=status.HTTP_401_UNAUTHORIZED)
         
-        user = request.user
-        
-        # Check group membership to determine user_type
-        is_admin = user.groups.filter(name='Administrator').exists()
-        is_customer = user.groups.filter(name='Customer').exists()
+        user = tenant.user
         
         user_type = None
         customer_data = None
         
-        if is_admin:
+        if tenant.role == ROLE_ADMINISTRATOR:
             user_type = 'administrator'
-            try:
-                business = user.business
-                business_data = BusinessSerializer(business).data
-            except Business.DoesNotExist:
-                business_data = None
-        elif is_customer:
+            business_data = BusinessSerializer(tenant.business).data if tenant.business else None
+        elif tenant.role == ROLE_CUSTOMER:
             user_type = 'customer'
-            try:
-                customer = user.customer
-                business = customer.business
-                business_data = BusinessSerializer(business).data
+            customer = tenant.customer
+            if customer:
+                business_data = BusinessSerializer(customer.business).data
                 customer_data = {
                     'id': customer.id,
                     'mprn': customer.mprn,
                     'mobile': customer.mobile,
                     'address': customer.address
                 }
-            except Customer.DoesNotExist:
+            else:
                 business_data = None
         else:
             # No role assigned
@@ -259,21 +342,9 @@ class MeView(APIView):
 class BusinessDetailView(APIView):
     def get(self, request):
         """Get current user's business"""
-        if not request.user.is_authenticated:
-            return Response({
-                'success': False,
-                'message': 'Login required.',
-                'errors': {}
-            }, status=status.HTTP_401_UNAUTHORIZED)
-        
-        try:
-            business = request.user.business
-        except Business.DoesNotExist:
-            return Response({
-                'success': False,
-                'message': 'Business not found.',
-                'errors': {}
-            }, status=status.HTTP_404_NOT_FOUND)
+        business, error_response = get_business(request)
+        if error_response:
+            return error_response
         
         return Response({
             'success': True,
@@ -283,21 +354,9 @@ class BusinessDetailView(APIView):
 
     def put(self, request):
         """Update current user's business"""
-        if not request.user.is_authenticated:
-            return Response({
-                'success': False,
-                'message': 'Login required.',
-                'errors': {}
-            }, status=status.HTTP_401_UNAUTHORIZED)
-        
-        try:
-            business = request.user.business
-        except Business.DoesNotExist:
-            return Response({
-                'success': False,
-                'message': 'Business not found.',
-                'errors': {}
-            }, status=status.HTTP_404_NOT_FOUND)
+        business, error_response = get_business(request)
+        if error_response:
+            return error_response
         
         serializer = BusinessSerializer(business, data=request.data, partial=True)
         if serializer.is_valid():
@@ -320,44 +379,26 @@ class CustomerListCreateView(APIView):
     """List and create customers for the authenticated business owner."""
 
     def get(self, request):
-        if not request.user.is_authenticated:
-            return Response({
-                'success': False,
-                'message': 'Login required.',
-                'errors': {}
-            }, status=status.HTTP_401_UNAUTHORIZED)
-        try:
-            business = request.user.business
-        except Business.DoesNotExist:
-            return Response({
-                'success': False,
-                'message': 'Business not found.',
-                'errors': {}
-            }, status=status.HTTP_404_NOT_FOUND)
+        business, error_response = get_business(request)
+        if error_response:
+            return error_response
 
-        customers = Customer.objects.filter(business=business).select_related('user')
-        serializer = CustomerSerializer(customers, many=True)
-        return Response({
+        customers = Customer.objects.filter(business=business)
+        validators = collection_validators([customers, Business.objects.filter(pk=business.id)], business.id)
+        not_modified = validators.not_modified(request)
+        if not_modified:
+            return not_modified
+
+        return validators.apply(Response({
             'success': True,
             'message': 'Customers retrieved successfully.',
-            'data': serializer.data,
-        })
+            'data': RowBuilder(CUSTOMER_COLUMNS).rows(customers),
+        }))
 
     def post(self, request):
-        if not request.user.is_authenticated:
-            return Response({
-                'success': False,
-                'message': 'Login required.',
-                'errors': {}
-            }, status=status.HTTP_401_UNAUTHORIZED)
-        try:
-            business = request.user.business
-        except Business.DoesNotExist:
-            return Response({
-                'success': False,
-                'message': 'Business not found.',
-                'errors': {}
-            }, status=status.HTTP_404_NOT_FOUND)
+        business, error_response = get_business(request)
+        if error_response:
+            return error_response
 
         serializer = CustomerCreateSerializer(data=request.data, context={'business': business})
         if serializer.is_valid():
@@ -387,20 +428,9 @@ class CustomerDetailView(APIView):
 
     def _get_customer(self, request, mprn):
         """Helper to authenticate, scope to business, and fetch customer by MPRN."""
-        if not request.user.is_authenticated:
-            return None, Response({
-                'success': False,
-                'message': 'Login required.',
-                'errors': {}
-            }, status=status.HTTP_401_UNAUTHORIZED)
-        try:
-            business = request.user.business
-        except Business.DoesNotExist:
-            return None, Response({
-                'success': False,
-                'message': 'Business not found.',
-                'errors': {}
-            }, status=status.HTTP_404_NOT_FOUND)
+        business, error_response = get_business(request)
+        if error_response:
+            return None, error_response
         try:
             customer = Customer.objects.select_related('user').get(mprn=mprn, business=business)
         except Customer.DoesNotExist:
@@ -447,32 +477,48 @@ class CustomerDetailView(APIView):
 class TradeListCreateView(APIView):
     """List and create trades for the authenticated business."""
 
-    def _get_business(self, request):
-        """Helper to get business for authenticated user."""
-        if not request.user.is_authenticated:
-            return None, Response({
-                'success': False,
-                'message': 'Login required.',
-                'errors': {}
-            }, status=status.HTTP_401_UNAUTHORIZED)
-        try:
-            business = request.user.business
-        except Business.DoesNotExist:
-            return None, Response({
-                'success': False,
-                'message': 'Business not found.',
-                'errors': {}
-            }, status=status.HTTP_404_NOT_FOUND)
-        return business, None
+    DEFAULT_PAGE_SIZE = 100
+    MAX_PAGE_SIZE = 500
 
     def get(self, request):
-        """List all trades for the business with optional filtering."""
-        business, error_response = self._get_business(request)
+        """List trades for the business, one keyset page at a time.
+        
+        Query params:
+        - customer_id, month, year: Optional filters
+        - page_size: Trades per page (default 100, max 500)
+        - cursor: next_cursor from the previous page
+        - fields: Comma-separated fields to return (e.g. id,trade_no,p_therm);
+          leaving out customer skips the customer join
+        """
+        business, error_response = get_business(request)
         if error_response:
             return error_response
 
+        try:
+            page_size = int(request.query_params.get('page_size', self.DEFAULT_PAGE_SIZE))
+            after = decode_trade_cursor(request.query_params.get('cursor'))
+        except ValueError:
+            return Response({
+                'success': False,
+                'message': 'page_size and cursor must be valid.',
+                'errors': {}
+            }, status=status.HTTP_400_BAD_REQUEST)
+        page_size = max(1, min(page_size, self.MAX_PAGE_SIZE))
+
+        fields = None
+        fields_param = request.query_params.get('fields')
+        if fields_param:
+            fields = [name.strip() for name in fields_param.split(',') if name.strip()]
+            unknown = sorted(set(fields) - TRADE_LIST_FIELDS)
+            if unknown:
+                return Response({
+                    'success': False,
+                    'message': 'Please check your input.',
+                    'errors': {'fields': f"Unknown fields: {', '.join(unknown)}"}
+                }, status=status.HTTP_400_BAD_REQUEST)
+
         # Start with trades for customers in this business
-        trades = Trade.objects.filter(customer__business=business).select_related('customer__user')
+        trades = Trade.objects.filter(customer__business=business)
 
         # Apply filters
         customer_id = request.query_params.get('customer_id')
@@ -487,19 +533,59 @@ class TradeListCreateView(APIView):
         if year:
             trades = trades.filter(year=int(year))
 
-        # Order by trade_no within each customer/month/year
-        trades = trades.order_by('year', 'month', 'trade_no')
-
-        serializer = TradeSerializer(trades, many=True)
-        return Response({
+        # Answer polls of an unchanged list with 304. The month summaries
+        # record trade deletes, the customers the nested customer fields and
+        # the business customer deletes.
+        summaries = TradeMonthSummary.objects.filter(customer__business=business)
+        if customer_id:
+            summaries = summaries.filter(customer_id=customer_id)
+        if month:
+            summaries = summaries.filter(month=int(month))
+        if year:
+            summaries = summaries.filter(year=int(year))
+        validators = collection_validators(
+            [
+                trades, summaries,
+                Customer.objects.filter(business=business), Business.objects.filter(pk=business.id),
+            ],
+            business.id, sorted(request.query_params.lists()),
+        )
+        not_modified = validators.not_modified(request)
+        if not_modified:
+            return not_modified
+
+        # Keyset pagination on (year, month, trade_no, id): seek past the
+        # last row of the previous page instead of using OFFSET
+        if after:
+            trades = trades.filter(trade_keyset_after(*after))
+        trades = trades.order_by('year', 'month', 'trade_no', 'id')[:page_size + 1]
+
+        # Read-only fast path: same output as TradeSerializer, narrowed to fields
+        keyset = ('year', 'month', 'trade_no', 'id')
+        builder = RowBuilder(TRADE_COLUMNS, fields=fields, extra_lookups=keyset)
+        rows = builder.fetch(trades)
+
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        next_cursor = None
+        if has_more:
+            last = rows[-1]
+            next_cursor = encode_trade_cursor(*(last[builder.positions[lookup]] for lookup in keyset))
+
+        return validators.apply(Response({
             'success': True,
             'message': 'Trades retrieved successfully.',
-            'data': serializer.data,
-        })
+            'data': builder.build_all(rows),
+            'pagination': {
+                'page_size': page_size,
+                'has_more': has_more,
+                'next_cursor': next_cursor,
+            },
+        }))
 
     def post(self, request):
         """Create a new trade."""
-        business, error_response = self._get_business(request)
+        business, error_response = get_business(request)
         if error_response:
             return error_response
 
@@ -514,7 +600,11 @@ class TradeListCreateView(APIView):
                     'errors': {}
                 }, status=status.HTTP_400_BAD_REQUEST)
 
-            trade = serializer.save()
+            try:
+                trade = serializer.save()
+            except BookedPercentExceeded as e:
+                logger.warning(f"Trade creation rejected for customer {customer.mprn}: {e}")
+                return booked_percent_error(e)
             logger.info(f"Trade created: {trade.trade_no} for customer {customer.mprn}")
             return Response({
                 'success': True,
@@ -530,25 +620,78 @@ class TradeListCreateView(APIView):
         }, status=status.HTTP_400_BAD_REQUEST)
 
 
-class TradeDetailView(APIView):
-    """Retrieve, update, and delete a single trade."""
+class TradeImportView(APIView):
+    """Book many trades at once from a CSV file or a JSON list."""
 
-    def _get_trade(self, request, trade_id):
-        """Helper to authenticate, scope to business, and fetch trade."""
-        if not request.user.is_authenticated:
-            return None, Response({
+    def post(self, request):
+        """Import trades for the business.
+
+        Accepts either a multipart upload with a CSV ``file`` (header row
+        mprn,month,year,p_therm,percent,trade_date) or a JSON body
+        ``{"trades": [{...}, ...]}``. The import is all-or-nothing: if any row
+        is invalid nothing is booked and every row error is returned.
+        """
+        business, error_response = get_business(request)
+        if error_response:
+            return error_response
+
+        upload = request.FILES.get('file')
+        if upload:
+            try:
+                rows = read_csv_rows(upload)
+            except (UnicodeDecodeError, ValueError, csv.Error):
+                return Response({
+                    'success': False,
+                    'message': 'Could not read the CSV file. It must be UTF-8 with a header row.',
+                    'errors': {}
+                }, status=status.HTTP_400_BAD_REQUEST)
+        else:
+            rows = request.data.get('trades') if isinstance(request.data, dict) else request.data
+
+        if not isinstance(rows, list) or not rows:
+            return Response({
                 'success': False,
-                'message': 'Login required.',
+                'message': 'Provide a CSV file or a non-empty trades list.',
                 'errors': {}
-            }, status=status.HTTP_401_UNAUTHORIZED)
-        try:
-            business = request.user.business
-        except Business.DoesNotExist:
-            return None, Response({
+            }, status=status.HTTP_400_BAD_REQUEST)
+        if len(rows) > MAX_IMPORT_ROWS:
+            return Response({
                 'success': False,
-                'message': 'Business not found.',
+                'message': f'At most {MAX_IMPORT_ROWS} trades can be imported at once.',
                 'errors': {}
-            }, status=status.HTTP_404_NOT_FOUND)
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            created = import_trades(business, rows)
+        except TradeImportError as e:
+            logger.warning(f"Trade import failed for business {business.id}: {len(e.row_errors)} invalid rows")
+            return Response({
+                'success': False,
+                'message': 'Please check your input. No trades were imported.',
+                'errors': {
+                    'rows': [
+                        {'row': row, 'errors': errors}
+                        for row, errors in sorted(e.row_errors.items())
+                    ]
+                }
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        logger.info(f"Trades imported for business {business.id}: {created}")
+        return Response({
+            'success': True,
+            'message': f'{created} trades imported successfully.',
+            'data': {'created': created},
+        }, status=status.HTTP_201_CREATED)
+
+
+class TradeDetailView(APIView):
+    """Retrieve, update, and delete a single trade."""
+
+    def _get_trade(self, request, trade_id):
+        """Helper to authenticate, scope to business, and fetch trade."""
+        business, error_response = get_business(request)
+        if error_response:
+            return None, error_response
 
         try:
             trade = Trade.objects.select_related('customer__user').get(
@@ -582,7 +725,11 @@ class TradeDetailView(APIView):
 
         serializer = TradeSerializer(trade, data=request.data, context={'request': request})
         if serializer.is_valid():
-            trade = serializer.save()
+            try:
+                trade = serializer.save()
+            except BookedPercentExceeded as e:
+                logger.warning(f"Trade update rejected for trade {trade.id}: {e}")
+                return booked_percent_error(e)
             logger.info(f"Trade updated: {trade.id}")
             return Response({
                 'success': True,
@@ -603,7 +750,11 @@ class TradeDetailView(APIView):
 
         serializer = TradeSerializer(trade, data=request.data, partial=True, context={'request': request})
         if serializer.is_valid():
-            trade = serializer.save()
+            try:
+                trade = serializer.save()
+            except BookedPercentExceeded as e:
+                logger.warning(f"Trade update rejected for trade {trade.id}: {e}")
+                return booked_percent_error(e)
             logger.info(f"Trade updated: {trade.id}")
             return Response({
                 'success': True,
@@ -634,24 +785,6 @@ class TradeDetailView(APIView):
 class TradingPivotView(APIView):
     """Get trading data in pivot format for a customer for a full year."""
 
-    def _get_business(self, request):
-        """Helper to get business for authenticated user."""
-        if not request.user.is_authenticated:
-            return None, Response({
-                'success': False,
-                'message': 'Login required.',
-                'errors': {}
-            }, status=status.HTTP_401_UNAUTHORIZED)
-        try:
-            business = request.user.business
-        except Business.DoesNotExist:
-            return None, Response({
-                'success': False,
-                'message': 'Business not found.',
-                'errors': {}
-            }, status=status.HTTP_404_NOT_FOUND)
-        return business, None
-
     def get(self, request):
         """Get pivot data for a customer for a year.
         
@@ -660,9 +793,7 @@ class TradingPivotView(APIView):
         - OR customer_id: Required - ID of the customer
         - year: Required - Year to get data for
         """
-        import calendar
-
-        business, error_response = self._get_business(request)
+        business, error_response = get_business(request)
         if error_response:
             return error_response
 
@@ -691,7 +822,7 @@ class TradingPivotView(APIView):
         customer = None
         if mprn:
             try:
-                customer = Customer.objects.get(mprn=mprn, business=business)
+                customer = Customer.objects.select_related('user').get(mprn=mprn, business=business)
             except Customer.DoesNotExist:
                 return Response({
                     'success': False,
@@ -701,7 +832,7 @@ class TradingPivotView(APIView):
         elif customer_id:
             try:
                 customer_id = int(customer_id)
-                customer = Customer.objects.get(id=customer_id, business=business)
+                customer = Customer.objects.select_related('user').get(id=customer_id, business=business)
             except ValueError:
                 return Response({
                     'success': False,
@@ -721,33 +852,69 @@ class TradingPivotView(APIView):
                 'errors': {}
             }, status=status.HTTP_400_BAD_REQUEST)
 
+        validators = collection_validators(
+            [
+                Trade.objects.filter(customer=customer, year=year),
+                TradeMonthSummary.objects.filter(customer=customer, year=year),
+            ],
+            customer.id, year, customer.updated_at, customer.user.get_full_name(), customer.user.username,
+        )
+        not_modified = validators.not_modified(request)
+        if not_modified:
+            return not_modified
+
+        # Past years rarely change, so the pivot is served from the response
+        # cache until a trade of this customer/year (or the customer) changes
+        data = response_cache.get_or_set(
+            'trading-pivot', customer, [year],
+            lambda: self._build_pivot(customer, year),
+            profile=True,
+        )
+
+        return validators.apply(Response({
+            'success': True,
+            'message': 'Pivot data retrieved successfully.',
+            'data': data,
+        }))
+
+    def _build_pivot(self, customer, year):
+        """Pivot data for a customer year: trades grouped by month with monthly totals."""
+        import calendar
+
         # Get all trades for this customer/year
         trades = Trade.objects.filter(
             customer=customer,
             year=year
         ).order_by('month', 'trade_no')
+        builder = RowBuilder(TRADE_COLUMNS)
+
+        # Monthly totals come from the maintained trade summaries
+        summaries = {
+            summary.month: summary
+            for summary in TradeMonthSummary.objects.filter(customer=customer, year=year).order_by()
+        }
 
         # Group trades by month
         trades_by_month = {}
-        for trade in trades:
-            if trade.month not in trades_by_month:
-                trades_by_month[trade.month] = []
-            trades_by_month[trade.month].append(TradeSerializer(trade).data)
+        for trade in builder.rows(trades):
+            if trade['month'] not in trades_by_month:
+                trades_by_month[trade['month']] = []
+            trades_by_month[trade['month']].append(trade)
 
         # Build pivot response (12 months)
         pivot_data = []
         for month_num in range(1, 13):
             month_trades = trades_by_month.get(month_num, [])
+            summary = summaries.get(month_num)
             
-            # Calculate total_percent (TB - Total Booked)
-            # Convert to float to handle DecimalField serialization (DRF serializes as string)
-            total_percent = sum(float(t['percent']) for t in month_trades)
-            
-            # Calculate average_price_achieved (AP - Average Price)
-            # Weighted average = Σ(P/Therm_i × Percent_i) / Σ(Percent_i)
+            # total_percent (TB - Total Booked)
+            total_percent = summary.total_percent if summary and summary.trade_count else 0
+
+            # average_price_achieved (AP - Average Price)
+            # Weighted average = Σ(P/Therm_i × Percent_i) / Σ(Percent_i), kept in
+            # Decimal and rounded from the same traded_price the projection uses
             if total_percent > 0:
-                weighted_sum = sum((float(t['p_therm']) * float(t['percent'])) for t in month_trades)
-                average_price_achieved = round(weighted_sum / total_percent, 4)
+                average_price_achieved = round(summary.traded_price, 4)
             else:
                 average_price_achieved = 0
 
@@ -759,15 +926,11 @@ class TradingPivotView(APIView):
                 'average_price_achieved': average_price_achieved,
             })
 
-        return Response({
-            'success': True,
-            'message': 'Pivot data retrieved successfully.',
-            'data': {
-                'customer_id': customer.id,
-                'customer_mprn': customer.mprn,
-                'customer_name': customer.user.get_full_name() or customer.user.username,
-                'year': year,
-                'months': pivot_data,
-            },
-        })
+        return {
+            'customer_id': customer.id,
+            'customer_mprn': customer.mprn,
+            'customer_name': customer.user.get_full_name() or customer.user.username,
+            'year': year,
+            'months': pivot_data,
+        }
 
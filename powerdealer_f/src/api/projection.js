@@ -71,6 +71,23 @@ export const projectionApi = {
   
   // ============= Customer Dashboard API =============
   
+  /**
+   * Get everything the customer dashboard shows on load in one request:
+   * customer info, available years, trading pivot and previous/current projections
+   * @param {Object} [years] - Optional year overrides
+   * @param {number} [years.tradingYear] - Year for the trading pivot
+   * @param {number} [years.currentYear] - Current projection year
+   * @param {number} [years.previousYear] - Previous projection year
+   * @returns {Promise} - API response with the dashboard bundle
+   */
+  getCustomerDashboard(years = {}) {
+    const params = {}
+    if (years.tradingYear) params.trading_year = years.tradingYear
+    if (years.currentYear) params.current_year = years.currentYear
+    if (years.previousYear) params.previous_year = years.previousYear
+    return api.get('/customer-dashboard/', { params })
+  },
+
   /**
    * Get all dashboard data for the logged-in customer
    * @returns {Promise} - API response with customer info, trading years, projection years
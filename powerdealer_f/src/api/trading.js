@@ -37,13 +37,19 @@ export const tradingApi = {
    * @param {number} [filters.customerId] - Filter by customer ID
    * @param {number} [filters.month] - Filter by month (1-12)
    * @param {number} [filters.year] - Filter by year
-   * @returns {Promise} - API response with trades list
+   * @param {number} [filters.pageSize] - Trades per page (max 500)
+   * @param {string} [filters.cursor] - pagination.next_cursor from the previous page
+   * @param {string} [filters.fields] - Comma-separated fields to return
+   * @returns {Promise} - API response with one page of trades
    */
   getTrades(filters = {}) {
     const params = {}
     if (filters.customerId) params.customer_id = filters.customerId
     if (filters.month) params.month = filters.month
     if (filters.year) params.year = filters.year
+    if (filters.pageSize) params.page_size = filters.pageSize
+    if (filters.cursor) params.cursor = filters.cursor
+    if (filters.fields) params.fields = filters.fields
     
     return api.get('/trades/', { params })
   },
@@ -63,6 +69,22 @@ export const tradingApi = {
     return api.post('/trades/', data)
   },
 
+  /**
+   * Import many trades at once (all-or-nothing)
+   * @param {File|Array} source - CSV file (header mprn,month,year,p_therm,percent,trade_date)
+   *                              or a list of trade objects with the same fields
+   * @returns {Promise} - API response with the number of trades created,
+   *                      or per-row errors in errors.rows
+   */
+  importTrades(source) {
+    if (Array.isArray(source)) {
+      return api.post('/trades/import/', { trades: source })
+    }
+    const formData = new FormData()
+    formData.append('file', source)
+    return api.post('/trades/import/', formData)
+  },
+
   /**
    * Update an existing trade (full update)
    * @param {number} id - Trade ID